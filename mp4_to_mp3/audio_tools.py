@@ -0,0 +1,1789 @@
+import os
+import subprocess
+import json
+import math
+import mmap
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from itertools import chain, islice
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from pathlib import Path
+
+from media_cache import LOUDNESS_FIELDS, get_metadata_cache
+from media_headers import (
+    MP3_DECODER_DELAY,
+    lame_tag_fields,
+    read_lame_tag,
+    read_media_info,
+    read_mp3_length,
+)
+
+# 預設同時執行的轉換數（libmp3lame 每個 ffmpeg 行程只用一個核心）
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# MP3 編碼參數
+MP3_ENCODE_ARGS = (
+    "-acodec",
+    "libmp3lame",  # 使用MP3編碼器
+    "-q:a",
+    "2",  # 音質設定（0最好，9最差）
+)
+
+# 超過此長度（秒）的檔案會分段平行編碼
+CHUNKED_ENCODE_THRESHOLD = 30 * 60
+# MPEG-1 Layer III 每個音框的取樣數，以及分段編碼時每段開頭多編碼的重疊音框數
+MP3_FRAME_SAMPLES = 1152
+CHUNK_OVERLAP_FRAMES = 2
+_MP3_BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0)
+_MP3_SAMPLE_RATES = (44100, 48000, 32000, 0)
+# 旁資訊中 main_data_begin 最多可往前引用的位元組數
+_MP3_MAX_RESERVOIR = 511
+# 320 kbps 的位元率索引
+_MP3_MAX_BITRATE_INDEX = 14
+# libmp3lame 的編碼器延遲；ffmpeg 解碼時共略過此數加上解碼器延遲的取樣
+_LAME_ENCODER_DELAY = 576
+
+# EBU R128 響度標準化的預設目標（整合響度 LUFS）與真峰值上限（dBTP）、響度範圍（LU）
+DEFAULT_LOUDNESS_TARGET = -16.0
+LOUDNESS_TRUE_PEAK = -1.5
+LOUDNESS_RANGE = 11.0
+
+# 重新封裝模式下可直接複製的音訊編碼與對應的輸出副檔名
+REMUX_CONTAINERS = {"mp3": ".mp3", "aac": ".m4a", "alac": ".m4a"}
+
+# 產生各種音訊編碼時使用的編碼參數
+ENCODE_ARGS = {
+    "mp3": MP3_ENCODE_ARGS,
+    "aac": ("-acodec", "aac", "-b:a", "192k"),
+    "pcm_s16le": ("-acodec", "pcm_s16le"),
+}
+
+# 多重輸出的設定：名稱 -> (副檔名, 編碼參數)
+OUTPUT_PROFILES = {
+    "mp3-v2": (".mp3", MP3_ENCODE_ARGS),
+    "mp3-320k": (".mp3", ("-acodec", "libmp3lame", "-b:a", "320k")),
+    "mp3-128k": (".mp3", ("-acodec", "libmp3lame", "-b:a", "128k")),
+    "aac-192k": (".m4a", ENCODE_ARGS["aac"]),
+    "opus-64k": (".opus", ("-acodec", "libopus", "-b:a", "64k")),
+    "wav": (".wav", ENCODE_ARGS["pcm_s16le"]),
+}
+
+# 合併時依輸出副檔名決定的目標編碼與編碼參數
+MERGE_TARGETS = {
+    ".mp3": ("mp3", ENCODE_ARGS["mp3"]),
+    ".wav": ("pcm_s16le", ENCODE_ARGS["pcm_s16le"]),
+    ".m4a": ("aac", ENCODE_ARGS["aac"]),
+}
+
+# 精準剪輯時從切點前多解碼的秒數，讓解碼器在切點前就已穩定
+TRIM_PREROLL = 1.0
+# 精準剪輯 MP3 時，重新編碼的開頭從切點前幾個原始音框開始解碼
+# （位元儲存槽會引用前面音框的資料，解碼器需要幾個音框才會穩定）
+TRIM_PREROLL_FRAMES = 10
+# 尋找重新編碼的開頭與原始音框的接點時檢查的音框數，以及接點後多編碼的音框數
+TRIM_JOIN_CANDIDATES = 8
+TRIM_LOOKAHEAD_FRAMES = 2
+# 精準剪輯的輸出長度與預期相差超過此取樣數（約兩個 MP3 音框，也涵蓋 AAC 的前置取樣）
+# 時視為失敗；以取樣數表示，低取樣率時容許的秒數較長
+TRIM_TOLERANCE_SAMPLES = 2 * MP3_FRAME_SAMPLES
+# 時間字串：[[時:]分:]秒，秒數可含小數
+_TIME_PATTERN = re.compile(r"^(?:(?:(\d+):)?(\d+):)?(\d+(?:\.\d*)?|\.\d+)$")
+
+
+class JobCancelled(Exception):
+    """工作已被使用者取消"""
+
+
+# 暫時性的錯誤（例如磁碟或網路磁碟機暫時無法存取、無法建立子行程）：
+# 轉換、合併、剪輯與分割不會把這些例外當成失敗吞掉，而是拋給呼叫端決定是否重試
+TRANSIENT_ERRORS = (OSError, subprocess.TimeoutExpired)
+
+
+class CancelToken:
+    """用來取消執行中的工作，會終止所有已登記的 ffmpeg 子行程"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes = set()
+        self.cancelled = False
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    def register(self, process):
+        with self._lock:
+            if self.cancelled:
+                process.kill()
+            self._processes.add(process)
+
+    def unregister(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+
+def stream_pcm(input_path, sample_rate, block_size=1 << 20, cancel=None):
+    """以 ffmpeg 將音訊解碼為單聲道 16 位元 PCM，逐塊產生原始位元組
+
+    每塊最多 block_size 位元組，記憶體用量與檔案長度無關。
+    失敗時拋出 subprocess.CalledProcessError，被取消時拋出 JobCancelled。
+    """
+    if cancel is not None and cancel.cancelled:
+        raise JobCancelled()
+
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-i",
+        input_path,
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(sample_rate),
+        "-f",
+        "s16le",
+        "pipe:1",
+    ]
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    if cancel is not None:
+        cancel.register(process)
+
+    try:
+        while True:
+            data = process.stdout.read(block_size)
+            if not data:
+                break
+            yield data
+        stderr = process.stderr.read()
+        returncode = process.wait()
+    finally:
+        if cancel is not None:
+            cancel.unregister(process)
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+    if cancel is not None and cancel.cancelled:
+        raise JobCancelled()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+
+
+def _parse_speed(value):
+    """解析 ffmpeg 回報的速度（例如 "12.3x"），無法解析時回傳 None"""
+    try:
+        return float(value.strip().rstrip("x"))
+    except (AttributeError, ValueError):
+        return None
+
+
+def format_progress(info):
+    """將進度資訊轉換為顯示用文字，例如 "45% 12.3x 剩餘 00:10" """
+    parts = []
+    if info.get("percent") is not None:
+        parts.append(f"{info['percent']:.0f}%")
+    if info.get("speed"):
+        parts.append(f"{info['speed']:.1f}x")
+    if info.get("eta") is not None:
+        parts.append(f"剩餘 {format_time(info['eta'])}")
+    return " ".join(parts)
+
+
+def run_ffmpeg(args, duration=None, on_progress=None, cancel=None, log=None):
+    """執行 ffmpeg 並透過 -progress 輸出回報進度
+
+    args 為 "ffmpeg" 之後的參數；duration 為預期輸出長度（秒），用來計算百分比與剩餘時間。
+    on_progress 會以 {"percent", "speed", "eta", "out_time"} 字典呼叫。
+    log 為可寫入的二進位檔案時，ffmpeg 的 info 等級記錄會寫入該檔案（濾鏡的分析結果在其中）。
+    失敗時拋出 subprocess.CalledProcessError，被取消時拋出 JobCancelled。
+    """
+    if cancel is not None and cancel.cancelled:
+        raise JobCancelled()
+
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostdin",
+        "-loglevel",
+        "error" if log is None else "info",
+        "-progress",
+        "pipe:1",  # 機器可讀的進度輸出
+        "-nostats",
+        *args,
+    ]
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stdin=subprocess.DEVNULL,
+        stderr=log,
+        encoding="utf-8",
+        errors="replace",
+    )
+    if cancel is not None:
+        cancel.register(process)
+
+    try:
+        block = {}
+        for line in process.stdout:
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                continue
+            block[key] = value
+            # 每個進度區塊以 progress=continue 或 progress=end 結尾
+            if key != "progress":
+                continue
+            if on_progress:
+                out_time = None
+                try:
+                    out_time = int(block.get("out_time_us", "")) / 1_000_000
+                except ValueError:
+                    pass
+                speed = _parse_speed(block.get("speed"))
+                percent = eta = None
+                if value == "end":
+                    percent, eta = 100.0, 0
+                elif duration and out_time is not None:
+                    percent = min(max(out_time / duration * 100, 0.0), 100.0)
+                    if speed:
+                        eta = max(duration - out_time, 0) / speed
+                on_progress(
+                    {
+                        "percent": percent,
+                        "speed": speed,
+                        "eta": eta,
+                        "out_time": out_time,
+                    }
+                )
+            block = {}
+        returncode = process.wait()
+    finally:
+        if cancel is not None:
+            cancel.unregister(process)
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+    if cancel is not None and cancel.cancelled:
+        raise JobCancelled()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_media(file_path, cache_only=False):
+    """獲取媒體資訊（長度、編碼、取樣率、聲道數、位元率），失敗時回傳 None
+
+    MP4、MP3 與 WAV 直接解析檔頭（見 media_headers），其他格式才啟動 ffprobe。
+    結果會依路徑、大小與修改時間快取在磁碟上，重複查詢不必再讀取檔案。
+    cache_only 為 True 時只查詢快取，不會啟動 ffprobe。
+    """
+    cache = get_metadata_cache()
+    if cache is not None:
+        info = cache.get(file_path)
+        if info is not None or cache_only:
+            return info
+    if cache_only:
+        return None
+
+    # 先直接解析檔頭，不支援的格式才啟動 ffprobe
+    info = read_media_info(file_path)
+    if info is not None:
+        if cache is not None:
+            cache.put(file_path, info)
+        return info
+
+    try:
+        # 使用 ffprobe 獲取媒體檔案資訊
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "quiet",
+                "-print_format",
+                "json",
+                "-show_format",
+                "-show_streams",
+                file_path,
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        # 解析 JSON 輸出
+        data = json.loads(result.stdout)
+        audio = next(
+            (s for s in data.get("streams", []) if s.get("codec_type") == "audio"),
+            {},
+        )
+        info = {
+            "duration": float(data["format"]["duration"]),
+            "codec": audio.get("codec_name"),
+            "sample_rate": _to_int(audio.get("sample_rate")),
+            "channels": _to_int(audio.get("channels")),
+            "bitrate": _to_int(audio.get("bit_rate") or data["format"].get("bit_rate")),
+        }
+    except Exception as e:
+        print(f"無法獲取音訊長度: {str(e)}")
+        return None
+
+    if cache is not None:
+        cache.put(file_path, info)
+    return info
+
+
+def get_duration_seconds(file_path):
+    """獲取音訊檔案的長度（秒），失敗時回傳 None"""
+    info = probe_media(file_path)
+    return info["duration"] if info else None
+
+
+def get_audio_duration(file_path):
+    """獲取音訊檔案的長度"""
+    duration = get_duration_seconds(file_path)
+    if duration is None:
+        return "未知"
+    # 將秒數轉換為時:分:秒格式
+    return format_time(duration)
+
+
+def measure_loudness(file_path, on_progress=None, cancel=None):
+    """以 loudnorm 濾鏡量測 EBU R128 響度（第一次處理），回傳 LOUDNESS_FIELDS 字典
+
+    量測結果與目標響度無關，會快取在媒體資訊快取中，改變目標響度時不必重新量測。
+    失敗時拋出 subprocess.CalledProcessError 或 ValueError，被取消時拋出 JobCancelled。
+    """
+    cache = get_metadata_cache()
+    if cache is not None:
+        measured = cache.get_loudness(file_path)
+        if measured is not None:
+            return measured
+
+    duration = get_duration_seconds(file_path) if on_progress else None
+    with tempfile.TemporaryFile() as log:
+        run_ffmpeg(
+            [
+                "-i",
+                str(file_path),
+                "-vn",
+                "-af",
+                "loudnorm=print_format=json",
+                "-f",
+                "null",
+                "-",
+            ],
+            duration=duration,
+            on_progress=on_progress,
+            cancel=cancel,
+            log=log,
+        )
+        log.seek(0)
+        text = log.read().decode("utf-8", errors="replace")
+
+    # 分析結果是記錄最後的 JSON 區塊
+    start, end = text.rfind("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("找不到響度量測結果")
+    data = json.loads(text[start : end + 1])
+    measured = {field: float(data[field]) for field in LOUDNESS_FIELDS}
+
+    if cache is not None:
+        cache.put_loudness(file_path, measured)
+    return measured
+
+
+def loudnorm_filter(measured, target=DEFAULT_LOUDNESS_TARGET):
+    """依量測結果產生第二次處理的 loudnorm 濾鏡；無法標準化（例如全為靜音）時回傳 None"""
+    if not all(math.isfinite(measured[field]) for field in LOUDNESS_FIELDS):
+        return None
+    return (
+        f"loudnorm=I={target}:TP={LOUDNESS_TRUE_PEAK}:LRA={LOUDNESS_RANGE}"
+        f":measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+        f":measured_LRA={measured['input_lra']}"
+        f":measured_thresh={measured['input_thresh']}:linear=true"
+    )
+
+
+def loudnorm_is_linear(measured, target=DEFAULT_LOUDNESS_TARGET):
+    """只需固定增益就能達到目標響度（不超過真峰值上限）時回傳 True
+
+    此時 loudnorm 不會改用動態壓縮，分段處理的結果與整段處理相同。
+    """
+    return (
+        loudnorm_filter(measured, target) is not None
+        and measured["input_tp"] + target - measured["input_i"] <= LOUDNESS_TRUE_PEAK
+    )
+
+
+def _loudnorm_args(file_path, target, sample_rate, cancel=None):
+    """量測響度（或讀取快取）並回傳標準化用的 ffmpeg 參數與量測結果
+
+    loudnorm 會把輸出升頻為 192 kHz，因此一併以 -ar 指定輸出取樣率。
+    """
+    measured = measure_loudness(file_path, cancel=cancel)
+    audio_filter = loudnorm_filter(measured, target)
+    if audio_filter is None:
+        print(f"無法標準化響度（可能全為靜音）: {Path(str(file_path)).name}")
+        return [], measured
+    return ["-af", audio_filter, "-ar", str(sample_rate)], measured
+
+
+def choose_merge_target(infos, output_file):
+    """依輸出副檔名與輸入檔案的格式選擇合併的目標格式
+
+    回傳 (編碼名稱, 取樣率, 聲道數, 編碼參數)；取樣率與聲道數取輸入檔案中最常見的組合，
+    優先考慮編碼已與目標相同的檔案。
+    """
+    ext = os.path.splitext(str(output_file))[1].lower()
+    codec, encode_args = MERGE_TARGETS.get(ext, MERGE_TARGETS[".mp3"])
+
+    known = [info for info in infos if info and info.get("sample_rate")]
+    candidates = [info for info in known if info["codec"] == codec] or known
+    if not candidates:
+        return codec, None, None, encode_args
+    layouts = Counter((info["sample_rate"], info["channels"]) for info in candidates)
+    (sample_rate, channels), _ = layouts.most_common(1)[0]
+    return codec, sample_rate, channels, encode_args
+
+
+def _matches_target(info, target):
+    codec, sample_rate, channels, _ = target
+    return (
+        info is not None
+        and info["codec"] == codec
+        and (sample_rate is None or info["sample_rate"] == sample_rate)
+        and (channels is None or info["channels"] == channels)
+    )
+
+
+def _transcode_for_merge(input_file, output_file, target, cancel=None, loudness=None):
+    """將與目標格式不同（或需要標準化響度）的輸入轉為暫存檔"""
+    _, sample_rate, channels, encode_args = target
+    args = ["-i", str(input_file), "-vn", *encode_args]
+    if loudness is not None:
+        sample_rate = sample_rate or 44100
+        args += _loudnorm_args(input_file, loudness, sample_rate, cancel)[0]
+    # 無法標準化（例如全為靜音）時沒有 loudnorm 參數，仍須轉為目標取樣率才能直接串接
+    if sample_rate and "-ar" not in args:
+        args += ["-ar", str(sample_rate)]
+    if channels:
+        args += ["-ac", str(channels)]
+    run_ffmpeg([*args, output_file], cancel=cancel)
+
+
+def _concat_entry(file):
+    """產生 concat 清單的一行（路徑需為絕對路徑，單引號需跳脫）"""
+    path = os.path.abspath(file).replace("'", "'\\''")
+    return f"file '{path}'\n"
+
+
+def merge_audio_files(
+    input_files,
+    output_file,
+    on_progress=None,
+    cancel=None,
+    max_workers=None,
+    loudness=None,
+):
+    """合併多個音訊檔案，成功時回傳 True
+
+    先探測所有輸入檔案並選擇共同的目標格式，只有格式不同的檔案會在背景平行轉檔
+    為暫存檔，其餘檔案直接以串流複製合併。
+    loudness 為目標響度（LUFS）時，每個輸入都會先平行量測並標準化到相同響度。
+    TRANSIENT_ERRORS 不會被當成失敗，而是直接拋出。
+    """
+    temp_path = None
+    try:
+        if any(
+            os.path.abspath(str(file)) == os.path.abspath(str(output_file))
+            for file in input_files
+        ):
+            print(f"輸出檔案與輸入相同，無法合併: {Path(str(output_file)).name}")
+            return False
+        temp_path = partial_output_path(output_file)
+        with tempfile.TemporaryDirectory(prefix="merge_") as temp_dir:
+            infos = [probe_media(file) for file in input_files]
+            target = choose_merge_target(infos, output_file)
+            ext = os.path.splitext(str(output_file))[1] or ".mp3"
+
+            # 只轉檔格式不符的輸入
+            parts = list(input_files)
+            mismatched = [
+                i
+                for i, info in enumerate(infos)
+                if loudness is not None or not _matches_target(info, target)
+            ]
+            if loudness is not None:
+                print(f"標準化 {len(mismatched)} 個檔案的響度")
+            elif mismatched:
+                print(f"需要先轉檔 {len(mismatched)} 個格式不同的檔案")
+            if mismatched:
+                workers = max(1, min(max_workers or DEFAULT_WORKERS, len(mismatched)))
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    futures = []
+                    for i in mismatched:
+                        parts[i] = os.path.join(temp_dir, f"part{i}{ext}")
+                        futures.append(
+                            pool.submit(
+                                _transcode_for_merge,
+                                input_files[i],
+                                parts[i],
+                                target,
+                                cancel,
+                                loudness,
+                            )
+                        )
+                    for future in futures:
+                        future.result()
+
+            # 創建一個包含所有輸入檔案的文字檔
+            temp_list = os.path.join(temp_dir, "file_list.txt")
+            with open(temp_list, "w", encoding="utf-8") as f:
+                for file in parts:
+                    f.write(_concat_entry(file))
+
+            total = None
+            if on_progress and None not in infos:
+                total = sum(info["duration"] for info in infos)
+
+            # 使用 ffmpeg 的 concat 功能合併檔案
+            run_ffmpeg(
+                [
+                    "-f",
+                    "concat",
+                    "-safe",
+                    "0",
+                    "-i",
+                    temp_list,
+                    "-c",
+                    "copy",
+                    "-y",  # 暫存檔可能是上次中斷時留下的
+                    temp_path,
+                ],
+                duration=total,
+                on_progress=on_progress,
+                cancel=cancel,
+            )
+        # 完成後才改名，使用者確認覆寫的既有檔案也會被取代
+        os.replace(temp_path, output_file)
+        print(f"成功合併音訊檔案到: {output_file}")
+        return True
+    except JobCancelled:
+        print(f"已取消合併: {output_file}")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"合併失敗: {str(e)}")
+        return False
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        print(f"未預期的錯誤: {str(e)}")
+        return False
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def mp3_output_path(input_file):
+    """取得MP4檔案轉換後的MP3路徑（只替換副檔名）"""
+    return os.path.splitext(str(input_file))[0] + ".mp3"
+
+
+def profile_output_path(input_file, profile):
+    """取得多重輸出中某個設定的輸出路徑，例如 talk.mp4 -> talk_opus-64k.opus"""
+    ext = OUTPUT_PROFILES[profile][0]
+    return f"{os.path.splitext(str(input_file))[0]}_{profile}{ext}"
+
+
+def plan_conversion(input_file, remux=False, loudness=None):
+    """決定轉換的輸出路徑與音訊編碼參數，回傳 (輸出路徑, ffmpeg 參數)
+
+    remux 為 True 時，若來源音訊已是 MP3 或 AAC/ALAC，就直接複製音訊串流
+    到 .mp3 或 .m4a，不重新編碼；其他編碼仍轉為 MP3。
+    標準化響度（loudness 不為 None）必須重新編碼，此時 remux 不會生效。
+    """
+    if remux and loudness is None:
+        info = probe_media(input_file)
+        ext = REMUX_CONTAINERS.get(info["codec"]) if info else None
+        if ext:
+            return os.path.splitext(str(input_file))[0] + ext, ["-c:a", "copy"]
+    return mp3_output_path(input_file), list(MP3_ENCODE_ARGS)
+
+
+def partial_output_path(output_path):
+    """取得寫入中的暫存檔路徑（保留副檔名讓 ffmpeg 判斷格式）"""
+    folder, name = os.path.split(str(output_path))
+    stem, ext = os.path.splitext(name)
+    return os.path.join(folder, f".{stem}.partial{ext}")
+
+
+def _mp3_frames(data):
+    """逐一列出 MPEG-1 Layer III 音框的 (位移, 長度, 是否為 Xing/Info 音框)，略過 ID3v2 標籤"""
+    offset = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        # ID3v2 標籤大小以 synchsafe 整數表示
+        size = 0
+        for byte in data[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        offset = 10 + size
+
+    first = True
+    end = len(data)
+    while offset + 4 <= end:
+        header = int.from_bytes(data[offset : offset + 4], "big")
+        # 同步字 0xFFE、MPEG-1、Layer III
+        if header >> 21 != 0x7FF or (header >> 19) & 0b11 != 0b11:
+            offset += 1
+            continue
+        if (header >> 17) & 0b11 != 0b01:
+            offset += 1
+            continue
+        bitrate = _MP3_BITRATES[(header >> 12) & 0xF]
+        sample_rate = _MP3_SAMPLE_RATES[(header >> 10) & 0b11]
+        if not bitrate or not sample_rate:
+            offset += 1
+            continue
+        length = 144000 * bitrate // sample_rate + ((header >> 9) & 1)
+        is_info = False
+        if first:
+            first = False
+            frame = data[offset : offset + length]
+            is_info = b"Xing" in frame or b"Info" in frame
+        yield offset, length, is_info
+        offset += length
+
+
+def _update_info_frame(info_frame, frame_count, size, delay=None, padding=None):
+    """更新 Xing/Info 音框的音框數、位元組數與 LAME 標頭的延遲、結尾補白
+
+    ffmpeg 讀到與檔案大小不符的位元組數時會視為串接的檔案，不再去除結尾補白，
+    因此接合音框後都要更新。delay、padding 為 None 時保留原值。
+    """
+    fields = lame_tag_fields(info_frame, 0)
+    if fields is None:
+        return
+    frames_field, bytes_field, gapless_field = fields
+    if frames_field is not None:
+        info_frame[frames_field : frames_field + 4] = frame_count.to_bytes(4, "big")
+    if bytes_field is not None:
+        info_frame[bytes_field : bytes_field + 4] = size.to_bytes(4, "big")
+    if gapless_field is not None:
+        value = int.from_bytes(info_frame[gapless_field : gapless_field + 3], "big")
+        delay = value >> 12 if delay is None else delay
+        padding = value & 0xFFF if padding is None else padding
+        info_frame[gapless_field : gapless_field + 3] = (
+            (delay << 12) | padding
+        ).to_bytes(3, "big")
+
+
+def _chunk_windows(total_frames, chunk_count):
+    """把 total_frames 個 MP3 音框平均分成 chunk_count 段
+
+    回傳每段的 (編碼起點, 編碼終點, 接合時丟棄的開頭音框數, 保留的音框數)，單位為音框。
+    每段兩端各多編碼 CHUNK_OVERLAP_FRAMES 個重疊音框：結尾的重疊讓最後保留的音框
+    不受輸入結束的影響。最後一段的終點與保留數為 None，表示編碼到輸入結尾並全部保留。
+    """
+    bounds = [total_frames * i // chunk_count for i in range(chunk_count + 1)]
+    windows = []
+    for index in range(chunk_count):
+        start = max(bounds[index] - CHUNK_OVERLAP_FRAMES, 0)
+        end = keep = None
+        if index < chunk_count - 1:
+            end = bounds[index + 1] + CHUNK_OVERLAP_FRAMES
+            keep = bounds[index + 1] - bounds[index]
+        windows.append((start, end, bounds[index] - start, keep))
+    return windows
+
+
+def _kept_frames(frames, skip, keep):
+    """接合時一段要保留的音框：丟棄開頭 skip 個重疊音框，保留 keep 個（None 為其餘全部）"""
+    if keep is None:
+        return frames[skip:]
+    if len(frames) < skip + keep:
+        raise RuntimeError(
+            f"分段的音框數量不足：需要 {skip + keep} 個，只有 {len(frames)} 個"
+        )
+    return frames[skip : skip + keep]
+
+
+def encode_mp3_chunked(
+    input_path,
+    output_path,
+    duration,
+    workers=None,
+    on_progress=None,
+    cancel=None,
+    audio_filter=None,
+):
+    """將長檔案的時間軸切成多段，在多個核心上平行編碼為 MP3 後無縫接合
+
+    每段的起點都對齊 MP3 音框（1152 個取樣），並多編碼前方兩個音框作為重疊；
+    接合時丟棄重疊的音框，讓各段落在同一個音框格線上，不會產生間隙或爆音。
+    各段關閉位元儲存槽（bit reservoir），被丟棄的音框才不會被後面的音框引用。
+    audio_filter 會套用在每一段上，因此只能使用與位置無關的濾鏡（例如固定增益）。
+    """
+    info = probe_media(input_path) or {}
+    sample_rate = info.get("sample_rate")
+    if sample_rate not in _MP3_SAMPLE_RATES:
+        sample_rate = 44100
+    channels = min(info.get("channels") or 2, 2)
+
+    total_frames = -(-round(duration * sample_rate) // MP3_FRAME_SAMPLES)
+    chunk_count = max(1, min(workers or DEFAULT_WORKERS, total_frames // 2))
+    if chunk_count == 1:
+        # 只有一段時不必切割、接合與重新封裝，直接編碼
+        run_ffmpeg(
+            [
+                "-i",
+                input_path,
+                "-vn",
+                *(["-af", audio_filter] if audio_filter else []),
+                "-ar",
+                str(sample_rate),
+                "-ac",
+                str(channels),
+                *MP3_ENCODE_ARGS,
+                "-y",
+                output_path,
+            ],
+            duration=duration,
+            on_progress=on_progress,
+            cancel=cancel,
+        )
+        return
+    windows = _chunk_windows(total_frames, chunk_count)
+
+    def seconds(frames):
+        return _seconds_arg(frames * MP3_FRAME_SAMPLES / sample_rate)
+
+    # 合併各段的進度
+    processed = [0.0] * chunk_count
+    started = time.monotonic()
+    lock = threading.Lock()
+
+    def chunk_progress(index, chunk_info):
+        if chunk_info.get("out_time") is None:
+            return
+        with lock:
+            processed[index] = chunk_info["out_time"]
+            done = min(sum(processed), duration)
+        elapsed = time.monotonic() - started
+        speed = done / elapsed if elapsed > 0 else None
+        on_progress(
+            {
+                "percent": done / duration * 100,
+                "speed": speed,
+                "eta": (duration - done) / speed if speed else None,
+                "out_time": done,
+            }
+        )
+
+    with tempfile.TemporaryDirectory(prefix="chunks_") as temp_dir:
+
+        def encode_chunk(index):
+            start, end = windows[index][:2]
+            # 第一段不加 -ss，否則會略過 AAC 的前置取樣（priming）處理，開頭出現雜音
+            args = ["-ss", seconds(start)] if start else []
+            args += ["-i", input_path]
+            if end is not None:
+                args += ["-t", seconds(end - start)]
+            chunk_file = os.path.join(temp_dir, f"chunk{index}.mp3")
+            run_ffmpeg(
+                [
+                    *args,
+                    "-vn",
+                    *(["-af", audio_filter] if audio_filter else []),
+                    "-ar",
+                    str(sample_rate),
+                    "-ac",
+                    str(channels),
+                    *MP3_ENCODE_ARGS,
+                    "-reservoir",
+                    "0",
+                    # 第一段與最後一段保留 Xing/Info 音框，分別記錄編碼器延遲與結尾補白
+                    "-write_xing",
+                    "1" if index in (0, chunk_count - 1) else "0",
+                    "-id3v2_version",
+                    "0",
+                    chunk_file,
+                ],
+                on_progress=(
+                    (lambda chunk_info: chunk_progress(index, chunk_info))
+                    if on_progress
+                    else None
+                ),
+                cancel=cancel,
+            )
+            return chunk_file
+
+        with ThreadPoolExecutor(max_workers=chunk_count) as pool:
+            chunk_files = list(pool.map(encode_chunk, range(chunk_count)))
+
+        # 接合：丟棄每段開頭的重疊音框，只保留落在自己範圍內的音框
+        joined = os.path.join(temp_dir, "joined.mp3")
+        info_frame = padding = None
+        frame_count = 0
+        with open(joined, "wb") as out:
+            for (_, _, skip, keep), chunk_file in zip(windows, chunk_files):
+                with open(chunk_file, "rb") as f, mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ
+                ) as data:
+                    frames = []
+                    for offset, length, is_info in _mp3_frames(data):
+                        if not is_info:
+                            frames.append((offset, length))
+                            continue
+                        # 讓重新封裝時能讀到編碼器延遲與結尾補白，播放時才不會
+                        # 多出開頭的靜音或結尾的空白；各段的音框都對齊同一個格線，
+                        # 最後一段的補白就是整個檔案的補白
+                        if info_frame is None:
+                            info_frame = bytearray(data[offset : offset + length])
+                            out.write(info_frame)
+                        tag = read_lame_tag(data, offset)
+                        padding = tag[2] if tag else None
+                    frames = _kept_frames(frames, skip, keep)
+                    frame_count += len(frames)
+                    if frames:
+                        first, last = frames[0], frames[-1]
+                        out.write(data[first[0] : last[0] + last[1]])
+            if info_frame is not None:
+                _update_info_frame(info_frame, frame_count, out.tell(), padding=padding)
+                out.seek(0)
+                out.write(info_frame)
+
+        # 重新封裝一次以寫入正確的長度資訊（Xing 標頭）
+        run_ffmpeg(["-i", joined, "-c", "copy", "-y", output_path], cancel=cancel)
+
+
+def convert_mp4_to_mp3(
+    input_file,
+    on_progress=None,
+    cancel=None,
+    remux=False,
+    chunk_threshold=CHUNKED_ENCODE_THRESHOLD,
+    chunk_workers=None,
+    loudness=None,
+):
+    """將MP4檔案轉換為MP3，成功時回傳 True
+
+    remux 為 True 時盡量只重新封裝音訊串流（見 plan_conversion）。
+    loudness 為目標響度（LUFS）時以兩次處理標準化響度，第一次的量測結果會被快取。
+    長度超過 chunk_threshold 秒且需要編碼 MP3 時，改用 encode_mp3_chunked
+    以 chunk_workers 個核心平行編碼；chunk_threshold 為 None 時停用。
+    輸出會先寫入暫存檔，完成後才改名，中斷時不會留下看似完整的檔案。
+    TRANSIENT_ERRORS 會直接拋出，由呼叫端決定是否重試。
+    """
+    temp_path = None
+    try:
+        input_path = str(input_file).encode("utf-8").decode("utf-8")
+        output_path, codec_args = plan_conversion(input_path, remux, loudness)
+        output_path = output_path.encode("utf-8").decode("utf-8")
+        if os.path.abspath(output_path) == os.path.abspath(input_path):
+            # 例如輸入本身就是 .mp3，輸出會覆寫輸入檔案
+            print(f"輸出檔案與輸入相同，略過: {Path(input_path).name}")
+            return False
+        temp_path = partial_output_path(output_path)
+
+        filter_args = []
+        linear = True
+        if loudness is not None:
+            # MP3 最高只支援 48 kHz
+            sample_rate = (probe_media(input_path) or {}).get("sample_rate") or 44100
+            filter_args, measured = _loudnorm_args(
+                input_path, loudness, min(sample_rate, 48000), cancel
+            )
+            linear = loudnorm_is_linear(measured, loudness)
+
+        duration = None
+        if on_progress or chunk_threshold:
+            duration = get_duration_seconds(input_path)
+
+        if (
+            chunk_threshold
+            and duration
+            and duration >= chunk_threshold
+            and codec_args == list(MP3_ENCODE_ARGS)
+            # 動態壓縮的結果與前後文有關，無法分段處理
+            and (not filter_args or linear)
+        ):
+            # 很長的檔案：分段平行編碼
+            encode_mp3_chunked(
+                input_path,
+                temp_path,
+                duration,
+                workers=chunk_workers,
+                on_progress=on_progress,
+                cancel=cancel,
+                audio_filter=filter_args[1] if filter_args else None,
+            )
+        else:
+            # 使用ffmpeg進行轉換
+            run_ffmpeg(
+                [
+                    "-i",
+                    input_path,
+                    "-vn",  # 不要視訊軌
+                    *filter_args,
+                    *codec_args,
+                    "-y",  # 暫存檔可能是上次中斷時留下的
+                    temp_path,
+                ],
+                duration=duration,
+                on_progress=on_progress,
+                cancel=cancel,
+            )
+        os.replace(temp_path, output_path)
+        print(f"成功轉換: {Path(input_path).name} -> {Path(output_path).name}")
+        return True
+    except JobCancelled:
+        print(f"已取消轉換: {Path(str(input_file)).name}")
+        return False
+    except UnicodeEncodeError as e:
+        print(f"編碼錯誤: {str(e)}")
+        return False
+    except UnicodeDecodeError as e:
+        print(f"解碼錯誤: {str(e)}")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"轉換失敗: {str(e)}")
+        return False
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        print(f"未預期的錯誤: {str(e)}")
+        return False
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def convert_to_profiles(
+    input_file, profiles, on_progress=None, cancel=None, loudness=None
+):
+    """以一次讀取與解碼同時輸出多種格式或位元率，全部成功時回傳 True
+
+    profiles 為 OUTPUT_PROFILES 的名稱列表，輸出路徑見 profile_output_path。
+    所有輸出都在同一個 ffmpeg 行程中由同一個解碼器供應；標準化響度時濾鏡也只執行
+    一次，再以 asplit 分給各個編碼器。任何一個輸出失敗時不會留下任何輸出檔案。
+    TRANSIENT_ERRORS 會直接拋出。
+    """
+    temp_paths = []
+    try:
+        input_path = str(input_file)
+        outputs = [profile_output_path(input_path, profile) for profile in profiles]
+        temp_paths = [partial_output_path(output) for output in outputs]
+
+        maps = ["0:a:0"] * len(profiles)
+        args = ["-i", input_path]
+        if loudness is not None:
+            sample_rate = (probe_media(input_path) or {}).get("sample_rate") or 44100
+            filter_args, _ = _loudnorm_args(
+                input_path, loudness, min(sample_rate, 48000), cancel
+            )
+            if filter_args:
+                maps = [f"[out{i}]" for i in range(len(profiles))]
+                graph = (
+                    f"[0:a:0]{filter_args[1]},aresample={filter_args[3]},"
+                    f"asplit={len(profiles)}{''.join(maps)}"
+                )
+                args += ["-filter_complex", graph]
+        for profile, stream, temp_path in zip(profiles, maps, temp_paths):
+            args += ["-map", stream, *OUTPUT_PROFILES[profile][1], "-y", temp_path]
+
+        duration = get_duration_seconds(input_path) if on_progress else None
+        run_ffmpeg(args, duration=duration, on_progress=on_progress, cancel=cancel)
+        for temp_path, output in zip(temp_paths, outputs):
+            os.replace(temp_path, output)
+        names = ", ".join(Path(output).name for output in outputs)
+        print(f"成功轉換: {Path(input_path).name} -> {names}")
+        return True
+    except JobCancelled:
+        print(f"已取消轉換: {Path(str(input_file)).name}")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"轉換失敗: {str(e)}")
+        return False
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        print(f"未預期的錯誤: {str(e)}")
+        return False
+    finally:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def convert_file(
+    file,
+    on_progress=None,
+    cancel=None,
+    remux=False,
+    manifest=None,
+    loudness=None,
+    profiles=None,
+    chunk_workers=None,
+    output_cache=None,
+):
+    """轉換單一檔案並更新工作紀錄，回傳是否成功；TRANSIENT_ERRORS 會直接拋出
+
+    參數與 convert_files_parallel 相同，on_progress 則只以進度資訊呼叫。
+    manifest 為 JobManifest 時，輸出已是最新的檔案會直接略過。
+    output_cache 為 OutputCache 時，相同內容與參數轉換過的輸出會直接從快取取得。
+    """
+    if profiles:
+        outputs = [profile_output_path(file, profile) for profile in profiles]
+        params = ["profiles", *profiles]
+        # 每個輸出各自的快取參數
+        output_params = [["profile", profile] for profile in profiles]
+    else:
+        output, params = plan_conversion(file, remux, loudness)
+        outputs = [output]
+        output_params = [params]
+    if loudness is not None:
+        # 目標響度不同時需要重新轉換
+        params = params + ["loudnorm", loudness]
+        output_params = [p + ["loudnorm", loudness] for p in output_params]
+
+    if manifest is not None:
+        # 工作紀錄以第一個輸出檔案為準，其他輸出只確認仍然存在
+        if manifest.is_up_to_date(file, outputs[0], params) and all(
+            os.path.exists(output) for output in outputs[1:]
+        ):
+            print(f"略過已轉換: {Path(str(file)).name}")
+            return True
+        manifest.mark_running(file, outputs[0], params)
+
+    cache_keys = None
+    if output_cache is not None:
+        cache_keys = [
+            output_cache.key(file, output, p)
+            for output, p in zip(outputs, output_params)
+        ]
+        if None in cache_keys:
+            cache_keys = None
+        elif all(
+            output_cache.fetch(key, output) for key, output in zip(cache_keys, outputs)
+        ):
+            print(f"從快取取得: {Path(str(file)).name}")
+            if manifest is not None:
+                manifest.mark_done(file, outputs[0], params)
+            return True
+
+    try:
+        if profiles:
+            success = convert_to_profiles(
+                file,
+                profiles,
+                on_progress=on_progress,
+                cancel=cancel,
+                loudness=loudness,
+            )
+        else:
+            success = convert_mp4_to_mp3(
+                file,
+                on_progress=on_progress,
+                cancel=cancel,
+                remux=remux,
+                chunk_workers=chunk_workers,
+                loudness=loudness,
+            )
+    except TRANSIENT_ERRORS:
+        # 重試前先記錄為失敗，不要讓工作紀錄停在執行中
+        if manifest is not None:
+            manifest.mark_failed(file, outputs[0], params)
+        raise
+
+    if success and cache_keys is not None:
+        for key, output in zip(cache_keys, outputs):
+            output_cache.store(key, output)
+
+    if manifest is not None:
+        if success:
+            manifest.mark_done(file, outputs[0], params)
+        else:
+            manifest.mark_failed(file, outputs[0], params)
+    return success
+
+
+def convert_files_parallel(
+    input_files,
+    max_workers=None,
+    on_result=None,
+    on_progress=None,
+    cancel=None,
+    remux=False,
+    manifest=None,
+    loudness=None,
+    profiles=None,
+    output_cache=None,
+):
+    """以有限大小的工作池同時轉換多個檔案
+
+    input_files 可以是產生器（例如 folder_scan.scan_media_files）：檔案會邊產生邊送進
+    工作池，走訪尚未結束時第一批轉換就已開始，等待中的工作數也維持在固定上限。
+    回傳與 input_files 順序相同的 (檔案, 是否成功) 列表；
+    單一檔案失敗不會中斷其他檔案的轉換。
+    on_result 若有提供，會在每個檔案完成時以 (檔案, 是否成功) 呼叫；
+    on_progress 會以 (檔案, 進度資訊) 呼叫；remux 與 loudness 會傳給 convert_mp4_to_mp3，
+    因此標準化響度時各檔案的量測也會在工作池中平行進行。
+    manifest 為 JobManifest 時會記錄每個檔案的狀態，並略過輸出已是最新的檔案。
+    profiles 為 OUTPUT_PROFILES 的名稱列表時改用 convert_to_profiles 一次輸出多種格式。
+    output_cache 為 OutputCache 時，內容相同的檔案不會重複轉換。
+    """
+    workers = max(1, max_workers or DEFAULT_WORKERS)
+    files = iter(input_files)
+    # 先取出最多 workers 個檔案：檔案比工作數少時（例如只轉換一個長檔案），
+    # 以實際的同時轉換數計算分段數，產生器也只需等到這幾個檔案
+    first = list(islice(files, workers))
+    if not first:
+        return []
+    workers = len(first)
+    # 同時轉換多個檔案時，長檔案的分段數相對減少，避免超額使用 CPU
+    chunk_workers = max(1, DEFAULT_WORKERS // workers)
+
+    def convert_one(file):
+        file_progress = None
+        if on_progress:
+            file_progress = lambda info: on_progress(file, info)
+        return convert_file(
+            file,
+            on_progress=file_progress,
+            cancel=cancel,
+            remux=remux,
+            manifest=manifest,
+            loudness=loudness,
+            profiles=profiles,
+            chunk_workers=chunk_workers,
+            output_cache=output_cache,
+        )
+
+    order = []
+    results = {}
+    pending = {}  # future -> 檔案
+
+    def collect(futures):
+        for future in futures:
+            file = pending.pop(future)
+            try:
+                success = future.result()
+            except Exception as e:
+                print(f"未預期的錯誤: {str(e)}")
+                success = False
+            results[file] = success
+            if on_result:
+                on_result(file, success)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # ffmpeg 在子行程中執行，執行緒只負責等待，因此不受 GIL 限制
+        for file in chain(first, files):
+            if cancel is not None and cancel.cancelled:
+                break
+            order.append(file)
+            pending[pool.submit(convert_one, file)] = file
+            # 最多保留兩倍工作數的等待工作，其餘檔案留在產生器中
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(as_completed(list(pending)))
+
+    return [(f, results[f]) for f in order]
+
+
+def _seconds_arg(seconds):
+    """將秒數轉為 ffmpeg 參數（最多到微秒）"""
+    return f"{seconds:.6f}".rstrip("0").rstrip(".")
+
+
+def _check_trim_length(file_path, expected):
+    """檢查剪輯輸出的長度（從檔頭讀取，不寫入中繼資料快取），與預期不符時拋出例外
+
+    MP3 以 LAME 標頭扣除編碼器延遲與結尾補白，得到與解碼結果相同的長度；
+    其他格式以檔頭的長度為準，容許的誤差依取樣率換算。
+    """
+    info = read_media_info(file_path)
+    if not info or not info.get("sample_rate"):
+        return
+    actual = read_mp3_length(file_path) if info["codec"] == "mp3" else None
+    if actual is None:
+        actual = info["duration"]
+    if abs(actual - expected) > TRIM_TOLERANCE_SAMPLES / info["sample_rate"]:
+        raise RuntimeError(
+            f"剪輯後的長度 {actual:.3f} 秒與預期的 {expected:.3f} 秒不符"
+        )
+
+
+def _mp3_side_info(data, offset):
+    """解析 MPEG-1 Layer III 音框的旁資訊
+
+    回傳 (主資料區開始位置, main_data_begin, 主資料位元組數, 各顆粒的區塊類型)；
+    區塊類型依顆粒、聲道排列，每一項為 (block_type, mixed_block_flag)。
+    """
+    channels = 1 if (data[offset + 3] >> 6) == 0b11 else 2
+    side_start = offset + 4 + (0 if data[offset + 1] & 1 else 2)  # CRC
+    side_length = 32 if channels == 2 else 17
+    bits = int.from_bytes(data[side_start : side_start + side_length], "big")
+    position = side_length * 8
+
+    def read(count):
+        nonlocal position
+        position -= count
+        return (bits >> position) & ((1 << count) - 1)
+
+    main_data_begin = read(9)
+    read(3 if channels == 2 else 5)  # private_bits
+    read(4 * channels)  # scfsi
+    main_bits = 0
+    granules = []
+    for _ in range(2):
+        blocks = []
+        for _ in range(channels):
+            main_bits += read(12)  # part2_3_length
+            read(9 + 8 + 4)  # big_values、global_gain、scalefac_compress
+            if read(1):  # window_switching_flag
+                blocks.append((read(2), read(1)))
+                read(10 + 9)  # table_select、subblock_gain
+            else:
+                blocks.append((0, 0))
+                read(15 + 7)  # table_select、region0/1_count
+            read(3)  # preflag、scalefac_scale、count1table_select
+        granules.append(tuple(blocks))
+    return side_start + side_length, main_data_begin, -(-main_bits // 8), granules
+
+
+def _mp3_blocks_join(previous, following):
+    """前一個顆粒結尾的窗形與下一個顆粒開頭的窗形是否相容
+
+    長窗（區塊類型 0 與 3 的結尾、0 與 1 的開頭）只能接長窗，短窗只能接短窗；
+    不同編碼器各自決定的區塊類型接錯時，重疊相加會留下雜音。
+    """
+    for (prev_type, prev_mixed), (next_type, next_mixed) in zip(previous, following):
+        if prev_mixed or next_mixed:
+            return False
+        if (prev_type in (0, 3)) != (next_type in (0, 1)):
+            return False
+    return True
+
+
+def _mp3_repack(frames, reservoir):
+    """重新安排音框的主資料，在最後一個音框結尾留出 reservoir 個位元組
+
+    frames 為 (標頭, 旁資訊, 主資料) 列表。每個音框的主資料儘量往前放進前面音框的
+    空間（最多 511 位元組），空間不夠時把結尾的音框改為 320 kbps。
+    回傳音框位元組串列表，留出的空間位在最後 reservoir 個位元組；放不下時回傳 None。
+    """
+    sample_rate = _MP3_SAMPLE_RATES[(frames[0][0][2] >> 2) & 0b11]
+    for upsized in range(len(frames) + 1):
+        headers = []
+        areas = []
+        for index, (header, side, _) in enumerate(frames):
+            length = 144000 * _MP3_BITRATES[(header[2] >> 4)] // sample_rate + (
+                (header[2] >> 1) & 1
+            )
+            if index >= len(frames) - upsized:
+                header = bytes(
+                    (
+                        header[0],
+                        header[1],
+                        (_MP3_MAX_BITRATE_INDEX << 4) | (header[2] & 0x0D),
+                        header[3],
+                    )
+                )
+                length = 144000 * 320 // sample_rate
+            headers.append(header)
+            areas.append(length - len(header) - len(side))
+
+        placements = []
+        area_start = cursor = 0
+        for area, (_, _, main_data) in zip(areas, frames):
+            position = max(cursor, area_start - _MP3_MAX_RESERVOIR)
+            if position + len(main_data) > area_start + area:
+                break
+            placements.append(position)
+            cursor = position + len(main_data)
+            area_start += area
+        else:
+            if area_start - cursor < reservoir:
+                continue
+            stream = bytearray(area_start)
+            for position, (_, _, main_data) in zip(placements, frames):
+                stream[position : position + len(main_data)] = main_data
+            result = []
+            area_start = 0
+            for header, area, position, (_, side, _) in zip(
+                headers, areas, placements, frames
+            ):
+                side = bytearray(side)
+                main_data_begin = area_start - position
+                side[0] = main_data_begin >> 1
+                side[1] = (side[1] & 0x7F) | ((main_data_begin & 1) << 7)
+                result.append(
+                    bytearray(header) + side + stream[area_start : area_start + area]
+                )
+                area_start += area
+            return result
+    return None
+
+
+def _trim_mp3_spliced(input_path, output_path, start, end, on_progress, cancel):
+    """MP3 的精準剪輯：只重新編碼切點附近的幾個音框，其餘音框直接複製
+
+    重新編碼的開頭對齊原始檔的音框格線，在區塊類型相容的音框接上原始音框；
+    接點的原始音框會引用位元儲存槽中前面音框的資料，因此把這些位元組搬進
+    重新編碼的音框結尾。切點的取樣位置記錄在 LAME 標頭的延遲與補白中。
+    只處理 MPEG-1 Layer III；無法接合時回傳 False，由呼叫端改為整段重新編碼。
+    """
+    with open(input_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        frames = _mp3_frames(data)
+        first = next(frames, None)
+        if first is None:
+            return False
+        # 原始檔解碼時開頭略過的取樣：音訊的第 a 個取樣位在音框串流的 a + skip 處
+        skip = padding = 0
+        tag = read_lame_tag(data, first[0]) if first[2] else None
+        if tag is None:
+            frames = chain([first], frames)
+        elif tag[1] is not None:
+            skip = tag[1] + MP3_DECODER_DELAY
+            padding = max(tag[2] - MP3_DECODER_DELAY, 0)
+
+        header = int.from_bytes(data[first[0] : first[0] + 4], "big")
+        sample_rate = _MP3_SAMPLE_RATES[(header >> 10) & 0b11]
+        channels = 1 if (header >> 6) & 0b11 == 0b11 else 2
+        begin = round(start * sample_rate)
+        finish = round(end * sample_rate)
+        # 重新編碼的第 m 個音框對應原始的第 first_frame + m 個音框
+        head_skip = _LAME_ENCODER_DELAY + MP3_DECODER_DELAY
+        first_frame = (begin + skip - head_skip) // MP3_FRAME_SAMPLES
+        last_frame = (finish + skip - 1) // MP3_FRAME_SAMPLES
+        head_end = first_frame + TRIM_JOIN_CANDIDATES + 1 + TRIM_LOOKAHEAD_FRAMES
+        source = list(islice(frames, max(last_frame, head_end) + 1))
+        if len(source) <= last_frame:
+            # 片段超過檔案結尾
+            finish = min(finish, len(source) * MP3_FRAME_SAMPLES - skip - padding)
+            last_frame = (finish + skip - 1) // MP3_FRAME_SAMPLES
+        source = source[: max(last_frame, head_end) + 1]
+        if last_frame <= first_frame or finish <= begin:
+            return False
+        for offset, _, _ in source[max(first_frame, 0) : head_end]:
+            following = int.from_bytes(data[offset : offset + 4], "big")
+            mono = (following >> 6) & 0b11 == 0b11
+            if (following ^ header) & 0xC00 or mono != (channels == 1):
+                return False  # 取樣率或聲道數改變
+
+        with tempfile.TemporaryDirectory(prefix="trim_") as temp_dir:
+            # 從切點前 TRIM_PREROLL_FRAMES 個音框開始，以不含 Xing 標頭的原始音框解碼
+            decode_start = max(first_frame - TRIM_PREROLL_FRAMES, 0)
+            decode_frames = source[decode_start:head_end]
+            raw = os.path.join(temp_dir, "source.mp3")
+            with open(raw, "wb") as out:
+                last = decode_frames[-1]
+                out.write(data[decode_frames[0][0] : last[0] + last[1]])
+            head_start = first_frame * MP3_FRAME_SAMPLES + head_skip
+            silence = max(-head_start, 0)  # 切點在檔案開頭時，前面補上靜音
+            head_filter = (
+                f"atrim=start_sample={max(head_start, 0) - decode_start * MP3_FRAME_SAMPLES}"
+                ",asetpts=PTS-STARTPTS"
+            )
+            if silence:
+                head_filter += f",adelay=delays={silence}S:all=1"
+            head = os.path.join(temp_dir, "head.mp3")
+            run_ffmpeg(
+                [
+                    "-f",
+                    "mp3",
+                    "-i",
+                    raw,
+                    "-af",
+                    head_filter,
+                    "-ar",
+                    str(sample_rate),
+                    "-ac",
+                    str(channels),
+                    *MP3_ENCODE_ARGS,
+                    "-reservoir",
+                    "0",
+                    "-write_xing",
+                    "1",
+                    "-id3v2_version",
+                    "0",
+                    head,
+                ],
+                cancel=cancel,
+            )
+            with open(head, "rb") as f:
+                head_data = f.read()
+            head_frames = list(_mp3_frames(head_data))
+            if not head_frames:
+                return False
+            info_frame = bytearray(
+                head_data[head_frames[0][0] : head_frames[0][0] + head_frames[0][1]]
+            )
+            tag = read_lame_tag(info_frame, 0)
+            if not tag or tag[1] != _LAME_ENCODER_DELAY:
+                return False  # 音框格線無法對齊
+            encoded = []
+            for offset, _, _ in head_frames[1:]:
+                main_start, main_data_begin, size, granules = _mp3_side_info(
+                    head_data, offset
+                )
+                if main_data_begin or head_data[offset + 1] & 1 == 0:
+                    return False  # 關閉位元儲存槽且沒有 CRC 時才能重新安排
+                encoded.append(
+                    (
+                        head_data[offset : offset + 4],
+                        head_data[offset + 4 : main_start],
+                        head_data[main_start : main_start + size],
+                        granules,
+                    )
+                )
+
+            joined = None
+            for join in range(
+                max(first_frame + 1, 1),
+                min(first_frame + TRIM_JOIN_CANDIDATES, last_frame) + 1,
+            ):
+                count = join - first_frame
+                if count > len(encoded):
+                    break
+                offset = source[join][0]
+                _, reservoir, _, granules = _mp3_side_info(data, offset)
+                if not _mp3_blocks_join(encoded[count - 1][3][1], granules[0]):
+                    continue
+                packed = _mp3_repack(
+                    [frame[:3] for frame in encoded[:count]], reservoir
+                )
+                if packed is None:
+                    continue
+                # 接點的主資料從前面音框中最後 reservoir 個位元組開始
+                previous = bytearray()
+                for index in range(join - 1, -1, -1):
+                    if len(previous) >= reservoir:
+                        break
+                    prev_offset, prev_length, _ = source[index]
+                    prev_start = _mp3_side_info(data, prev_offset)[0]
+                    previous[:0] = data[prev_start : prev_offset + prev_length]
+                if len(previous) < reservoir:
+                    continue
+                if reservoir:
+                    packed[-1][-reservoir:] = previous[-reservoir:]
+                joined = (join, packed)
+                break
+            if joined is None:
+                return False
+            join, packed = joined
+
+            # 更新 Xing 標頭的音框數、位元組數與 LAME 標頭的延遲、補白
+            body_start = source[join][0]
+            body_end = source[last_frame][0] + source[last_frame][1]
+            total = len(packed) + last_frame + 1 - join
+            delay = begin + skip - first_frame * MP3_FRAME_SAMPLES
+            trailing = total * MP3_FRAME_SAMPLES - delay - (finish - begin)
+            _update_info_frame(
+                info_frame,
+                total,
+                len(info_frame) + sum(map(len, packed)) + body_end - body_start,
+                delay=delay - MP3_DECODER_DELAY,
+                padding=trailing + MP3_DECODER_DELAY,
+            )
+
+            spliced = os.path.join(temp_dir, "joined.mp3")
+            with open(spliced, "wb") as out:
+                out.write(info_frame)
+                for frame in packed:
+                    out.write(frame)
+                out.write(data[body_start:body_end])
+
+            # 重新封裝：寫入正確的 Xing 標頭並帶上原始檔的標籤
+            run_ffmpeg(
+                [
+                    "-i",
+                    spliced,
+                    "-i",
+                    input_path,
+                    "-map",
+                    "0:a",
+                    "-map_metadata",
+                    "1",
+                    "-c",
+                    "copy",
+                    "-y",
+                    output_path,
+                ],
+                duration=(finish - begin) / sample_rate,
+                on_progress=on_progress,
+                cancel=cancel,
+            )
+    return True
+
+
+def _trim_reencode(input_path, output_path, start, end, info, on_progress, cancel):
+    """以 atrim 在取樣層級裁切後重新編碼整個片段
+
+    輸入端先定位到切點前 TRIM_PREROLL 秒，不必從頭解碼，也讓解碼器在切點前就已穩定。
+    輸出編碼依副檔名決定，其他副檔名使用 ffmpeg 的預設編碼器。
+    """
+    base = max(start - TRIM_PREROLL, 0)
+    layout = []
+    if info.get("sample_rate"):
+        layout += ["-ar", str(info["sample_rate"])]
+    if info.get("channels"):
+        layout += ["-ac", str(info["channels"])]
+    ext = os.path.splitext(output_path)[1].lower()
+    encode_args = MERGE_TARGETS.get(ext, (None, ()))[1]
+
+    run_ffmpeg(
+        [
+            "-ss",
+            _seconds_arg(base),
+            "-i",
+            input_path,
+            "-map",
+            "0:a:0",
+            "-af",
+            f"atrim=start={_seconds_arg(start - base)}:end={_seconds_arg(end - base)}"
+            ",asetpts=PTS-STARTPTS",
+            *encode_args,
+            *layout,
+            "-y",
+            output_path,
+        ],
+        duration=end - start,
+        on_progress=on_progress,
+        cancel=cancel,
+    )
+
+
+def _trim_accurate(input_path, output_path, start, end, on_progress, cancel):
+    """精準剪輯：切點精準到取樣
+
+    MP3 剪成 MP3 時只重新編碼開頭的幾個音框，其餘直接複製（見 _trim_mp3_spliced）。
+    其他格式整段重新編碼：PCM 重新編碼與複製一樣快，AAC 等格式的前置取樣
+    無法在音框層級接合。
+    """
+    info = probe_media(input_path) or {}
+    spliced = (
+        info.get("codec") == "mp3"
+        and os.path.splitext(output_path)[1].lower() == ".mp3"
+        and _trim_mp3_spliced(input_path, output_path, start, end, on_progress, cancel)
+    )
+    if not spliced:
+        _trim_reencode(input_path, output_path, start, end, info, on_progress, cancel)
+
+    # 片段超過檔案結尾時以檔案長度為準
+    expected = (min(end, info["duration"]) if info.get("duration") else end) - start
+    _check_trim_length(output_path, expected)
+
+
+def _trim_copy(input_path, output_path, start, end, on_progress, cancel):
+    run_ffmpeg(
+        [
+            "-ss",
+            _seconds_arg(start),  # 放在 -i 之前：直接跳到開始時間，不必讀取前面的內容
+            "-i",
+            input_path,
+            "-t",
+            _seconds_arg(end - start),  # 片段長度
+            "-c",
+            "copy",  # 直接複製編碼，不重新編碼
+            "-y",
+            output_path,
+        ],
+        duration=end - start,
+        on_progress=on_progress,
+        cancel=cancel,
+    )
+
+
+def trim_audio(
+    input_file,
+    output_file,
+    start_time,
+    end_time,
+    on_progress=None,
+    cancel=None,
+    accurate=False,
+):
+    """剪輯音訊檔案
+
+    在輸入端定位開始時間，不必從頭讀取檔案。accurate 為 True 時切點精準到取樣，
+    不受封包邊界限制；MP3 只重新編碼開頭的幾個音框，其餘直接複製。
+    輸出會先寫入暫存檔，完成後才改名（會取代既有的檔案）。
+    成功時回傳 True；TRANSIENT_ERRORS 會直接拋出。
+    """
+    temp_path = None
+    try:
+        input_path = str(input_file).encode("utf-8").decode("utf-8")
+        output_path = str(output_file).encode("utf-8").decode("utf-8")
+
+        try:
+            start = parse_time(start_time)
+            end = parse_time(end_time)
+        except ValueError as e:
+            print(f"剪輯失敗: {str(e)}")
+            return False
+        if end <= start:
+            print("剪輯失敗: 結束時間必須晚於開始時間")
+            return False
+        if os.path.abspath(output_path) == os.path.abspath(input_path):
+            print(f"輸出檔案與輸入相同，無法剪輯: {Path(input_path).name}")
+            return False
+        temp_path = partial_output_path(output_path)
+
+        if accurate:
+            _trim_accurate(input_path, temp_path, start, end, on_progress, cancel)
+        else:
+            _trim_copy(input_path, temp_path, start, end, on_progress, cancel)
+        os.replace(temp_path, output_path)
+        print(f"成功剪輯音訊: {Path(output_path).name}")
+        return True
+    except JobCancelled:
+        print(f"已取消剪輯: {Path(str(output_file)).name}")
+        return False
+    except UnicodeEncodeError as e:
+        print(f"編碼錯誤: {str(e)}")
+        return False
+    except UnicodeDecodeError as e:
+        print(f"解碼錯誤: {str(e)}")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"剪輯失敗: {str(e)}")
+        return False
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        print(f"未預期的錯誤: {str(e)}")
+        return False
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def format_time(seconds):
+    """將秒數轉換為 HH:MM:SS 格式"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    if hours > 0:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def parse_time(time_str):
+    """將時間解析為秒數
+
+    接受秒數（例如 90 或 "1.5"）以及 MM:SS、HH:MM:SS 字串，秒數可含小數
+    （例如 01:02.5）。格式錯誤或為負數時拋出 ValueError。
+    """
+    if isinstance(time_str, (int, float)) and not isinstance(time_str, bool):
+        total = float(time_str)
+    else:
+        match = _TIME_PATTERN.match(str(time_str).strip())
+        if not match:
+            raise ValueError(f"無法解析的時間：{time_str}")
+        hours, minutes, seconds = match.groups()
+        total = int(hours or 0) * 3600 + int(minutes or 0) * 60 + float(seconds)
+    if not math.isfinite(total) or total < 0:
+        raise ValueError(f"無法解析的時間：{time_str}")
+    return int(total) if total.is_integer() else total
+
+
+def parse_time_list(text):
+    """解析以逗號或空白分隔的多個時間點，格式錯誤或未遞增時回傳 None"""
+    times = [t for t in text.replace("，", ",").replace(",", " ").split() if t]
+    try:
+        seconds = [parse_time(t) for t in times]
+    except ValueError:
+        return None
+    # 時間點必須大於 0 且遞增
+    if not seconds or any(b <= a for a, b in zip([0] + seconds, seconds)):
+        return None
+    return times
+
+
+def split_audio(input_file, split_times, on_progress=None, cancel=None):
+    """在指定的時間點將音訊檔案分割為多個部分
+
+    split_times 可為單一時間或時間列表（秒數、HH:MM:SS 或 MM:SS 字串，
+    或直接使用數字）；使用 ffmpeg 的 segment 封裝器一次讀取就輸出所有部分。
+    回傳 (是否成功, 輸出檔案列表)；TRANSIENT_ERRORS 會直接拋出。
+    """
+    try:
+        if isinstance(split_times, str):
+            split_times = [split_times]
+        cut_points = sorted(parse_time(t) for t in split_times)
+
+        input_path = str(input_file).encode("utf-8").decode("utf-8")
+        file_name = os.path.splitext(os.path.basename(input_file))[0]
+        file_ext = os.path.splitext(input_file)[1]
+        output_dir = os.path.dirname(input_file)
+        # segment 封裝器以 %d 編號輸出檔案，檔名中的 % 需要跳脫
+        pattern = os.path.join(
+            output_dir, f"{file_name.replace('%', '%%')}_part%d{file_ext}"
+        )
+
+        total = get_duration_seconds(input_path) if on_progress else None
+
+        run_ffmpeg(
+            [
+                "-i",
+                input_path,
+                "-map",
+                "0:a",
+                "-c",
+                "copy",  # 直接複製編碼，不重新編碼
+                "-f",
+                "segment",
+                "-segment_times",
+                ",".join(_seconds_arg(t) for t in cut_points),  # 所有分割點
+                "-segment_start_number",
+                "1",
+                "-reset_timestamps",
+                "1",
+                pattern,
+            ],
+            duration=total,
+            on_progress=on_progress,
+            cancel=cancel,
+        )
+
+        # 分割點超過檔案長度時，實際輸出的部分會比較少
+        output_paths = []
+        for i in range(1, len(cut_points) + 2):
+            path = os.path.join(output_dir, f"{file_name}_part{i}{file_ext}")
+            if os.path.exists(path):
+                output_paths.append(path)
+
+        print(f"成功分割音訊: {Path(input_path).name}")
+        return True, output_paths
+    except JobCancelled:
+        print(f"已取消分割: {Path(str(input_file)).name}")
+        return False, []
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        print(f"分割失敗: {str(e)}")
+        return False, []
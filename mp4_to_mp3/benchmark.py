@@ -0,0 +1,377 @@
+"""轉換、合併、剪輯與分割的效能測試
+
+測試用的媒體檔案會以 ffmpeg 的 lavfi 音源在本機產生，不需要下載任何檔案。
+每個測試案例都在獨立的子行程中執行，以便分別量測記憶體峰值。
+
+範例：
+    python benchmark.py --quick -o bench.json
+    python benchmark.py -o new.json --baseline bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource  # 只有 Unix 平台提供
+except ImportError:
+    resource = None
+
+# 測試媒體：名稱 -> (長度秒數, 副檔名, 額外的 ffmpeg 輸出參數)
+MEDIA = {
+    "short": (30, ".mp4", ["-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac"]),
+    "long": (2 * 3600, ".mp4", ["-c:a", "aac"]),
+    "mp3": (60, ".mp3", ["-c:a", "libmp3lame", "-ar", "44100", "-ac", "2"]),
+    "wav": (60, ".wav", ["-c:a", "pcm_s16le", "-ar", "48000", "-ac", "1"]),
+}
+# 長檔案至少 30 分鐘，才會用到分段平行編碼（audio_tools.CHUNKED_ENCODE_THRESHOLD）
+QUICK_DURATIONS = {"short": 5, "long": 30 * 60, "mp3": 10, "wav": 10}
+# 長檔案標準化響度的目標（LUFS）
+LOUDNESS_TARGET = -16.0
+
+
+def _hms(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _ffmpeg_version():
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-version"], capture_output=True, text=True, check=True
+        )
+        return result.stdout.splitlines()[0]
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def generate_media(work_dir, name, index=0, quick=False):
+    """以 lavfi 產生測試媒體檔案，已存在時直接沿用"""
+    duration, ext, codec_args = MEDIA[name]
+    if quick:
+        duration = QUICK_DURATIONS[name]
+    path = os.path.join(work_dir, f"{name}_{duration}s_{index}{ext}")
+    if os.path.exists(path):
+        return path, duration
+
+    # 每個檔案使用不同頻率，避免內容完全相同
+    inputs = ["-f", "lavfi", "-i", f"sine=frequency={220 + index * 20}:d={duration}"]
+    if ext == ".mp4" and "-c:v" in codec_args:
+        inputs += ["-f", "lavfi", "-i", f"color=c=black:s=160x120:r=5:d={duration}"]
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", *inputs, *codec_args, "-shortest", path],
+        check=True,
+    )
+    return path, duration
+
+
+def build_cases(work_dir, quick=False):
+    """建立測試案例列表"""
+    cpu = os.cpu_count() or 1
+    batch_sizes = [1, 4] if quick else [1, 4, 16]
+    worker_counts = sorted({1, 2, cpu})
+
+    def media(name, count):
+        files = [generate_media(work_dir, name, i, quick) for i in range(count)]
+        return [path for path, _ in files], sum(d for _, d in files)
+
+    cases = []
+    for batch in batch_sizes:
+        files, audio_seconds = media("short", batch)
+        for workers in worker_counts:
+            if workers > batch:
+                continue
+            for remux in (False, True):
+                cases.append(
+                    {
+                        "name": f"convert{'-remux' if remux else ''}"
+                        f"-b{batch}-w{workers}",
+                        "op": "convert",
+                        "inputs": files,
+                        "workers": workers,
+                        "remux": remux,
+                        "files": batch,
+                        "audio_seconds": audio_seconds,
+                    }
+                )
+
+    matched, matched_seconds = media("mp3", 4)
+    wav, wav_seconds = media("wav", 2)
+    cases.append(
+        {
+            "name": "merge-matched",
+            "op": "merge",
+            "inputs": matched,
+            "files": len(matched),
+            "audio_seconds": matched_seconds,
+        }
+    )
+    cases.append(
+        {
+            "name": "merge-mixed",
+            "op": "merge",
+            "inputs": matched[:2] + wav,
+            "files": 4,
+            "audio_seconds": matched_seconds / 2 + wav_seconds,
+        }
+    )
+
+    (long_file,), long_seconds = media("long", 1)
+    # 長檔案的轉換會分段平行編碼；標準化響度時還要先完整量測一次
+    for loudness in (None, LOUDNESS_TARGET):
+        cases.append(
+            {
+                "name": f"convert-long{'-loudness' if loudness is not None else ''}",
+                "op": "convert",
+                "inputs": [long_file],
+                "workers": 1,
+                "remux": False,
+                "loudness": loudness,
+                "files": 1,
+                "audio_seconds": long_seconds,
+            }
+        )
+    start = long_seconds // 2
+    cases.append(
+        {
+            "name": "trim-middle-120s",
+            "op": "trim",
+            "inputs": [long_file],
+            "start": _hms(start),
+            "end": _hms(start + 120),
+            "files": 1,
+            "audio_seconds": 120,
+        }
+    )
+    step = long_seconds // 10
+    cases.append(
+        {
+            "name": "split-10-parts",
+            "op": "split",
+            "inputs": [long_file],
+            "times": [_hms(t) for t in range(step, long_seconds, step)][:9],
+            "files": 1,
+            "audio_seconds": long_seconds,
+        }
+    )
+    return cases
+
+
+def _link_inputs(paths, out_dir):
+    """把輸入檔案連結到暫存目錄
+
+    轉換與分割的結果會寫在輸入檔案旁，連結後輸出就會留在暫存目錄中，
+    案例結束時一併刪除，不會留在重複使用的測試媒體目錄裡。
+    """
+    linked = []
+    for path in paths:
+        link = os.path.join(out_dir, os.path.basename(path))
+        try:
+            os.symlink(os.path.abspath(path), link)
+        except OSError:
+            shutil.copy(path, link)
+        linked.append(link)
+    return linked
+
+
+def run_case(case):
+    """在目前的行程中執行一個測試案例，回傳量測結果"""
+    # 延遲載入，父行程不需要載入轉換模組
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import audio_tools
+
+    out_dir = tempfile.mkdtemp(prefix="bench_out_")
+    ok = True
+    try:
+        start = time.perf_counter()
+        if case["op"] == "convert":
+            results = audio_tools.convert_files_parallel(
+                _link_inputs(case["inputs"], out_dir),
+                max_workers=case["workers"],
+                remux=case["remux"],
+                loudness=case.get("loudness"),
+            )
+            ok = all(success for _, success in results)
+        elif case["op"] == "merge":
+            ok = audio_tools.merge_audio_files(
+                case["inputs"], os.path.join(out_dir, "merged.mp3")
+            )
+        elif case["op"] == "trim":
+            src = case["inputs"][0]
+            ok = audio_tools.trim_audio(
+                src,
+                os.path.join(out_dir, "trimmed" + os.path.splitext(src)[1]),
+                case["start"],
+                case["end"],
+            )
+        elif case["op"] == "split":
+            (src,) = _link_inputs(case["inputs"], out_dir)
+            ok, _ = audio_tools.split_audio(src, case["times"])
+        wall = time.perf_counter() - start
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    result = {"ok": ok, "wall_seconds": wall}
+    if resource is not None:
+        # Linux 上 ru_maxrss 的單位是 KiB，macOS 則是 bytes
+        scale = 1 if sys.platform == "darwin" else 1024
+        result["peak_rss_self"] = (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        )
+        result["peak_rss_children"] = (
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+        )
+    return result
+
+
+def _run_case_subprocess(case, cache_dir):
+    env = dict(os.environ, MP4_TO_MP3_CACHE_DIR=cache_dir)
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "_case", json.dumps(case)],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if proc.returncode != 0:
+        return {"ok": False, "error": proc.stderr.strip()[-500:]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(work_dir, quick=False, repeat=3, only=None):
+    """執行所有測試案例，回傳可寫成 JSON 的結果"""
+    os.makedirs(work_dir, exist_ok=True)
+    print("產生測試媒體...", file=sys.stderr)
+    cases = build_cases(work_dir, quick)
+    if only:
+        cases = [case for case in cases if any(o in case["name"] for o in only)]
+
+    results = []
+    for case in cases:
+        runs = []
+        for _ in range(repeat):
+            # 每次都使用新的快取目錄，避免探測結果被上一次執行快取
+            with tempfile.TemporaryDirectory(prefix="bench_cache_") as cache_dir:
+                runs.append(_run_case_subprocess(case, cache_dir))
+        ok = all(run["ok"] for run in runs)
+        wall = statistics.median(run.get("wall_seconds", 0) for run in runs)
+        entry = {
+            "name": case["name"],
+            "op": case["op"],
+            "files": case["files"],
+            "workers": case.get("workers"),
+            "ok": ok,
+            "wall_seconds": round(wall, 4),
+            "files_per_second": round(case["files"] / wall, 3) if wall else None,
+            "audio_seconds_per_second": (
+                round(case["audio_seconds"] / wall, 2) if wall else None
+            ),
+            "peak_rss_self": max((run.get("peak_rss_self") or 0) for run in runs),
+            "peak_rss_children": max(
+                (run.get("peak_rss_children") or 0) for run in runs
+            ),
+        }
+        if not ok:
+            entry["error"] = next((r["error"] for r in runs if "error" in r), None)
+        print(
+            f"{entry['name']:<28} {entry['wall_seconds']:>9.3f}s "
+            f"{entry['files_per_second'] or 0:>8.2f} 檔/秒 "
+            f"{entry['audio_seconds_per_second'] or 0:>9.1f}x",
+            file=sys.stderr,
+        )
+        results.append(entry)
+
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ffmpeg": _ffmpeg_version(),
+            "quick": quick,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold=0.1):
+    """與基準結果比較，回傳變慢超過 threshold 比例的案例名稱"""
+    base = {entry["name"]: entry for entry in baseline["results"]}
+    regressions = []
+    print(f"{'案例':<28} {'基準':>9} {'目前':>9} {'變化':>8}", file=sys.stderr)
+    for entry in report["results"]:
+        old = base.get(entry["name"])
+        if not old or not old["wall_seconds"] or not entry["ok"]:
+            continue
+        change = entry["wall_seconds"] / old["wall_seconds"] - 1
+        print(
+            f"{entry['name']:<28} {old['wall_seconds']:>9.3f} "
+            f"{entry['wall_seconds']:>9.3f} {change:>+8.1%}",
+            file=sys.stderr,
+        )
+        if change > threshold:
+            regressions.append(entry["name"])
+    return regressions
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["_case"]:
+        # 子行程：執行單一案例並以 JSON 回報
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                result = run_case(json.loads(argv[1]))
+            finally:
+                sys.stdout = stdout
+        print(json.dumps(result))
+        return 0
+
+    parser = argparse.ArgumentParser(description="音訊處理效能測試")
+    parser.add_argument(
+        "--work-dir",
+        default=os.path.join(tempfile.gettempdir(), "mp4_to_mp3_bench"),
+        help="測試媒體存放位置（會重複使用）",
+    )
+    parser.add_argument("-o", "--output", help="將結果寫入 JSON 檔案")
+    parser.add_argument("--baseline", help="與此 JSON 基準結果比較")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="變慢超過此比例視為退步（預設 0.1）",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="使用較短的測試媒體，快速執行"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="每個案例執行次數")
+    parser.add_argument(
+        "--only", action="append", help="只執行名稱包含此字串的案例，可重複指定"
+    )
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.work_dir, args.quick, args.repeat, args.only)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"效能退步：{', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
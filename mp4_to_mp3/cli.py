@@ -0,0 +1,564 @@
+"""命令列（無圖形介面）模式
+
+不會載入 tkinter，可在沒有顯示器的伺服器、cron 或排程工具中執行。
+結果以 JSON 輸出到標準輸出，ffmpeg 與處理訊息則輸出到標準錯誤。
+
+範例：
+    python cli.py convert "recordings/**/*.mp4" -j 8
+    python cli.py merge a.mp3 b.mp3 -o merged.mp3
+    python cli.py convert lectures/ --loudness -16
+    python cli.py convert talk.mp4 --profile mp3-v2 --profile opus-64k
+    python cli.py trim input.mp3 --start 01:00 --end 02:30 -o clip.mp3
+    python cli.py split input.mp3 --at 10:00,20:00,30:00
+    python cli.py split meeting.mp3 --silence 3
+    python cli.py clips concert.mp3 concert.cue -o tracks/ -j 4
+    python cli.py probe recordings/
+    python cli.py watch /srv/dropbox -j 4
+    python cli.py serve
+    python cli.py worker http://server:8765 -j 4
+    python cli.py submit http://server:8765 /srv/share/lectures/ --wait
+    curl -s https://example.com/talk.mp4 | python cli.py pipe convert > talk.mp3
+    python cli.py pipe trim --start 01:00 --end 02:00 < talk.mp3 > clip.mp3
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+
+import audio_tools
+import streaming
+from folder_scan import scan_media_files
+from job_manifest import get_job_manifest
+from output_cache import get_output_cache
+
+# 結束代碼
+EXIT_OK = 0
+EXIT_FAILED = 1  # 至少有一個檔案處理失敗
+EXIT_USAGE = 2  # 參數錯誤或找不到輸入檔案
+
+MEDIA_EXTENSIONS = (".mp4", ".m4a", ".mp3", ".wav", ".aac", ".flac", ".ogg", ".opus")
+
+
+def iter_inputs(patterns, extensions, probe=False):
+    """展開萬用字元與目錄，逐一產生不重複的檔案
+
+    目錄會以 scan_media_files 邊走訪邊產生副檔名符合 extensions 的檔案；
+    probe 為 True 時，其他副檔名的檔案若含有音訊串流也會產生。
+    """
+    seen = set()
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        for match in matches:
+            if os.path.isdir(match):
+                files = scan_media_files(match, extensions, probe=probe)
+            elif os.path.isfile(match):
+                files = [match]
+            else:
+                print(f"找不到檔案：{match}", file=sys.stderr)
+                continue
+            for file in files:
+                if file not in seen:
+                    seen.add(file)
+                    yield file
+
+
+def expand_inputs(patterns, extensions):
+    """展開萬用字元與目錄，回傳不重複且保持順序的檔案列表"""
+    return list(iter_inputs(patterns, extensions))
+
+
+def cmd_convert(args):
+    # 邊走訪目錄邊轉換，不必等到找出所有檔案；已是 MP3 的檔案（例如先前的輸出）不再轉換
+    inputs = (
+        file
+        for file in iter_inputs(args.inputs, (".mp4",), probe=args.probe)
+        if os.path.splitext(file)[1].lower() != ".mp3"
+    )
+    # --force 時不使用工作紀錄與輸出快取，一律重新轉換
+    manifest = None if args.force else get_job_manifest()
+    output_cache = None if args.force else get_output_cache()
+    results = audio_tools.convert_files_parallel(
+        inputs,
+        max_workers=args.jobs,
+        remux=args.remux,
+        manifest=manifest,
+        loudness=args.loudness,
+        profiles=args.profile,
+        output_cache=output_cache,
+    )
+    if not results:
+        return None
+    if args.profile:
+        return [
+            {
+                "input": file,
+                "outputs": [
+                    audio_tools.profile_output_path(file, profile)
+                    for profile in args.profile
+                ],
+                "ok": success,
+            }
+            for file, success in results
+        ]
+    return [
+        {
+            "input": file,
+            "output": audio_tools.plan_conversion(file, args.remux, args.loudness)[0],
+            "ok": success,
+        }
+        for file, success in results
+    ]
+
+
+def cmd_merge(args):
+    inputs = expand_inputs(args.inputs, MEDIA_EXTENSIONS)
+    if len(inputs) < 2:
+        print("請至少提供兩個音訊檔案進行合併", file=sys.stderr)
+        return None
+    success = audio_tools.merge_audio_files(inputs, args.output, loudness=args.loudness)
+    return [{"inputs": inputs, "output": args.output, "ok": success}]
+
+
+def cmd_trim(args):
+    success = audio_tools.trim_audio(
+        args.input, args.output, args.start, args.end, accurate=args.accurate
+    )
+    return [{"input": args.input, "output": args.output, "ok": success}]
+
+
+def cmd_split(args):
+    if args.silence is not None:
+        # 延遲載入，只有自動分割需要 NumPy
+        import silence
+
+        if not silence.is_available():
+            print("自動分割需要安裝 NumPy", file=sys.stderr)
+            return None
+        success, outputs = silence.auto_split_audio(
+            args.input, min_silence=args.silence, threshold_db=args.threshold
+        )
+        return [{"input": args.input, "outputs": outputs, "ok": success}]
+
+    split_times = audio_tools.parse_time_list(" ".join(args.at))
+    if split_times is None:
+        print("分割時間點格式錯誤，且必須由小到大排列", file=sys.stderr)
+        return None
+    success, outputs = audio_tools.split_audio(args.input, split_times)
+    return [{"input": args.input, "outputs": outputs, "ok": success}]
+
+
+def cmd_clips(args):
+    # 延遲載入，只有批次擷取需要解析片段清單
+    import clips
+
+    try:
+        clip_list = clips.load_clip_list(args.list)
+    except (OSError, ValueError) as e:
+        print(f"無法讀取片段清單：{str(e)}", file=sys.stderr)
+        return None
+    success, outputs = clips.extract_clips(
+        args.input,
+        clip_list,
+        args.output_dir,
+        accurate=args.accurate,
+        workers=args.jobs,
+    )
+    return [{"input": args.input, "outputs": outputs, "ok": success}]
+
+
+def cmd_probe(args):
+    inputs = expand_inputs(args.inputs, MEDIA_EXTENSIONS)
+    if not inputs:
+        return None
+    results = []
+    for file in inputs:
+        info = audio_tools.probe_media(file)
+        results.append({"input": file, "ok": info is not None, "info": info})
+    return results
+
+
+def cmd_watch(args):
+    # 延遲載入，其他子命令不需要監看功能
+    import watch_folder
+
+    def on_result(file, success):
+        output = audio_tools.plan_conversion(file, args.remux)[0]
+        result = {"input": file, "output": output, "ok": success}
+        # 每完成一個檔案輸出一行 JSON
+        print(json.dumps(result, ensure_ascii=False), file=sys.__stdout__, flush=True)
+
+    try:
+        watch_folder.watch_and_convert(
+            args.folder,
+            max_workers=args.jobs,
+            remux=args.remux,
+            settle_seconds=args.settle,
+            poll_interval=args.poll_interval,
+            use_polling=args.poll,
+            on_result=on_result,
+        )
+    except KeyboardInterrupt:
+        print("停止監看")
+    return []
+
+
+def cmd_serve(args):
+    # 延遲載入，只有分散轉換需要 HTTP 伺服器
+    import job_server
+
+    try:
+        job_server.serve(args.host, args.port, token=args.token)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return None
+    except KeyboardInterrupt:
+        print("停止工作伺服器")
+    return []
+
+
+def cmd_worker(args):
+    import threading
+
+    import job_server
+
+    # 每個執行緒是一個獨立的工作程序，ffmpeg 在子行程中執行，不受 GIL 限制
+    stop = threading.Event()
+    base = args.name or job_server.default_worker_name()
+    threads = []
+    for index in range(args.jobs):
+        name = base if args.jobs == 1 else f"{base}-{index + 1}"
+        worker = job_server.Worker(args.url, name=name, token=args.token)
+        thread = threading.Thread(target=worker.run, args=(stop,), daemon=True)
+        thread.start()
+        threads.append(thread)
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        print("停止工作程序")
+        stop.set()
+    return []
+
+
+def cmd_submit(args):
+    import job_server
+
+    # 路徑以絕對路徑送出，工作程序需能以相同路徑存取共用儲存空間
+    inputs = [
+        os.path.abspath(file)
+        for file in iter_inputs(args.inputs, (".mp4",))
+        if os.path.splitext(file)[1].lower() != ".mp3"
+    ]
+    if not inputs:
+        return None
+    client = job_server.JobClient(args.url, token=args.token)
+    job_ids = []
+    try:
+        for file in inputs:
+            params = {"input": file, "remux": args.remux, "loudness": args.loudness}
+            if args.profile:
+                params["profiles"] = args.profile
+            job_ids.append(client.submit("convert", params, args.priority))
+    except (OSError, ValueError) as e:
+        # 無法連線、權杖錯誤或伺服器拒絕工作
+        print(f"無法送出工作：{str(e)}", file=sys.stderr)
+        return None
+    if not args.wait:
+        return [{"input": f, "id": i, "ok": True} for f, i in zip(inputs, job_ids)]
+    return [
+        {
+            "input": job["params"]["input"],
+            "id": job["id"],
+            **(job.get("result") or {}),
+            "ok": job["state"] == "done",
+        }
+        for job in client.wait(job_ids)
+    ]
+
+
+def cmd_pipe(args):
+    if args.inputs.count("-") > 1:
+        print("標準輸入只能使用一次", file=sys.stderr)
+        return None
+    with contextlib.ExitStack() as stack:
+        try:
+            sources = [
+                (
+                    sys.stdin.buffer
+                    if name == "-"
+                    else stack.enter_context(open(name, "rb"))
+                )
+                for name in args.inputs
+            ]
+            if args.output == "-":
+                # 標準輸出已導向標準錯誤（見 main），資料寫到原本的標準輸出
+                sink = sys.__stdout__.buffer
+            else:
+                sink = stack.enter_context(open(args.output, "wb"))
+        except OSError as e:
+            print(f"無法開啟檔案: {str(e)}", file=sys.stderr)
+            return None
+
+        if args.operation == "merge":
+            success = streaming.merge_streams(sources, sink, args.format)
+        elif len(sources) != 1:
+            print("convert 與 trim 只接受一個輸入", file=sys.stderr)
+            return None
+        elif args.operation == "trim":
+            if not args.start or not args.end:
+                print("trim 需要 --start 與 --end", file=sys.stderr)
+                return None
+            success = streaming.trim_stream(
+                sources[0], sink, args.start, args.end, args.format, copy=args.copy
+            )
+        else:
+            success = streaming.convert_stream(sources[0], sink, args.format)
+    return [{"inputs": args.inputs, "output": args.output, "ok": success}]
+
+
+def add_loudness_argument(parser):
+    parser.add_argument(
+        "--loudness",
+        type=float,
+        nargs="?",
+        const=audio_tools.DEFAULT_LOUDNESS_TARGET,
+        metavar="LUFS",
+        help="以 EBU R128 標準化響度，可指定目標響度"
+        f"（預設 {audio_tools.DEFAULT_LOUDNESS_TARGET:g} LUFS）",
+    )
+
+
+def add_token_argument(parser):
+    parser.add_argument(
+        "--token",
+        help="工作伺服器的共用權杖（預設讀取環境變數 MP4_TO_MP3_JOB_TOKEN）",
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="音訊轉換與剪輯工具（命令列模式）"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="將MP4轉換為MP3")
+    convert.add_argument("inputs", nargs="+", help="檔案、萬用字元或目錄")
+    convert.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=audio_tools.DEFAULT_WORKERS,
+        help="同時轉換數（預設為 CPU 核心數）",
+    )
+    convert.add_argument(
+        "--remux",
+        action="store_true",
+        help="來源已是 MP3 或 AAC 時直接複製音訊串流（輸出 .mp3 或 .m4a），不重新編碼",
+    )
+    convert.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略工作紀錄與輸出快取，重新轉換所有檔案"
+        "（預設會略過輸出已是最新的檔案，內容相同的檔案也不會重複轉換）",
+    )
+    convert.add_argument(
+        "--profile",
+        action="append",
+        choices=list(audio_tools.OUTPUT_PROFILES),
+        help="一次解碼同時輸出多種格式，可重複指定；輸出為「原檔名_設定名稱.副檔名」",
+    )
+    convert.add_argument(
+        "--probe",
+        action="store_true",
+        help="目錄中非 .mp4 的檔案也以 ffprobe 探測，有音訊串流就轉換",
+    )
+    add_loudness_argument(convert)
+    convert.set_defaults(func=cmd_convert)
+
+    merge = subparsers.add_parser("merge", help="依序合併多個音訊檔案")
+    merge.add_argument("inputs", nargs="+", help="檔案或萬用字元")
+    merge.add_argument("-o", "--output", required=True, help="輸出檔案")
+    add_loudness_argument(merge)
+    merge.set_defaults(func=cmd_merge)
+
+    trim = subparsers.add_parser("trim", help="剪輯音訊檔案")
+    trim.add_argument("input", help="輸入檔案")
+    trim.add_argument("--start", required=True, help="開始時間 (HH:MM:SS 或 MM:SS)")
+    trim.add_argument("--end", required=True, help="結束時間 (HH:MM:SS 或 MM:SS)")
+    trim.add_argument("-o", "--output", required=True, help="輸出檔案")
+    trim.add_argument(
+        "--accurate",
+        action="store_true",
+        help="精準剪輯：切點精準到取樣（MP3 只重新編碼開頭幾個音框）",
+    )
+    trim.set_defaults(func=cmd_trim)
+
+    split = subparsers.add_parser("split", help="在指定時間點分割音訊檔案")
+    split.add_argument("input", help="輸入檔案")
+    split_mode = split.add_mutually_exclusive_group(required=True)
+    split_mode.add_argument(
+        "--at",
+        action="append",
+        help="分割時間點，可重複指定或以逗號分隔",
+    )
+    split_mode.add_argument(
+        "--silence",
+        type=float,
+        metavar="SECONDS",
+        help="在每段超過此秒數的靜音中點自動分割",
+    )
+    split.add_argument(
+        "--threshold",
+        type=float,
+        default=-40.0,
+        help="低於此音量 (dBFS) 視為靜音（預設 -40）",
+    )
+    split.set_defaults(func=cmd_split)
+
+    clip = subparsers.add_parser(
+        "clips", help="依 cue sheet、CSV 或 JSON 片段清單一次擷取多個片段"
+    )
+    clip.add_argument("input", help="輸入檔案")
+    clip.add_argument("list", help="片段清單（.cue、.csv 或 .json）")
+    clip.add_argument("-o", "--output-dir", help="輸出資料夾（預設與輸入檔案相同）")
+    clip.add_argument(
+        "-j", "--jobs", type=int, default=1, help="同時執行的 ffmpeg 行程數（預設 1）"
+    )
+    clip.add_argument(
+        "--accurate",
+        action="store_true",
+        help="精準剪輯：重新編碼，切點不受封包邊界限制",
+    )
+    clip.set_defaults(func=cmd_clips)
+
+    probe = subparsers.add_parser("probe", help="顯示媒體資訊")
+    probe.add_argument("inputs", nargs="+", help="檔案、萬用字元或目錄")
+    probe.set_defaults(func=cmd_probe)
+
+    watch = subparsers.add_parser("watch", help="監看資料夾並自動轉換新的MP4檔案")
+    watch.add_argument("folder", help="要監看的資料夾")
+    watch.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=audio_tools.DEFAULT_WORKERS,
+        help="同時轉換數（預設為 CPU 核心數）",
+    )
+    watch.add_argument("--remux", action="store_true", help="同 convert 的 --remux")
+    watch.add_argument(
+        "--settle",
+        type=float,
+        default=2.0,
+        help="檔案停止變動多少秒後才開始轉換（預設 2 秒）",
+    )
+    watch.add_argument("--poll", action="store_true", help="不使用 inotify，改用輪詢")
+    watch.add_argument(
+        "--poll-interval", type=float, default=2.0, help="輪詢間隔秒數（預設 2 秒）"
+    )
+    watch.set_defaults(func=cmd_watch)
+
+    serve = subparsers.add_parser("serve", help="啟動分散轉換的工作伺服器")
+    serve.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="監聽的位址（預設只接受本機連線；監聽其他位址時必須設定 --token）",
+    )
+    serve.add_argument("--port", type=int, default=8765, help="連接埠（預設 8765）")
+    add_token_argument(serve)
+    serve.set_defaults(func=cmd_serve)
+
+    worker = subparsers.add_parser("worker", help="向工作伺服器領取並執行工作")
+    worker.add_argument("url", help="工作伺服器網址，例如 http://server:8765")
+    worker.add_argument(
+        "-j", "--jobs", type=int, default=1, help="同時執行的工作數（預設 1）"
+    )
+    worker.add_argument("--name", help="工作程序名稱（預設為主機名稱與行程編號）")
+    add_token_argument(worker)
+    worker.set_defaults(func=cmd_worker)
+
+    submit = subparsers.add_parser("submit", help="將轉換工作送到工作伺服器")
+    submit.add_argument("url", help="工作伺服器網址")
+    submit.add_argument("inputs", nargs="+", help="檔案、萬用字元或目錄")
+    submit.add_argument("--remux", action="store_true", help="同 convert 的 --remux")
+    submit.add_argument(
+        "--profile",
+        action="append",
+        choices=list(audio_tools.OUTPUT_PROFILES),
+        help="同 convert 的 --profile",
+    )
+    submit.add_argument("--priority", type=int, help="優先順序，數字越小越優先")
+    submit.add_argument(
+        "--wait", action="store_true", help="等待所有工作結束並輸出結果"
+    )
+    add_loudness_argument(submit)
+    add_token_argument(submit)
+    submit.set_defaults(func=cmd_submit)
+
+    pipe = subparsers.add_parser(
+        "pipe", help="串流模式：從標準輸入或檔案讀取，結果逐塊寫到標準輸出"
+    )
+    pipe.add_argument("operation", choices=("convert", "trim", "merge"))
+    pipe.add_argument(
+        "inputs", nargs="*", default=["-"], help="輸入檔案，- 代表標準輸入（預設）"
+    )
+    pipe.add_argument(
+        "-o", "--output", default="-", help="輸出檔案，- 代表標準輸出（預設）"
+    )
+    pipe.add_argument(
+        "-f",
+        "--format",
+        choices=list(streaming.STREAM_FORMATS),
+        default="mp3",
+        help="輸出格式（預設 mp3）",
+    )
+    pipe.add_argument("--start", help="trim 的開始時間")
+    pipe.add_argument("--end", help="trim 的結束時間")
+    pipe.add_argument(
+        "--copy",
+        action="store_true",
+        help="trim 時直接複製音訊串流（輸入編碼需與輸出格式相同）",
+    )
+    pipe.set_defaults(func=cmd_pipe)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # 處理函式會以 print 輸出訊息，導向標準錯誤以免混入 JSON 結果
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            results = args.func(args)
+        except audio_tools.TRANSIENT_ERRORS as e:
+            # 工作函式不處理暫時性的錯誤（排程器會重試），命令列直接回報失敗
+            print(f"執行失敗: {str(e)}")
+            results = [{"ok": False, "error": str(e)}]
+
+    # 串流資料寫到標準輸出時，結果改寫到標準錯誤
+    out = sys.stderr if args.command == "pipe" and args.output == "-" else sys.stdout
+    if results is None:
+        print(
+            json.dumps({"command": args.command, "ok": False, "results": []}), file=out
+        )
+        return EXIT_USAGE
+
+    ok = all(result["ok"] for result in results)
+    print(
+        json.dumps(
+            {"command": args.command, "ok": ok, "results": results},
+            ensure_ascii=False,
+        ),
+        file=out,
+    )
+    return EXIT_OK if ok else EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
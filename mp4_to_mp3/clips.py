@@ -0,0 +1,344 @@
+"""依片段清單一次擷取多個片段
+
+片段清單可以是 cue sheet、CSV（名稱, 開始, 結束）或 JSON。片段依開始時間排序後，
+每 CLIPS_PER_PASS 個相鄰的片段由同一個 ffmpeg 行程輸出：輸入只定位一次並依序讀取，
+每個片段是一個獨立的輸出，彼此重疊也沒有關係。各組讀取的是來源中互不相同的範圍，
+整個來源大約只讀取一次（組與組重疊的部分除外），不必像逐一呼叫 trim_audio 那樣
+每個片段都重新開啟並定位輸入。
+
+每個封包都要分送給同組的所有輸出，一組的片段太多時反而比逐一剪輯慢，濾鏡的緩衝
+也會隨之變大，因此限制每組的片段數。workers 大於 1 時各組並行處理。
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from audio_tools import (
+    MERGE_TARGETS,
+    TRANSIENT_ERRORS,
+    JobCancelled,
+    _seconds_arg,
+    parse_time,
+    partial_output_path,
+    probe_media,
+    run_ffmpeg,
+)
+
+# cue sheet 的時間以 1/75 秒（CD 音框）為單位
+CUE_FRAMES_PER_SECOND = 75
+CLIP_LIST_TYPES = (".cue", ".csv", ".json")
+# 每個 ffmpeg 行程輸出的片段數上限
+CLIPS_PER_PASS = 8
+
+# 檔名中不能使用的字元
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def parse_clip_time(value):
+    """將秒數或 HH:MM:SS / MM:SS 字串轉為秒數，格式錯誤時拋出 ValueError"""
+    return float(parse_time(value))
+
+
+def parse_cue(text):
+    """解析 cue sheet，回傳 [(名稱, 開始秒數, 結束秒數或 None)]
+
+    每一軌從 INDEX 01 開始，到下一軌的 INDEX 00（前置間隙）或 INDEX 01 結束；
+    最後一軌的結束時間為 None，代表到檔案結尾。只支援單一來源檔案的 cue sheet。
+    """
+    tracks = []  # [編號, 標題, INDEX 00, INDEX 01]
+    files = 0
+    for line in text.splitlines():
+        parts = line.strip().split(None, 1)
+        if not parts:
+            continue
+        command = parts[0].upper()
+        argument = parts[1] if len(parts) > 1 else ""
+        if command == "FILE":
+            files += 1
+            if files > 1:
+                raise ValueError("只支援單一來源檔案的 cue sheet")
+        elif command == "TRACK":
+            tracks.append([int(argument.split()[0]), None, None, None])
+        elif command == "TITLE" and tracks:
+            # TRACK 之前的 TITLE 是整張專輯的標題
+            tracks[-1][1] = argument.strip().strip('"')
+        elif command == "INDEX" and tracks:
+            number, position = argument.split()
+            minutes, seconds, frames = (int(p) for p in position.split(":"))
+            time = minutes * 60 + seconds + frames / CUE_FRAMES_PER_SECOND
+            if int(number) in (0, 1):
+                tracks[-1][2 + int(number)] = time
+
+    clips = []
+    for i, (number, title, _, start) in enumerate(tracks):
+        if start is None:
+            raise ValueError(f"第 {number} 軌缺少 INDEX 01")
+        end = None
+        if i + 1 < len(tracks):
+            _, _, next_pregap, next_start = tracks[i + 1]
+            end = next_pregap if next_pregap is not None else next_start
+        clips.append((title or f"Track {number:02d}", start, end))
+    return clips
+
+
+def parse_csv(text):
+    """解析 CSV 片段清單，每列為「名稱, 開始, 結束」
+
+    第一列含有 start 與 end 欄位名稱時視為標題列，依欄位名稱（name 或 title、start、end）
+    取值。空白列與 # 開頭的列會被略過。
+    """
+    rows = [
+        row
+        for row in csv.reader(io.StringIO(text))
+        if row
+        and any(cell.strip() for cell in row)
+        and not row[0].lstrip().startswith("#")
+    ]
+    columns = (0, 1, 2)
+    if rows:
+        header = [cell.strip().lower() for cell in rows[0]]
+        if "start" in header and "end" in header:
+            name_column = next(
+                (header.index(key) for key in ("name", "title") if key in header), None
+            )
+            columns = (name_column, header.index("start"), header.index("end"))
+            rows = rows[1:]
+
+    clips = []
+    for line, row in enumerate(rows, start=1):
+        try:
+            name = row[columns[0]].strip() if columns[0] is not None else ""
+            start = parse_clip_time(row[columns[1]])
+            end = parse_clip_time(row[columns[2]])
+        except (IndexError, ValueError):
+            raise ValueError(f"CSV 第 {line} 筆格式錯誤：{','.join(row)}")
+        clips.append((name, start, end))
+    return clips
+
+
+def parse_json(text):
+    """解析 JSON 片段清單
+
+    可以是物件列表 [{"name": ..., "start": ..., "end": ...}]、[名稱, 開始, 結束] 列表，
+    或以 {"clips": [...]} 包裝；時間可以是秒數或時間字串。
+    """
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("clips")
+    if not isinstance(data, list):
+        raise ValueError("JSON 片段清單必須是列表")
+
+    clips = []
+    for item in data:
+        try:
+            if isinstance(item, dict):
+                name = item.get("name", item.get("title", ""))
+                start, end = item["start"], item.get("end")
+            else:
+                name, start, end = item
+            clips.append(
+                (
+                    str(name or ""),
+                    parse_clip_time(start),
+                    None if end is None else parse_clip_time(end),
+                )
+            )
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"JSON 片段格式錯誤：{item!r}")
+    return clips
+
+
+def load_clip_list(path):
+    """依副檔名讀取 cue sheet、CSV 或 JSON 片段清單，格式錯誤時拋出 ValueError"""
+    ext = os.path.splitext(str(path))[1].lower()
+    # cue sheet 常以 Windows 的編碼儲存，無法以 UTF-8 解碼時保留原字元
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        text = f.read()
+    if ext == ".cue":
+        return parse_cue(text)
+    if ext == ".json":
+        return parse_json(text)
+    if ext == ".csv":
+        return parse_csv(text)
+    raise ValueError(f"不支援的片段清單格式：{ext}")
+
+
+def clip_output_paths(input_file, clips, output_dir=None):
+    """為每個片段產生不重複的輸出路徑（副檔名與輸入相同，不會覆寫輸入檔案）"""
+    input_path = os.path.abspath(str(input_file))
+    stem, ext = os.path.splitext(os.path.basename(input_path))
+    if output_dir is None:
+        output_dir = os.path.dirname(input_path)
+    paths = []
+    used = set()
+    if os.path.normcase(os.path.abspath(output_dir)) == os.path.normcase(
+        os.path.dirname(input_path)
+    ):
+        # 與輸入同一資料夾時，與輸入同名的片段改加上編號
+        used.add(stem.lower())
+    for index, (name, _, _) in enumerate(clips, start=1):
+        base = _UNSAFE_CHARS.sub("_", name).strip(" .") or f"{stem}_clip{index}"
+        candidate, number = base, 2
+        while candidate.lower() in used:
+            candidate = f"{base}_{number}"
+            number += 1
+        used.add(candidate.lower())
+        paths.append(os.path.join(output_dir, candidate + ext))
+    return paths
+
+
+def _clip_groups(jobs):
+    """依開始時間排序，每 CLIPS_PER_PASS 個相鄰的片段分為一組"""
+    jobs = sorted(jobs, key=lambda job: job[0])
+    return [jobs[i : i + CLIPS_PER_PASS] for i in range(0, len(jobs), CLIPS_PER_PASS)]
+
+
+def _extract_group(input_path, group, accurate, cancel):
+    """以一個 ffmpeg 行程輸出一組片段：輸入只定位到最早的開始時間並讀取一次"""
+    base = min(start for start, _, _ in group)
+    args = ["-ss", _seconds_arg(base), "-i", input_path]
+    if accurate:
+        # 解碼一次後以 asplit 分給各片段，atrim 在取樣層級精準裁切
+        labels = "".join(f"[s{i}]" for i in range(len(group)))
+        graph = [f"[0:a:0]asplit={len(group)}{labels}"]
+        for i, (start, end, _) in enumerate(group):
+            graph.append(
+                f"[s{i}]atrim=start={_seconds_arg(start - base)}"
+                f":end={_seconds_arg(end - base)},asetpts=PTS-STARTPTS[o{i}]"
+            )
+        args += ["-filter_complex", ";".join(graph)]
+        for i, (_, _, output_path) in enumerate(group):
+            ext = os.path.splitext(output_path)[1].lower()
+            encode_args = MERGE_TARGETS.get(ext, (None, ()))[1]
+            args += [
+                "-map",
+                f"[o{i}]",
+                *encode_args,
+                "-y",
+                partial_output_path(output_path),
+            ]
+    else:
+        # 每個輸出各自丟棄開始時間之前的封包，直接複製編碼
+        for start, end, output_path in group:
+            args += [
+                "-map",
+                "0:a:0",
+                "-ss",
+                _seconds_arg(start - base),
+                "-t",
+                _seconds_arg(end - start),
+                "-c:a",
+                "copy",
+                "-y",  # 暫存檔可能是上次中斷時留下的
+                partial_output_path(output_path),
+            ]
+    try:
+        # 多個輸出時 ffmpeg 回報的時間只反映其中一個輸出，不作為進度
+        run_ffmpeg(args, cancel=cancel)
+    except BaseException:
+        for _, _, output_path in group:
+            try:
+                os.remove(partial_output_path(output_path))
+            except OSError:
+                pass
+        raise
+    for _, _, output_path in group:
+        os.replace(partial_output_path(output_path), output_path)
+    return [output_path for _, _, output_path in group]
+
+
+def extract_clips(
+    input_file,
+    clips,
+    output_dir=None,
+    accurate=False,
+    workers=1,
+    on_progress=None,
+    cancel=None,
+):
+    """從 input_file 擷取 clips 中的所有片段
+
+    clips 為 [(名稱, 開始秒數, 結束秒數或 None)]，結束時間為 None 時擷取到檔案結尾。
+    輸出檔名為片段名稱加上輸入的副檔名，存放在 output_dir（預設與輸入相同的資料夾）。
+    accurate 為 False 時直接複製編碼，切點對齊封包；為 True 時重新編碼，切點精準。
+    workers 為同時執行的 ffmpeg 行程數，進度以完成的片段數回報。
+    回傳 (是否成功, 輸出檔案列表)；任何一組遇到 TRANSIENT_ERRORS 時，
+    等其他組完成後拋出該例外。
+    """
+    try:
+        input_path = str(input_file).encode("utf-8").decode("utf-8")
+        if not clips:
+            print("片段清單是空的")
+            return False, []
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+
+        duration = None
+        if any(end is None for _, _, end in clips):
+            duration = (probe_media(input_path) or {}).get("duration")
+            if not duration:
+                print("擷取失敗: 無法取得檔案長度，請為每個片段指定結束時間")
+                return False, []
+
+        jobs = []
+        paths = clip_output_paths(input_path, clips, output_dir)
+        for (name, start, end), output_path in zip(clips, paths):
+            end = duration if end is None else end
+            if end <= start:
+                print(f"擷取失敗: 片段「{name}」的結束時間必須晚於開始時間")
+                return False, []
+            jobs.append((start, end, output_path))
+
+        groups = _clip_groups(jobs)
+        outputs = []
+        failed = []
+        transient = None
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [
+                executor.submit(_extract_group, input_path, group, accurate, cancel)
+                for group in groups
+            ]
+            for future in as_completed(futures):
+                try:
+                    outputs += future.result()
+                except TRANSIENT_ERRORS as e:
+                    # 其他組照常完成，最後再拋出讓呼叫端重試
+                    transient = transient or e
+                    continue
+                except subprocess.CalledProcessError as e:
+                    failed.append(str(e))
+                    continue
+                if on_progress:
+                    on_progress(
+                        {
+                            "percent": len(outputs) / len(jobs) * 100,
+                            "speed": None,
+                            "eta": None,
+                            "out_time": None,
+                        }
+                    )
+
+        # 依片段清單的順序回傳
+        order = {path: index for index, path in enumerate(paths)}
+        outputs.sort(key=order.get)
+        if failed:
+            print(f"擷取失敗: {failed[0]}")
+            return False, outputs
+        if transient is not None:
+            raise transient
+        print(f"成功擷取 {len(outputs)} 個片段: {Path(input_path).name}")
+        return True, outputs
+    except JobCancelled:
+        print(f"已取消擷取片段: {Path(str(input_file)).name}")
+        return False, []
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        print(f"擷取失敗: {str(e)}")
+        return False, []
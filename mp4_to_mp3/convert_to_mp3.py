@@ -1,11 +1,49 @@
 import os
+import queue
 import subprocess
-import json
-from pathlib import Path
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import sv_ttk  # 新增 Sun Valley TTK 主題支援
 
+import clips
+import silence
+import waveform
+from file_model import FileListModel
+from folder_scan import scan_media_files
+from audio_tools import (
+    DEFAULT_LOUDNESS_TARGET,
+    DEFAULT_WORKERS,
+    CancelToken,
+    JobCancelled,
+    convert_file,
+    format_progress,
+    format_time,
+    get_audio_duration,
+    merge_audio_files,
+    parse_time,
+    parse_time_list,
+    probe_media,
+    split_audio,
+    trim_audio,
+)
+from job_manifest import get_job_manifest
+from output_cache import get_output_cache
+from scheduler import (
+    CANCELLED,
+    CPU,
+    DONE,
+    FAILED,
+    IO,
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_NORMAL,
+    JobScheduler,
+    device_of,
+)
+
 # 定義顏色主題
 COLORS = {
     "light": {
@@ -27,176 +65,109 @@ COLORS = {
 # 定義共用樣式
 STYLES = {"padding": 10, "button_width": 15, "entry_width": 50}
 
+# 背景探測檔案長度的執行緒數（ffprobe 大多在等待 I/O）
+PROBE_WORKERS = min(32, (os.cpu_count() or 1) * 2)
+PROBING_TEXT = "探測中…"
 
-def get_audio_duration(file_path):
-    """獲取音訊檔案的長度"""
-    try:
-        # 使用 ffprobe 獲取媒體檔案資訊
-        result = subprocess.run(
-            [
-                "ffprobe",
-                "-v",
-                "quiet",
-                "-print_format",
-                "json",
-                "-show_format",
-                "-show_streams",
-                file_path,
-            ],
-            capture_output=True,
-            text=True,
-            check=True,
+
+def format_pick_time(seconds):
+    """將波形上點選的時間轉為可輸入的時間字串（保留到 0.1 秒）"""
+    tenths = int(round(seconds * 10))
+    return f"{format_time(tenths // 10)}.{tenths % 10}"
+
+
+class WaveformView(tk.Canvas):
+    """以峰值索引繪製波形，點選位置時以 (秒數, 是否為右鍵) 呼叫 on_pick"""
+
+    def __init__(self, master, on_pick=None, height=120):
+        super().__init__(
+            master,
+            height=height,
+            background=COLORS["light"]["bg"],
+            highlightthickness=1,
         )
+        self.on_pick = on_pick
+        self.source = None  # 目前顯示的檔案
+        self.peaks = None
+        self.duration = 0.0
+        self.markers = []  # 分割點（秒）
+        self.selection = None  # (開始秒數, 結束秒數)
+        self.message = "選擇檔案後會在此顯示波形"
+        self.bind("<Configure>", lambda event: self.redraw())
+        self.bind("<Button-1>", lambda event: self._pick(event, False))
+        self.bind("<Button-3>", lambda event: self._pick(event, True))
+        self.bind("<Motion>", self._hover)
+        self.bind("<Leave>", lambda event: self.delete("hover"))
+
+    def show_message(self, message):
+        self.peaks = None
+        self.message = message
+        self.redraw()
+
+    def set_peaks(self, peaks):
+        self.peaks = peaks
+        self.duration = len(peaks) * waveform.window_seconds()
+        self.redraw()
+
+    def set_markers(self, markers):
+        self.markers = markers
+        self.redraw()
+
+    def set_selection(self, selection):
+        self.selection = selection
+        self.redraw()
+
+    def _x_to_seconds(self, x):
+        width = max(self.winfo_width(), 1)
+        return min(max(x / width, 0.0), 1.0) * self.duration
+
+    def _seconds_to_x(self, seconds):
+        return seconds / self.duration * self.winfo_width() if self.duration else 0
+
+    def redraw(self):
+        self.delete("all")
+        width, height = self.winfo_width(), self.winfo_height()
+        if self.peaks is None or not len(self.peaks):
+            self.create_text(width / 2, height / 2, text=self.message)
+            return
 
-        # 解析 JSON 輸出
-        data = json.loads(result.stdout)
-        duration = float(data["format"]["duration"])
+        if self.selection is not None:
+            start, end = (self._seconds_to_x(t) for t in self.selection)
+            self.create_rectangle(start, 0, end, height, fill="#cce4f7", outline="")
+
+        # 每個像素欄一條直線，由最小值畫到最大值
+        middle = height / 2
+        scale = middle / 32768
+        color = COLORS["light"]["accent"]
+        columns = waveform.downsample(self.peaks, width)
+        step = width / len(columns)
+        for i, (low, high) in enumerate(columns.tolist()):
+            x = i * step
+            self.create_line(
+                x, middle - high * scale, x, middle - low * scale + 1, fill=color
+            )
 
-        # 將秒數轉換為時:分:秒格式
-        hours = int(duration // 3600)
-        minutes = int((duration % 3600) // 60)
-        seconds = int(duration % 60)
+        for seconds in self.markers:
+            x = self._seconds_to_x(seconds)
+            self.create_line(x, 0, x, height, fill="#d83b01", width=2)
+        self.create_text(4, 4, anchor="nw", text=f"長度：{format_time(self.duration)}")
 
-        if hours > 0:
-            return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        else:
-            return f"{minutes:02d}:{seconds:02d}"
-    except Exception as e:
-        print(f"無法獲取音訊長度: {str(e)}")
-        return "未知"
-
-
-def merge_audio_files(input_files, output_file):
-    """合併多個音訊檔案"""
-    # 創建一個包含所有輸入檔案的文字檔
-    temp_list = "temp_file_list.txt"
-    with open(temp_list, "w", encoding="utf-8") as f:
-        for file in input_files:
-            f.write(f"file '{file}'\n")
-
-    try:
-        # 使用 ffmpeg 的 concat 功能合併檔案
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-f",
-                "concat",
-                "-safe",
-                "0",
-                "-i",
-                temp_list,
-                "-c",
-                "copy",
-                output_file,
-            ],
-            check=True,
-        )
-        print(f"成功合併音訊檔案到: {output_file}")
-    except subprocess.CalledProcessError as e:
-        print(f"合併失敗: {str(e)}")
-    finally:
-        # 刪除暫存的檔案列表
-        if os.path.exists(temp_list):
-            os.remove(temp_list)
-
-
-def convert_mp4_to_mp3(input_file):
-    """將MP4檔案轉換為MP3"""
-    try:
-        input_path = str(input_file).encode("utf-8").decode("utf-8")
-        output_file = str(input_file).replace(".mp4", ".mp3")
-        output_path = output_file.encode("utf-8").decode("utf-8")
-
-        # 使用ffmpeg進行轉換
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-i",
-                input_path,
-                "-vn",  # 不要視訊軌
-                "-acodec",
-                "libmp3lame",  # 使用MP3編碼器
-                "-q:a",
-                "2",  # 音質設定（0最好，9最差）
-                output_path,
-            ],
-            check=True,
-            encoding="utf-8",
-            errors="replace",
-        )
-        print(f"成功轉換: {Path(input_path).name} -> {Path(output_path).name}")
-    except UnicodeEncodeError as e:
-        print(f"編碼錯誤: {str(e)}")
-    except UnicodeDecodeError as e:
-        print(f"解碼錯誤: {str(e)}")
-    except subprocess.CalledProcessError as e:
-        print(f"轉換失敗: {str(e)}")
-    except Exception as e:
-        print(f"未預期的錯誤: {str(e)}")
-
-
-def trim_audio(input_file, output_file, start_time, end_time):
-    """剪輯音訊檔案"""
-    try:
-        input_path = str(input_file).encode("utf-8").decode("utf-8")
-        output_path = str(output_file).encode("utf-8").decode("utf-8")
-
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-i",
-                input_path,
-                "-ss",
-                start_time,  # 開始時間
-                "-to",
-                end_time,  # 結束時間
-                "-c",
-                "copy",  # 直接複製編碼，不重新編碼
-                output_path,
-            ],
-            check=True,
-            encoding="utf-8",
-            errors="replace",
-        )
-        print(f"成功剪輯音訊: {Path(output_path).name}")
-        return True
-    except UnicodeEncodeError as e:
-        print(f"編碼錯誤: {str(e)}")
-        return False
-    except UnicodeDecodeError as e:
-        print(f"解碼錯誤: {str(e)}")
-        return False
-    except subprocess.CalledProcessError as e:
-        print(f"剪輯失敗: {str(e)}")
-        return False
-    except Exception as e:
-        print(f"未預期的錯誤: {str(e)}")
-        return False
-
-
-def format_time(seconds):
-    """將秒數轉換為 HH:MM:SS 格式"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    if hours > 0:
-        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
-    return f"{minutes:02d}:{secs:02d}"
-
-
-def parse_time(time_str):
-    """將時間字串解析為秒數"""
-    try:
-        parts = time_str.split(":")
-        if len(parts) == 2:
-            minutes, seconds = parts
-            return int(minutes) * 60 + int(seconds)
-        elif len(parts) == 3:
-            hours, minutes, seconds = parts
-            return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
-        return 0
-    except:
-        return 0
+    def _hover(self, event):
+        self.delete("hover")
+        if self.peaks is None:
+            return
+        self.create_line(event.x, 0, event.x, self.winfo_height(), tags="hover")
+        self.create_text(
+            event.x + 4,
+            self.winfo_height() - 4,
+            anchor="sw",
+            text=format_pick_time(self._x_to_seconds(event.x)),
+            tags="hover",
+        )
+
+    def _pick(self, event, secondary):
+        if self.peaks is not None and self.on_pick:
+            self.on_pick(self._x_to_seconds(event.x), secondary)
 
 
 class MP4ToMP3Converter(tk.Tk):
@@ -211,9 +182,24 @@ class MP4ToMP3Converter(tk.Tk):
         style.configure(".", font=default_font)
 
         # 初始化變數
-        self.files_to_convert = []
-        self.files_to_merge = []  # 新增合併檔案列表
         self.progress_var = tk.StringVar(value="")
+        self.workers_var = tk.IntVar(value=DEFAULT_WORKERS)  # 同時轉換數
+        self.remux_var = tk.BooleanVar(value=False)  # 僅重新封裝，不重新編碼
+        # 響度標準化（轉換與合併共用）
+        self.loudness_var = tk.BooleanVar(value=False)
+        self.loudness_target_var = tk.DoubleVar(value=DEFAULT_LOUDNESS_TARGET)
+
+        # 背景工作：工作執行緒把要在主執行緒執行的回呼放進佇列，由 after() 輪詢
+        self.ui_queue = queue.Queue()
+        # 所有轉換、合併、剪輯與分割都送進排程器，剪輯與分割會優先於大批轉換
+        self.scheduler = JobScheduler()
+        self.convert_jobs = {}  # 檔案 -> 尚未結束的轉換工作
+
+        # 新增檔案時在背景探測長度，結果由輪詢批次更新到列表
+        self.probe_pool = ThreadPoolExecutor(max_workers=PROBE_WORKERS)
+        self.probe_results = queue.Queue()
+        # 建立波形索引的 ffmpeg 在關閉視窗時一併終止
+        self.waveform_cancel = CancelToken()
 
         # 套用 Sun Valley 主題
         sv_ttk.set_theme("light")
@@ -265,14 +251,51 @@ class MP4ToMP3Converter(tk.Tk):
         split_time_frame = ttk.Frame(self.split_frame)
         split_time_frame.pack(fill=tk.X, pady=10)
 
-        ttk.Label(split_time_frame, text="分割時間點 (HH:MM:SS 或 MM:SS)：").pack(
-            side=tk.LEFT
-        )
+        ttk.Label(
+            split_time_frame, text="分割時間點 (HH:MM:SS 或 MM:SS，多個以逗號分隔)："
+        ).pack(side=tk.LEFT)
         self.split_time_var = tk.StringVar()
-        ttk.Entry(split_time_frame, textvariable=self.split_time_var, width=10).pack(
+        ttk.Entry(split_time_frame, textvariable=self.split_time_var, width=30).pack(
             side=tk.LEFT, padx=5
         )
 
+        # 波形：點選加入分割點，右鍵移除最接近的分割點
+        self.split_waveform = WaveformView(self.split_frame, on_pick=self._pick_split)
+        self.split_waveform.pack(fill=tk.X, pady=5)
+        ttk.Label(
+            self.split_frame, text="在波形上按左鍵加入分割點，按右鍵移除最接近的分割點"
+        ).pack(anchor=tk.W)
+        self.split_time_var.trace_add("write", lambda *args: self._update_split_marks())
+
+        # 自動偵測靜音，將分割點填入上方欄位供檢查
+        silence_frame = ttk.Frame(self.split_frame)
+        silence_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(silence_frame, text="靜音超過（秒）：").pack(side=tk.LEFT)
+        self.min_silence_var = tk.DoubleVar(value=silence.DEFAULT_MIN_SILENCE)
+        ttk.Spinbox(
+            silence_frame,
+            from_=0.5,
+            to=60,
+            increment=0.5,
+            textvariable=self.min_silence_var,
+            width=5,
+        ).pack(side=tk.LEFT)
+        ttk.Label(silence_frame, text="音量低於 (dB)：").pack(
+            side=tk.LEFT, padx=(10, 0)
+        )
+        self.silence_threshold_var = tk.DoubleVar(value=silence.DEFAULT_THRESHOLD_DB)
+        ttk.Spinbox(
+            silence_frame,
+            from_=-80,
+            to=-10,
+            increment=5,
+            textvariable=self.silence_threshold_var,
+            width=5,
+        ).pack(side=tk.LEFT)
+        ttk.Button(
+            silence_frame, text="偵測靜音分割點", command=self.detect_split_points
+        ).pack(side=tk.LEFT, padx=10)
+
         # 分割按鈕
         ttk.Button(self.split_frame, text="開始分割", command=self.start_split).pack(
             pady=10
@@ -310,21 +333,70 @@ class MP4ToMP3Converter(tk.Tk):
             side=tk.LEFT
         )
 
+        # 波形：左鍵設定開始時間，右鍵設定結束時間
+        self.trim_waveform = WaveformView(self.trim_frame, on_pick=self._pick_trim)
+        self.trim_waveform.pack(fill=tk.X, pady=5)
+        ttk.Label(
+            self.trim_frame, text="在波形上按左鍵設定開始時間，按右鍵設定結束時間"
+        ).pack(anchor=tk.W)
+        self.start_time_var.trace_add("write", lambda *args: self._update_trim_marks())
+        self.end_time_var.trace_add("write", lambda *args: self._update_trim_marks())
+
+        # 精準剪輯：切點精準到取樣，不受封包邊界限制
+        self.accurate_trim_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.trim_frame,
+            text="精準剪輯（重新編碼）",
+            variable=self.accurate_trim_var,
+        ).pack(anchor=tk.W)
+
         # 剪輯按鈕
         ttk.Button(self.trim_frame, text="開始剪輯", command=self.start_trim).pack(
             pady=10
         )
 
+        # 片段清單：匯入 cue sheet、CSV 或 JSON 後一次擷取所有片段
+        clip_button_frame = ttk.Frame(self.trim_frame)
+        clip_button_frame.pack(fill=tk.X)
+        ttk.Button(
+            clip_button_frame, text="匯入片段清單", command=self.import_clip_list
+        ).pack(side=tk.LEFT)
+        ttk.Button(
+            clip_button_frame, text="擷取所有片段", command=self.start_extract_clips
+        ).pack(side=tk.LEFT, padx=5)
+
+        clip_columns = ("名稱", "開始", "結束")
+        self.clip_list = ttk.Treeview(
+            self.trim_frame, columns=clip_columns, show="headings", height=6
+        )
+        for column in clip_columns:
+            self.clip_list.heading(column, text=column)
+        self.clip_list.column("開始", width=100, anchor="center")
+        self.clip_list.column("結束", width=100, anchor="center")
+        self.clip_list.pack(fill=tk.BOTH, expand=True, pady=5)
+        # 點選片段時填入開始與結束時間，可在波形上確認或單獨剪輯
+        self.clip_list.bind("<<TreeviewSelect>>", lambda event: self._select_clip())
+        self.clip_ranges = []
+
         # === 轉換頁面元件 ===
         # 檔案列表（使用 Treeview 替代 Listbox）
         columns = ("檔案名稱", "長度")
         self.file_list = ttk.Treeview(
-            self.convert_frame, columns=columns, show="headings", height=15
+            self.convert_frame, columns=columns + ("進度",), show="headings", height=15
         )
         self.file_list.heading("檔案名稱", text="檔案名稱")
         self.file_list.heading("長度", text="長度")
+        self.file_list.heading("進度", text="進度")
         self.file_list.column("長度", width=100, anchor="center")
+        self.file_list.column("進度", width=180, anchor="center")
         self.file_list.pack(pady=10, fill=tk.BOTH, expand=True)
+        # 轉換列表的資料模型：路徑與列 id 的對應、順序與去除重複
+        self.convert_files = FileListModel(
+            self.file_list,
+            on_inserted=lambda files, items: self._probe_later(
+                self.file_list, items, files
+            ),
+        )
 
         # 檔案列表框架（在轉換頁面中）
         button_frame = ttk.Frame(self.convert_frame)
@@ -333,12 +405,31 @@ class MP4ToMP3Converter(tk.Tk):
         ttk.Button(button_frame, text="選擇檔案", command=self.add_files).pack(
             side=tk.LEFT, padx=5
         )
+        ttk.Button(button_frame, text="加入資料夾", command=self.add_folder).pack(
+            side=tk.LEFT, padx=5
+        )
         ttk.Button(button_frame, text="開始轉換", command=self.start_convert).pack(
             side=tk.LEFT, padx=5
         )
         ttk.Button(button_frame, text="清除列表", command=self.clear_list).pack(
             side=tk.LEFT, padx=5
         )
+        ttk.Button(button_frame, text="取消選取", command=self.cancel_selected).pack(
+            side=tk.LEFT, padx=5
+        )
+
+        ttk.Label(button_frame, text="同時轉換數：").pack(side=tk.LEFT, padx=(15, 0))
+        ttk.Spinbox(
+            button_frame,
+            from_=1,
+            to=max(DEFAULT_WORKERS * 2, 1),
+            textvariable=self.workers_var,
+            width=5,
+        ).pack(side=tk.LEFT)
+        ttk.Checkbutton(
+            button_frame, text="可直接複製音訊時不重新編碼", variable=self.remux_var
+        ).pack(side=tk.LEFT, padx=(15, 0))
+        self._add_loudness_options(self.convert_frame)
 
         # === 合併頁面元件 ===
         # 音訊檔案列表（使用 Treeview 替代 Listbox）
@@ -352,6 +443,12 @@ class MP4ToMP3Converter(tk.Tk):
         self.merge_list.heading("長度", text="長度")
         self.merge_list.column("長度", width=100, anchor="center")
         self.merge_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.merge_files = FileListModel(
+            self.merge_list,
+            on_inserted=lambda files, items: self._probe_later(
+                self.merge_list, items, files
+            ),
+        )
 
         # 排序按鈕框架
         order_button_frame = ttk.Frame(merge_list_frame)
@@ -367,15 +464,54 @@ class MP4ToMP3Converter(tk.Tk):
         ttk.Button(
             merge_button_frame, text="選擇音訊檔案", command=self.add_audio_files
         ).pack(side=tk.LEFT, padx=5)
+        ttk.Button(
+            merge_button_frame, text="加入資料夾", command=self.add_audio_folder
+        ).pack(side=tk.LEFT, padx=5)
         ttk.Button(merge_button_frame, text="開始合併", command=self.start_merge).pack(
             side=tk.LEFT, padx=5
         )
         ttk.Button(
             merge_button_frame, text="清除列表", command=self.clear_merge_list
         ).pack(side=tk.LEFT, padx=5)
+        self._add_loudness_options(self.merge_frame)
 
         # 進度顯示
-        ttk.Label(self, textvariable=self.progress_var).pack(pady=5)
+        status_frame = ttk.Frame(self)
+        status_frame.pack(pady=5)
+        ttk.Label(status_frame, textvariable=self.progress_var).pack(side=tk.LEFT)
+        self.cancel_button = ttk.Button(
+            status_frame, text="取消", command=self.cancel_job, state=tk.DISABLED
+        )
+        self.cancel_button.pack(side=tk.LEFT, padx=10)
+
+        self.after(100, self._poll_queue)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+    def _add_loudness_options(self, parent):
+        """加入響度標準化的選項列"""
+        frame = ttk.Frame(parent)
+        frame.pack(pady=5)
+        ttk.Checkbutton(
+            frame, text="標準化響度 (EBU R128)，目標", variable=self.loudness_var
+        ).pack(side=tk.LEFT)
+        ttk.Spinbox(
+            frame,
+            from_=-36,
+            to=-6,
+            increment=1,
+            textvariable=self.loudness_target_var,
+            width=5,
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Label(frame, text="LUFS").pack(side=tk.LEFT)
+
+    def _loudness_target(self):
+        """回傳目標響度；未勾選標準化時回傳 None"""
+        if not self.loudness_var.get():
+            return None
+        try:
+            return float(self.loudness_target_var.get())
+        except (tk.TclError, ValueError):
+            return DEFAULT_LOUDNESS_TARGET
 
     def _toggle_theme(self):
         """切換淺色/深色主題"""
@@ -384,28 +520,193 @@ class MP4ToMP3Converter(tk.Tk):
         else:
             sv_ttk.set_theme("dark")
 
+    def _post(self, callback, *args):
+        """從工作執行緒安排回呼在主執行緒上執行"""
+        self.ui_queue.put((callback, args))
+
+    def _poll_queue(self):
+        """在主執行緒處理工作執行緒送來的回呼"""
+        try:
+            self._flush_probe_results()
+            while True:
+                callback, args = self.ui_queue.get_nowait()
+                callback(*args)
+        except queue.Empty:
+            pass
+        finally:
+            # 即使回呼發生例外也要繼續輪詢
+            self.after(100, self._poll_queue)
+
+    def _run_job(
+        self,
+        work,
+        on_done,
+        name="",
+        priority=PRIORITY_NORMAL,
+        kind=CPU,
+        show_errors=True,
+        **options,
+    ):
+        """將 work(cancel) 送進排程器，結束後於主執行緒呼叫 on_done(工作)
+
+        work 拋出例外而失敗時，show_errors 為 True 會直接顯示錯誤而不呼叫 on_done；
+        為 False 時一律交給 on_done 處理（例如批次轉換要統計失敗的檔案）。
+        options 會傳給 JobScheduler.submit（device、retries、check）。
+        """
+        job = self.scheduler.submit(
+            work,
+            name=name,
+            priority=priority,
+            kind=kind,
+            on_done=lambda job: self._post(
+                self._job_finished, job, on_done, show_errors
+            ),
+            **options,
+        )
+        self.cancel_button.config(state=tk.NORMAL)
+        return job
+
+    def _job_finished(self, job, on_done, show_errors):
+        if not self.scheduler.active_jobs():
+            self.cancel_button.config(state=tk.DISABLED)
+        if show_errors and job.state == FAILED and job.error is not None:
+            self._job_failed(job.error)
+        else:
+            on_done(job)
+
+    def _job_failed(self, error):
+        self.progress_var.set("處理過程發生錯誤！")
+        messagebox.showerror("錯誤", f"處理過程發生錯誤：{str(error)}")
+
+    def cancel_job(self):
+        """取消所有工作並終止 ffmpeg 子行程"""
+        if self.scheduler.active_jobs():
+            self.scheduler.cancel_all()
+            self.progress_var.set("正在取消...")
+
+    def _on_close(self):
+        """關閉視窗前先終止仍在執行的 ffmpeg"""
+        self.scheduler.shutdown()
+        self.waveform_cancel.cancel()
+        self.probe_pool.shutdown(wait=False, cancel_futures=True)
+        self.destroy()
+
+    def _show_progress(self, message, info):
+        """在狀態列顯示目前工作的進度"""
+        text = format_progress(info)
+        self.progress_var.set(f"{message} {text}" if text else message)
+
     def start_convert(self):
         """開始轉換所選檔案"""
-        if not self.files_to_convert:
+        if not len(self.convert_files):
             messagebox.showwarning("警告", "請先選擇要轉換的MP4檔案")
             return
 
+        existing, missing = [], []
+        for file in self.convert_files.paths():
+            (existing if os.path.exists(file) else missing).append(file)
+        if missing:
+            # 只列出前幾個，避免對話框過長
+            names = "\n".join(missing[:10])
+            more = f"\n…等 {len(missing)} 個檔案" if len(missing) > 10 else ""
+            messagebox.showerror("錯誤", f"找不到檔案：\n{names}{more}")
+        if not existing:
+            return
+
         try:
-            self.progress_var.set("正在轉換檔案...")
-            self.update()
+            workers = int(self.workers_var.get())
+        except (tk.TclError, ValueError):
+            workers = DEFAULT_WORKERS
+
+        remux = self.remux_var.get()
+        loudness = self._loudness_target()
+        # 同時轉換數即排程器的 CPU 上限；長檔案的分段數相對減少，避免超額使用 CPU
+        self.scheduler.set_limits(cpu_slots=workers)
+        chunk_workers = max(1, DEFAULT_WORKERS // workers)
+        manifest = get_job_manifest()
+        output_cache = get_output_cache()
+        # 已在排程中的檔案不重複送出
+        files = [file for file in existing if file not in self.convert_jobs]
+        batch = {"total": len(files), "finished": 0, "failed": [], "cancelled": 0}
 
-            for file in self.files_to_convert:
-                if os.path.exists(file):
-                    convert_mp4_to_mp3(file)
-                else:
-                    messagebox.showerror("錯誤", f"找不到檔案：{file}")
+        for file in files:
+
+            def work(cancel, file=file):
+                return convert_file(
+                    file,
+                    on_progress=lambda info: self._post(
+                        self._set_file_status, file, format_progress(info)
+                    ),
+                    cancel=cancel,
+                    remux=remux,
+                    manifest=manifest,
+                    loudness=loudness,
+                    chunk_workers=chunk_workers,
+                    output_cache=output_cache,
+                )
 
+            # 重新封裝只複製音訊串流，以讀寫為主
+            kind = IO if remux and loudness is None else CPU
+            self.convert_jobs[file] = self._run_job(
+                work,
+                lambda job, file=file: self._file_converted(file, job, batch),
+                name=os.path.basename(file),
+                priority=PRIORITY_BACKGROUND,
+                kind=kind,
+                device=device_of(file),
+                show_errors=False,
+            )
+            self._set_file_status(file, "排隊中")
+        if files:
+            self.progress_var.set("正在轉換檔案...")
+
+    def cancel_selected(self):
+        """取消轉換列表中選取檔案的工作"""
+        for item in self.file_list.selection():
+            job = self.convert_jobs.get(self.convert_files.path(item))
+            if job is not None:
+                self.scheduler.cancel(job)
+
+    def _set_file_status(self, file, status):
+        item = self.convert_files.iid(file)
+        if item and self.file_list.exists(item):
+            self.file_list.set(item, "進度", status)
+
+    def _file_converted(self, file, job, batch):
+        self.convert_jobs.pop(file, None)
+        batch["finished"] += 1
+        if job.state == DONE:
+            self._set_file_status(file, "完成")
+        elif job.state == CANCELLED:
+            batch["cancelled"] += 1
+            self._set_file_status(file, "已取消")
+        else:
+            batch["failed"].append(file)
+            error = f"：{str(job.error)}" if job.error is not None else ""
+            self._set_file_status(file, f"失敗{error}")
+        self.progress_var.set(f"正在轉換檔案... ({batch['finished']}/{batch['total']})")
+        if batch["finished"] == batch["total"]:
+            self._convert_done(batch)
+
+    def _convert_done(self, batch):
+        total, failed = batch["total"], batch["failed"]
+        succeeded = total - len(failed) - batch["cancelled"]
+        if batch["cancelled"]:
+            self.progress_var.set(f"已取消：完成 {succeeded} / {total} 個檔案")
+            return
+        if failed:
+            self.progress_var.set(
+                f"轉換完成：成功 {succeeded} 個，失敗 {len(failed)} 個"
+            )
+            messagebox.showwarning(
+                "完成",
+                "以下檔案轉換失敗：\n" + "\n".join(os.path.basename(f) for f in failed),
+            )
+        else:
             self.progress_var.set("轉換完成！")
             messagebox.showinfo("完成", "所有檔案已轉換完成！")
-            self.clear_list()  # 清空檔案列表
-        except Exception as e:
-            self.progress_var.set("轉換過程發生錯誤！")
-            messagebox.showerror("錯誤", f"轉換過程發生錯誤：{str(e)}")
+            if not self.convert_jobs:
+                self.clear_list()  # 其他批次也已結束時才清空檔案列表
 
     def add_files(self):
         files = filedialog.askopenfilenames(
@@ -413,13 +714,9 @@ class MP4ToMP3Converter(tk.Tk):
             filetypes=[("MP4檔案", "*.mp4")],
             initialdir=os.path.dirname(os.path.abspath(__file__)),
         )
-        for file in files:
-            if file not in self.files_to_convert:
-                self.files_to_convert.append(file)
-                duration = get_audio_duration(file)
-                self.file_list.insert(
-                    "", tk.END, values=(os.path.basename(file), duration)
-                )
+        self.convert_files.add(
+            files, lambda file: (os.path.basename(file), PROBING_TEXT, "")
+        )
 
     def add_audio_files(self):
         """選擇要合併的音訊檔案"""
@@ -428,88 +725,100 @@ class MP4ToMP3Converter(tk.Tk):
             filetypes=[("音訊檔案", "*.mp3 *.wav")],
             initialdir=os.path.dirname(os.path.abspath(__file__)),
         )
-        for file in files:
-            if file not in self.files_to_merge:
-                self.files_to_merge.append(file)
-                duration = get_audio_duration(file)
-                self.merge_list.insert(
-                    "", tk.END, values=(os.path.basename(file), duration)
-                )
-
-    def clear_list(self):
-        self.file_list.delete(*self.file_list.get_children())
-        self.files_to_convert.clear()
+        self.merge_files.add(files, lambda file: (os.path.basename(file), PROBING_TEXT))
+
+    def add_folder(self):
+        """加入資料夾（含子資料夾）中的所有MP4檔案"""
+        self._add_folder(
+            self.convert_files,
+            (".mp4",),
+            lambda file: (os.path.basename(file), PROBING_TEXT, ""),
+        )
 
-    def clear_merge_list(self):
-        """清除合併列表"""
-        self.merge_list.delete(*self.merge_list.get_children())
-        self.files_to_merge.clear()
+    def add_audio_folder(self):
+        """加入資料夾（含子資料夾）中的所有音訊檔案"""
+        self._add_folder(
+            self.merge_files,
+            (".mp3", ".wav"),
+            lambda file: (os.path.basename(file), PROBING_TEXT),
+        )
 
-    def move_up(self):
-        """將選中的檔案向上移動"""
-        selection = self.merge_list.selection()
-        if not selection:
+    def _add_folder(self, model, extensions, values):
+        """在背景走訪資料夾，找到的檔案分批加入列表並開始探測"""
+        folder = filedialog.askdirectory(title="選擇資料夾")
+        if not folder:
             return
+        self.progress_var.set("正在搜尋檔案...")
+
+        def scan():
+            batch, found = [], 0
+            last_post = time.monotonic()
+            for file in scan_media_files(folder, extensions):
+                batch.append(file)
+                found += 1
+                # 每 0.2 秒送出一批，搜尋還在進行時列表就會開始出現檔案
+                if time.monotonic() - last_post >= 0.2:
+                    self._post(self._folder_scanned, model, batch, values, found, False)
+                    batch, last_post = [], time.monotonic()
+            self._post(self._folder_scanned, model, batch, values, found, True)
+
+        threading.Thread(target=scan, daemon=True).start()
+
+    def _folder_scanned(self, model, files, values, found, finished):
+        model.add(files, values)
+        if finished:
+            self.progress_var.set(f"資料夾搜尋完成，找到 {found} 個檔案")
+        else:
+            self.progress_var.set(f"正在搜尋檔案...（已找到 {found} 個）")
 
-        item = selection[0]
-        idx = self.merge_list.index(item)
-        if idx == 0:
-            return
+    def _probe_later(self, tree, items, files):
+        """在背景探測檔案長度，完成後再填入列表"""
+        for item, file in zip(items, files):
+            # 已快取的檔案直接填入，不必排進探測池
+            info = probe_media(file, cache_only=True)
+            if info is not None:
+                tree.set(item, "長度", format_time(info["duration"]))
+                continue
 
-        prev = self.merge_list.prev(item)
-        if not prev:
-            return
+            def probe(item=item, file=file):
+                self.probe_results.put((tree, item, get_audio_duration(file)))
 
-        # 獲取當前項目的值
-        values = self.merge_list.item(item)["values"]
-        prev_values = self.merge_list.item(prev)["values"]
+            self.probe_pool.submit(probe)
 
-        # 交換值
-        self.merge_list.item(item, values=prev_values)
-        self.merge_list.item(prev, values=values)
+    def _flush_probe_results(self):
+        """將累積的探測結果一次更新到列表"""
+        try:
+            while True:
+                tree, item, duration = self.probe_results.get_nowait()
+                # 列表可能已被清除
+                if tree.exists(item):
+                    tree.set(item, "長度", duration)
+        except queue.Empty:
+            pass
 
-        # 更新選擇
-        self.merge_list.selection_set(prev)
+    def clear_list(self):
+        self.convert_files.clear()
 
-        # 更新檔案列表順序
-        idx = self.merge_list.index(item)
-        self.files_to_merge[idx], self.files_to_merge[idx - 1] = (
-            self.files_to_merge[idx - 1],
-            self.files_to_merge[idx],
-        )
+    def clear_merge_list(self):
+        """清除合併列表"""
+        self.merge_files.clear()
+
+    def move_up(self):
+        """將選中的檔案向上移動"""
+        selection = self.merge_list.selection()
+        if selection:
+            # 移動整列（而非交換值），順序以列表為準，背景探測結果仍能對應到正確的列
+            self.merge_files.move(selection[0], -1)
 
     def move_down(self):
         """將選中的檔案向下移動"""
         selection = self.merge_list.selection()
-        if not selection:
-            return
-
-        item = selection[0]
-        next_item = self.merge_list.next(item)
-        if not next_item:
-            return
-
-        # 獲取當前項目的值
-        values = self.merge_list.item(item)["values"]
-        next_values = self.merge_list.item(next_item)["values"]
-
-        # 交換值
-        self.merge_list.item(item, values=next_values)
-        self.merge_list.item(next_item, values=values)
-
-        # 更新選擇
-        self.merge_list.selection_set(next_item)
-
-        # 更新檔案列表順序
-        idx = self.merge_list.index(item)
-        self.files_to_merge[idx], self.files_to_merge[idx + 1] = (
-            self.files_to_merge[idx + 1],
-            self.files_to_merge[idx],
-        )
+        if selection:
+            self.merge_files.move(selection[0], 1)
 
     def start_merge(self):
         """開始合併音訊檔案"""
-        if len(self.files_to_merge) < 2:
+        if len(self.merge_files) < 2:
             messagebox.showwarning("警告", "請至少選擇兩個音訊檔案進行合併")
             return
 
@@ -520,11 +829,37 @@ class MP4ToMP3Converter(tk.Tk):
         )
 
         if output_file:
+            files = self.merge_files.paths()
+            loudness = self._loudness_target()
+
+            def work(cancel):
+                return merge_audio_files(
+                    files,
+                    output_file,
+                    on_progress=lambda info: self._post(
+                        self._show_progress, "正在合併音訊檔案...", info
+                    ),
+                    cancel=cancel,
+                    loudness=loudness,
+                )
+
+            self._run_job(
+                work,
+                self._merge_done,
+                name=os.path.basename(output_file),
+                device=device_of(files[0]),
+            )
             self.progress_var.set("正在合併音訊檔案...")
-            self.update()
-            merge_audio_files(self.files_to_merge, output_file)
+
+    def _merge_done(self, job):
+        if job.state == DONE:
             self.progress_var.set("合併完成！")
             messagebox.showinfo("完成", "音訊檔案合併完成！")
+        elif job.state == CANCELLED:
+            self.progress_var.set("已取消合併")
+        else:
+            self.progress_var.set("合併失敗！")
+            messagebox.showerror("錯誤", "音訊合併過程中發生錯誤")
 
     def select_trim_file(self):
         """選擇要剪輯的音訊檔案"""
@@ -535,9 +870,91 @@ class MP4ToMP3Converter(tk.Tk):
         )
         if file:
             self.trim_file_var.set(file)
-            # 顯示音訊檔案的總長度
-            duration = get_audio_duration(file)
-            messagebox.showinfo("檔案資訊", f"音訊檔案長度：{duration}")
+            self._load_waveform(self.trim_waveform, file)
+
+    def _load_waveform(self, view, file):
+        """顯示檔案的波形；沒有峰值索引時在背景建立"""
+        view.source = file
+        if not waveform.is_available():
+            # 沒有 NumPy 時只顯示總長度
+            view.show_message(
+                f"音訊檔案長度：{get_audio_duration(file)}（安裝 NumPy 後可顯示波形）"
+            )
+            return
+
+        peaks = waveform.load_peaks(file)
+        if peaks is not None:
+            view.set_peaks(peaks)
+            return
+
+        view.show_message("正在建立波形…")
+
+        def on_progress(info):
+            if info.get("percent") is not None:
+                text = f"正在建立波形… {info['percent']:.0f}%"
+                self._post(self._waveform_message, view, file, text)
+
+        def build():
+            try:
+                peaks = waveform.get_peaks(
+                    file, on_progress=on_progress, cancel=self.waveform_cancel
+                )
+            except JobCancelled:
+                return
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"無法建立波形: {str(e)}")
+                self._post(self._waveform_message, view, file, "無法建立波形")
+            else:
+                self._post(self._waveform_ready, view, file, peaks)
+
+        self.probe_pool.submit(build)
+
+    def _waveform_message(self, view, file, text):
+        # 使用者可能已改選其他檔案
+        if view.source == file:
+            view.show_message(text)
+
+    def _waveform_ready(self, view, file, peaks):
+        if view.source == file:
+            view.set_peaks(peaks)
+            if view is self.trim_waveform:
+                self._update_trim_marks()
+            else:
+                self._update_split_marks()
+
+    def _pick_trim(self, seconds, secondary):
+        var = self.end_time_var if secondary else self.start_time_var
+        var.set(format_pick_time(seconds))
+
+    def _update_trim_marks(self):
+        try:
+            start = parse_time(self.start_time_var.get())
+            end = parse_time(self.end_time_var.get())
+        except ValueError:
+            # 使用者還在輸入時間
+            self.trim_waveform.set_selection(None)
+            return
+        self.trim_waveform.set_selection((start, end) if end > start else None)
+
+    def _pick_split(self, seconds, secondary):
+        text = self.split_time_var.get().replace("，", ",").replace(",", " ")
+        times = text.split()
+        try:
+            points = {t: parse_time(t) for t in times}
+        except ValueError:
+            return  # 既有的內容無法解析時，不在錯誤的清單上增減分割點
+        if secondary:
+            # 移除最接近點選位置的分割點
+            if times:
+                times.remove(min(times, key=lambda t: abs(points[t] - seconds)))
+        elif format_pick_time(seconds) not in times:
+            times.append(format_pick_time(seconds))
+            times.sort(key=parse_time)
+        self.split_time_var.set(", ".join(times))
+
+    def _update_split_marks(self):
+        times = parse_time_list(self.split_time_var.get()) or []
+        self.split_waveform.set_markers([parse_time(t) for t in times])
 
     def start_trim(self):
         """開始剪輯音訊"""
@@ -561,15 +978,132 @@ class MP4ToMP3Converter(tk.Tk):
         )
 
         if output_file:
+            accurate = self.accurate_trim_var.get()
+
+            def work(cancel):
+                return trim_audio(
+                    input_file,
+                    output_file,
+                    start_time,
+                    end_time,
+                    on_progress=lambda info: self._post(
+                        self._show_progress, "正在剪輯音訊檔案...", info
+                    ),
+                    cancel=cancel,
+                    accurate=accurate,
+                )
+
+            # 直接複製串流的剪輯以讀寫為主；精準剪輯需要重新編碼
+            self._run_job(
+                work,
+                self._trim_done,
+                name=os.path.basename(output_file),
+                priority=PRIORITY_INTERACTIVE,
+                kind=CPU if accurate else IO,
+                device=device_of(input_file),
+            )
             self.progress_var.set("正在剪輯音訊檔案...")
-            self.update()
 
-            if trim_audio(input_file, output_file, start_time, end_time):
-                self.progress_var.set("剪輯完成！")
-                messagebox.showinfo("完成", "音訊檔案剪輯完成！")
-            else:
-                self.progress_var.set("剪輯失敗！")
-                messagebox.showerror("錯誤", "音訊剪輯過程中發生錯誤")
+    def _trim_done(self, job):
+        if job.state == DONE:
+            self.progress_var.set("剪輯完成！")
+            messagebox.showinfo("完成", "音訊檔案剪輯完成！")
+        elif job.state == CANCELLED:
+            self.progress_var.set("已取消剪輯")
+        else:
+            self.progress_var.set("剪輯失敗！")
+            messagebox.showerror("錯誤", "音訊剪輯過程中發生錯誤")
+
+    def import_clip_list(self):
+        """匯入 cue sheet、CSV 或 JSON 片段清單"""
+        file = filedialog.askopenfilename(
+            title="選擇片段清單",
+            filetypes=[
+                ("片段清單", " ".join(f"*{ext}" for ext in clips.CLIP_LIST_TYPES))
+            ],
+        )
+        if not file:
+            return
+        try:
+            clip_ranges = clips.load_clip_list(file)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("錯誤", f"無法讀取片段清單：{str(e)}")
+            return
+
+        self.clip_ranges = clip_ranges
+        self.clip_list.delete(*self.clip_list.get_children())
+        for name, start, end in clip_ranges:
+            self.clip_list.insert(
+                "",
+                tk.END,
+                values=(
+                    name,
+                    format_pick_time(start),
+                    "結尾" if end is None else format_pick_time(end),
+                ),
+            )
+        self.progress_var.set(f"已匯入 {len(clip_ranges)} 個片段")
+
+    def _select_clip(self):
+        selection = self.clip_list.selection()
+        if not selection:
+            return
+        _, start, end = self.clip_ranges[self.clip_list.index(selection[0])]
+        self.start_time_var.set(format_pick_time(start))
+        if end is not None:
+            self.end_time_var.set(format_pick_time(end))
+
+    def start_extract_clips(self):
+        """依匯入的片段清單一次擷取所有片段"""
+        input_file = self.trim_file_var.get()
+        if not input_file or not os.path.exists(input_file):
+            messagebox.showerror("錯誤", "請選擇有效的音訊檔案")
+            return
+        if not self.clip_ranges:
+            messagebox.showerror("錯誤", "請先匯入片段清單")
+            return
+
+        output_dir = filedialog.askdirectory(title="選擇片段的輸出資料夾")
+        if not output_dir:
+            return
+
+        clip_ranges = list(self.clip_ranges)
+        accurate = self.accurate_trim_var.get()
+
+        def work(cancel):
+            return clips.extract_clips(
+                input_file,
+                clip_ranges,
+                output_dir,
+                accurate=accurate,
+                on_progress=lambda info: self._post(
+                    self._show_progress, "正在擷取片段...", info
+                ),
+                cancel=cancel,
+            )
+
+        # 排程器只為這個工作保留一個執行位置，因此只使用一個 ffmpeg 行程
+        self._run_job(
+            work,
+            self._clips_done,
+            name=os.path.basename(input_file),
+            priority=PRIORITY_INTERACTIVE,
+            kind=CPU if accurate else IO,
+            device=device_of(input_file),
+            check=lambda result: result[0],
+        )
+        self.progress_var.set("正在擷取片段...")
+
+    def _clips_done(self, job):
+        if job.state == DONE:
+            _, output_paths = job.result
+            self.progress_var.set("擷取完成！")
+            messagebox.showinfo("完成", f"已擷取 {len(output_paths)} 個片段！")
+        elif job.state == CANCELLED:
+            self.progress_var.set("已取消擷取")
+        else:
+            self.progress_var.set("擷取失敗！")
+            messagebox.showerror("錯誤", "擷取片段過程中發生錯誤")
 
     def select_split_file(self):
         """選擇要分割的音訊檔案"""
@@ -580,9 +1114,59 @@ class MP4ToMP3Converter(tk.Tk):
         )
         if file:
             self.split_file_var.set(file)
-            # 顯示音訊檔案的總長度
-            duration = get_audio_duration(file)
-            messagebox.showinfo("檔案資訊", f"音訊檔案長度：{duration}")
+            self._load_waveform(self.split_waveform, file)
+
+    def detect_split_points(self):
+        """偵測靜音並把分割點填入分割時間欄位"""
+        input_file = self.split_file_var.get()
+        if not input_file or not os.path.exists(input_file):
+            messagebox.showerror("錯誤", "請選擇有效的音訊檔案")
+            return
+        if not silence.is_available():
+            messagebox.showerror("錯誤", "需要安裝 NumPy 才能偵測靜音")
+            return
+        try:
+            min_silence = float(self.min_silence_var.get())
+            threshold_db = float(self.silence_threshold_var.get())
+        except (tk.TclError, ValueError):
+            messagebox.showerror("錯誤", "請輸入有效的靜音長度與音量門檻")
+            return
+
+        def work(cancel):
+            try:
+                silences = silence.detect_silence(
+                    input_file,
+                    threshold_db,
+                    min_silence,
+                    on_progress=lambda info: self._post(
+                        self._show_progress, "正在偵測靜音...", info
+                    ),
+                    cancel=cancel,
+                )
+            except JobCancelled:
+                return None
+            duration = (probe_media(input_file) or {}).get("duration")
+            return silence.silence_split_points(silences, duration)
+
+        self._run_job(
+            work,
+            self._silence_detected,
+            name=os.path.basename(input_file),
+            priority=PRIORITY_INTERACTIVE,
+            check=lambda points: points is not None,
+        )
+        self.progress_var.set("正在偵測靜音...")
+
+    def _silence_detected(self, job):
+        if job.state != DONE:
+            self.progress_var.set("已取消靜音偵測")
+            return
+        points = job.result
+        if not points:
+            self.progress_var.set("找不到符合條件的靜音")
+            return
+        self.split_time_var.set(", ".join(format_pick_time(t) for t in points))
+        self.progress_var.set(f"找到 {len(points)} 個分割點，確認後按「開始分割」")
 
     def start_split(self):
         """開始分割音訊"""
@@ -591,81 +1175,53 @@ class MP4ToMP3Converter(tk.Tk):
             messagebox.showerror("錯誤", "請選擇有效的音訊檔案")
             return
 
-        split_time = self.split_time_var.get()
-        if not split_time:
+        split_text = self.split_time_var.get()
+        if not split_text.strip():
             messagebox.showerror("錯誤", "請輸入分割時間點")
             return
 
-        self.progress_var.set("正在分割音訊檔案...")
-        self.update()
+        split_times = parse_time_list(split_text)
+        if split_times is None:
+            messagebox.showerror("錯誤", "分割時間點格式錯誤，且必須由小到大排列")
+            return
 
-        success, output_path1, output_path2 = split_audio(input_file, split_time)
+        def work(cancel):
+            return split_audio(
+                input_file,
+                split_times,
+                on_progress=lambda info: self._post(
+                    self._show_progress, "正在分割音訊檔案...", info
+                ),
+                cancel=cancel,
+            )
+
+        self._run_job(
+            work,
+            self._split_done,
+            name=os.path.basename(input_file),
+            priority=PRIORITY_INTERACTIVE,
+            kind=IO,
+            device=device_of(input_file),
+            check=lambda result: result[0],
+        )
+        self.progress_var.set("正在分割音訊檔案...")
 
-        if success:
+    def _split_done(self, job):
+        if job.state == DONE:
+            _, output_paths = job.result
             self.progress_var.set("分割完成！")
-            messagebox.showinfo(
-                "完成",
-                f"音訊檔案分割完成！\n第一部分：{os.path.basename(output_path1)}\n第二部分：{os.path.basename(output_path2)}",
+            parts = "\n".join(
+                f"第 {i} 部分：{os.path.basename(path)}"
+                for i, path in enumerate(output_paths, start=1)
             )
+            messagebox.showinfo("完成", f"音訊檔案分割完成！\n{parts}")
+        elif job.state == CANCELLED:
+            self.progress_var.set("已取消分割")
         else:
             self.progress_var.set("分割失敗！")
             messagebox.showerror("錯誤", "音訊分割過程中發生錯誤")
 
 
-def split_audio(input_file, split_time):
-    """在指定時間點分割音訊檔案"""
-    try:
-        input_path = str(input_file).encode("utf-8").decode("utf-8")
-        file_name = os.path.splitext(os.path.basename(input_file))[0]
-        file_ext = os.path.splitext(input_file)[1]
-        output_path1 = os.path.join(
-            os.path.dirname(input_file), f"{file_name}_part1{file_ext}"
-        )
-        output_path2 = os.path.join(
-            os.path.dirname(input_file), f"{file_name}_part2{file_ext}"
-        )
-
-        # 分割第一部分
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-i",
-                input_path,
-                "-t",
-                split_time,  # 從開始到分割點
-                "-acodec",
-                "copy",
-                output_path1,
-            ],
-            check=True,
-            encoding="utf-8",
-            errors="replace",
-        )
-
-        # 分割第二部分
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-i",
-                input_path,
-                "-ss",
-                split_time,  # 從分割點到結束
-                "-acodec",
-                "copy",
-                output_path2,
-            ],
-            check=True,
-            encoding="utf-8",
-            errors="replace",
-        )
-
-        print(f"成功分割音訊: {Path(input_path).name}")
-        return True, output_path1, output_path2
-    except Exception as e:
-        print(f"分割失敗: {str(e)}")
-        return False, None, None
-
-
 def main():
     app = MP4ToMP3Converter()
     app.mainloop()
@@ -0,0 +1,107 @@
+import itertools
+from collections import deque
+
+
+class FileListModel:
+    """Treeview 檔案列表的資料模型
+
+    以字典對應路徑與列 id，檢查重複檔案只需 O(1)；列的順序以 Treeview 本身為準，
+    重新排序只需移動列，不必再同步另一份列表。大量加入時分批插入，每批之間讓出
+    事件迴圈，加入數萬個檔案時介面仍能回應。
+    """
+
+    # 每次事件迴圈插入的列數
+    BATCH_SIZE = 500
+
+    def __init__(self, tree, on_inserted=None):
+        self.tree = tree
+        # on_inserted(路徑列表, 列 id 列表) 會在每批列實際插入後呼叫
+        self.on_inserted = on_inserted
+        self._iids = {}  # 路徑 -> 列 id
+        self._paths = {}  # 列 id -> 路徑
+        self._pending = deque()  # 等待插入的 (路徑, 列 id, 欄位值)
+        self._scheduled = False
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._iids)
+
+    def __contains__(self, path):
+        return path in self._iids
+
+    def iid(self, path):
+        """取得檔案對應的列 id，不在列表中時回傳 None"""
+        return self._iids.get(path)
+
+    def path(self, iid):
+        """取得列 id 對應的檔案路徑，不在列表中時回傳 None"""
+        return self._paths.get(iid)
+
+    def paths(self):
+        """依目前顯示順序回傳所有檔案（包含尚未插入的列）"""
+        ordered = [self._paths[iid] for iid in self.tree.get_children()]
+        ordered.extend(path for path, _, _ in self._pending)
+        return ordered
+
+    def add(self, paths, values):
+        """加入尚未在列表中的檔案，回傳實際加入的數量
+
+        values(路徑) 回傳該列的欄位值。列會在之後的事件迴圈中分批插入。
+        """
+        added = 0
+        for path in paths:
+            if path in self._iids:
+                continue
+            # 自行產生列 id，插入前就能建立對應
+            iid = f"file{next(self._counter)}"
+            self._iids[path] = iid
+            self._paths[iid] = path
+            self._pending.append((path, iid, values(path)))
+            added += 1
+        if added and not self._scheduled:
+            self._scheduled = True
+            self.tree.after_idle(self._insert_batch)
+        return added
+
+    def _insert_batch(self):
+        self._scheduled = False
+        inserted_paths, inserted_iids = [], []
+        for _ in range(min(self.BATCH_SIZE, len(self._pending))):
+            path, iid, values = self._pending.popleft()
+            self.tree.insert("", "end", iid=iid, values=values)
+            inserted_paths.append(path)
+            inserted_iids.append(iid)
+        if self._pending:
+            self._scheduled = True
+            self.tree.after(1, self._insert_batch)
+        if inserted_paths and self.on_inserted:
+            self.on_inserted(inserted_paths, inserted_iids)
+
+    def move(self, iid, offset):
+        """將列上下移動 offset 個位置，回傳是否有移動"""
+        index = self.tree.index(iid)
+        if offset < 0 and index == 0 or offset > 0 and not self.tree.next(iid):
+            return False
+        # 超過結尾的位置會由 Treeview 自動放到最後
+        self.tree.move(iid, "", max(index + offset, 0))
+        self.tree.see(iid)
+        return True
+
+    def remove(self, iids):
+        """移除指定的列"""
+        iids = [iid for iid in iids if iid in self._paths]
+        removed = set(iids)
+        if self._pending:
+            self._pending = deque(e for e in self._pending if e[1] not in removed)
+        existing = [iid for iid in iids if self.tree.exists(iid)]
+        if existing:
+            self.tree.delete(*existing)
+        for iid in iids:
+            del self._iids[self._paths.pop(iid)]
+
+    def clear(self):
+        """清除所有檔案（包含尚未插入的列）"""
+        self._pending.clear()
+        self.tree.delete(*self.tree.get_children())
+        self._iids.clear()
+        self._paths.clear()
@@ -0,0 +1,47 @@
+import os
+
+from audio_tools import probe_media
+
+
+def has_audio(file_path):
+    """以 ffprobe 檢查檔案是否包含音訊串流"""
+    info = probe_media(file_path)
+    return info is not None and info.get("codec") is not None
+
+
+def scan_media_files(root, extensions, recursive=True, probe=False):
+    """逐步走訪資料夾，產生副檔名符合 extensions 的檔案路徑
+
+    以 os.scandir 與堆疊代替遞迴，邊走訪邊產生結果，不會先載入整棵目錄樹；
+    同一資料夾內依名稱排序，檔案先於子資料夾。probe 為 True 時，副檔名不符的
+    檔案會以 ffprobe 探測，有音訊串流的也會產生。名稱以 . 開頭的檔案與資料夾
+    （例如轉換中的暫存檔）會被略過。
+    """
+    extensions = tuple(ext.lower() for ext in extensions)
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        try:
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"無法讀取資料夾: {str(e)}")
+            continue
+
+        subfolders = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        subfolders.append(entry.path)
+                elif entry.is_file():
+                    if entry.name.lower().endswith(extensions):
+                        yield entry.path
+                    elif probe and has_audio(entry.path):
+                        yield entry.path
+            except OSError:
+                continue
+        # 反向放入堆疊，取出時才會依名稱順序走訪
+        stack.extend(reversed(subfolders))
@@ -0,0 +1,141 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from media_cache import get_cache_dir
+
+# 工作狀態
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def fingerprint(file_path):
+    """以檔案大小與修改時間作為輸入檔案的指紋，檔案不存在時回傳 None"""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _output_size(output_path):
+    try:
+        return os.path.getsize(output_path)
+    except OSError:
+        return None
+
+
+class JobManifest:
+    """記錄每個輸入檔案的轉換狀態，讓中斷的批次可以只處理未完成的檔案"""
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(get_cache_dir(), "jobs.sqlite3")
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    input TEXT PRIMARY KEY,
+                    fingerprint TEXT,
+                    output TEXT,
+                    params TEXT,
+                    state TEXT NOT NULL,
+                    output_size INTEGER,
+                    error TEXT,
+                    updated REAL
+                )
+                """)
+
+    @staticmethod
+    def _key(input_file):
+        return os.path.normcase(os.path.abspath(input_file))
+
+    def get(self, input_file):
+        """取得輸入檔案的工作紀錄，沒有紀錄時回傳 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, output, params, state, output_size, error "
+                "FROM jobs WHERE input = ?",
+                (self._key(input_file),),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("fingerprint", "output", "params", "state", "output_size", "error")
+        record = dict(zip(keys, row))
+        record["params"] = json.loads(record["params"]) if record["params"] else None
+        return record
+
+    def is_up_to_date(self, input_file, output_file, params):
+        """輸入檔案未變更、參數相同且輸出檔案仍完整存在時回傳 True"""
+        record = self.get(input_file)
+        return (
+            record is not None
+            and record["state"] == DONE
+            and record["fingerprint"] == fingerprint(input_file)
+            and record["output"] == os.path.abspath(output_file)
+            and record["params"] == params
+            and record["output_size"] is not None
+            and record["output_size"] == _output_size(output_file)
+        )
+
+    def _update(self, input_file, output_file, params, state, error=None):
+        output_size = _output_size(output_file) if state == DONE else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._key(input_file),
+                    fingerprint(input_file),
+                    os.path.abspath(output_file),
+                    json.dumps(params),
+                    state,
+                    output_size,
+                    error,
+                    time.time(),
+                ),
+            )
+
+    def mark_running(self, input_file, output_file, params):
+        self._update(input_file, output_file, params, RUNNING)
+
+    def mark_done(self, input_file, output_file, params):
+        self._update(input_file, output_file, params, DONE)
+
+    def mark_failed(self, input_file, output_file, params, error=None):
+        self._update(input_file, output_file, params, FAILED, error)
+
+    def summary(self):
+        """回傳各狀態的工作數量"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM jobs GROUP BY state"
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_manifest = None
+_default_manifest_lock = threading.Lock()
+
+
+def get_job_manifest():
+    """取得共用的工作紀錄實例；無法開啟資料庫時回傳 None"""
+    global _default_manifest
+    with _default_manifest_lock:
+        if _default_manifest is None:
+            try:
+                _default_manifest = JobManifest()
+            except (OSError, sqlite3.Error) as e:
+                print(f"無法開啟工作紀錄: {str(e)}")
+                return None
+        return _default_manifest
@@ -0,0 +1,668 @@
+"""多台機器分散轉換的工作伺服器
+
+伺服器以簡單的 HTTP/JSON 介面接受轉換、剪輯與分割工作，工作程序（在同一台或
+共用儲存空間的其他機器上）向伺服器領取工作、以既有的 ffmpeg 函式執行，並定期
+回報心跳與進度。工作程序停止回報心跳超過租約時間時，工作會重新排入佇列。
+
+工作只存在伺服器的記憶體中；路徑必須是所有機器都能存取的同一路徑。
+
+工作會讀寫任意路徑，因此伺服器預設只接受本機連線。要讓其他機器連線時必須設定
+共用的權杖（--token 或環境變數 MP4_TO_MP3_JOB_TOKEN），每個請求都要帶上
+「Authorization: Bearer <權杖>」標頭，否則回應 401。持有權杖的人能以工作程序的
+權限寫入任何路徑，權杖應只交給可信任的機器。
+
+介面（皆為 JSON）：
+    POST /jobs                  {"type", "params", "priority"} -> {"id"}
+    GET  /jobs                  -> {"jobs": [...]}
+    GET  /jobs/<id>             -> 工作
+    POST /jobs/<id>/cancel      -> 工作
+    POST /lease                 {"worker", "wait"} -> {"job": 工作或 null}
+    POST /jobs/<id>/heartbeat   {"worker", "progress"} -> {"cancel": 是否已取消}
+    POST /jobs/<id>/result      {"worker", "ok", "result", "error"} -> 工作
+    GET  /workers               -> {"workers": {名稱: 最後回報時間}}
+"""
+
+import heapq
+import hmac
+import ipaddress
+import itertools
+import json
+import math
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from audio_tools import (
+    OUTPUT_PROFILES,
+    CancelToken,
+    JobCancelled,
+    convert_file,
+    parse_time,
+    plan_conversion,
+    profile_output_path,
+    split_audio,
+    trim_audio,
+)
+from output_cache import get_output_cache
+from scheduler import (
+    CANCELLED,
+    DONE,
+    FAILED,
+    PENDING,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_NORMAL,
+    RUNNING,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 共用權杖的環境變數
+TOKEN_ENV = "MP4_TO_MP3_JOB_TOKEN"
+# 工作程序回報心跳的間隔與租約時間（秒）；超過租約時間沒有心跳就重新排入佇列
+HEARTBEAT_INTERVAL = 5.0
+LEASE_TIMEOUT = 30.0
+# 每個工作最多執行的次數（包含工作程序失聯與回報失敗）
+MAX_ATTEMPTS = 3
+# 領取工作時最多等待的秒數（長輪詢）
+LEASE_WAIT = 10.0
+# 請求內容的大小上限（位元組）
+MAX_BODY = 1024 * 1024
+
+JOB_TYPES = ("convert", "trim", "split")
+# 未指定優先順序時，剪輯與分割優先於大批轉換
+DEFAULT_PRIORITIES = {
+    "convert": PRIORITY_NORMAL,
+    "trim": PRIORITY_INTERACTIVE,
+    "split": PRIORITY_INTERACTIVE,
+}
+
+
+def _require_path(params, name):
+    if not isinstance(params.get(name), str) or not params[name]:
+        raise ValueError(f"{name} 必須是檔案路徑")
+
+
+def validate_params(job_type, params):
+    """在加入佇列前檢查工作參數，格式錯誤時拋出 ValueError"""
+    if not isinstance(params, dict):
+        raise ValueError("params 必須是物件")
+    _require_path(params, "input")
+    for name in ("remux", "accurate"):
+        if not isinstance(params.get(name, False), bool):
+            raise ValueError(f"{name} 必須是 true 或 false")
+
+    if job_type == "convert":
+        loudness = params.get("loudness")
+        if loudness is not None and (
+            not isinstance(loudness, (int, float))
+            or isinstance(loudness, bool)
+            or not math.isfinite(loudness)
+        ):
+            raise ValueError("loudness 必須是數字（LUFS）")
+        profiles = params.get("profiles")
+        if profiles is not None and (
+            not isinstance(profiles, list)
+            or not all(profile in OUTPUT_PROFILES for profile in profiles)
+        ):
+            raise ValueError(f"profiles 必須是 {', '.join(OUTPUT_PROFILES)} 的列表")
+
+    elif job_type == "trim":
+        _require_path(params, "output")
+        if "start" not in params or "end" not in params:
+            raise ValueError("剪輯工作必須指定 start 與 end")
+        if parse_time(params["end"]) <= parse_time(params["start"]):
+            raise ValueError("結束時間必須晚於開始時間")
+
+    elif job_type == "split":
+        times = params.get("times")
+        if isinstance(times, (str, int, float)):
+            times = [times]
+        if not isinstance(times, list) or not times:
+            raise ValueError("times 必須是時間點列表")
+        for value in times:
+            parse_time(value)
+
+
+def run_job(job_type, params, on_progress=None, cancel=None):
+    """在工作程序上執行一個工作，回傳 (是否成功, 結果字典)"""
+    if job_type == "convert":
+        input_file = params["input"]
+        profiles = params.get("profiles")
+        ok = convert_file(
+            input_file,
+            on_progress=on_progress,
+            cancel=cancel,
+            remux=params.get("remux", False),
+            loudness=params.get("loudness"),
+            profiles=profiles,
+            output_cache=get_output_cache(),
+        )
+        if profiles:
+            outputs = [profile_output_path(input_file, p) for p in profiles]
+            return ok, {"outputs": outputs}
+        output = plan_conversion(
+            input_file, params.get("remux", False), params.get("loudness")
+        )[0]
+        return ok, {"output": output}
+
+    if job_type == "trim":
+        ok = trim_audio(
+            params["input"],
+            params["output"],
+            params["start"],
+            params["end"],
+            on_progress=on_progress,
+            cancel=cancel,
+            accurate=params.get("accurate", False),
+        )
+        return ok, {"output": params["output"]}
+
+    if job_type == "split":
+        ok, outputs = split_audio(
+            params["input"], params["times"], on_progress=on_progress, cancel=cancel
+        )
+        return ok, {"outputs": outputs}
+
+    raise ValueError(f"不支援的工作類型: {job_type}")
+
+
+class JobServer:
+    """工作佇列與租約管理；HTTP 介面見 serve()"""
+
+    def __init__(self, lease_timeout=LEASE_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self._jobs = {}  # id -> 工作字典
+        self._queue = []  # (優先順序, 序號, id)
+        self._leases = []  # (租約到期時間, id, 第幾次執行)
+        self._ids = itertools.count(1)
+        self._counter = itertools.count()  # 同優先順序時依加入順序
+        self._workers = {}  # 名稱 -> 最後回報時間
+        self._keys = {}  # (類型, 參數) 的 JSON -> 最近一次加入的工作 id
+        self._condition = threading.Condition()
+
+    def submit(self, job_type, params, priority=None):
+        """加入工作，回傳工作 id；相同且尚未結束的工作不會重複加入"""
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"不支援的工作類型: {job_type}")
+        validate_params(job_type, params)
+        if priority is None:
+            priority = DEFAULT_PRIORITIES[job_type]
+        # 佇列以優先順序排序，混入其他型別會讓之後的比較全部失敗
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            raise ValueError("priority 必須是整數")
+        key = json.dumps([job_type, params], sort_keys=True)
+        with self._condition:
+            existing = self._jobs.get(self._keys.get(key))
+            if existing and existing["state"] in (PENDING, RUNNING):
+                return existing["id"]
+            job_id = str(next(self._ids))
+            self._keys[key] = job_id
+            self._jobs[job_id] = {
+                "id": job_id,
+                "type": job_type,
+                "params": params,
+                "priority": priority,
+                "state": PENDING,
+                "attempts": 0,
+                "worker": None,
+                "progress": None,
+                "result": None,
+                "error": None,
+                "lease_expires": None,
+                "cancel": False,
+            }
+            self._push(job_id)
+            self._condition.notify_all()
+            return job_id
+
+    def _push(self, job_id):
+        job = self._jobs[job_id]
+        heapq.heappush(self._queue, (job["priority"], next(self._counter), job_id))
+
+    def get(self, job_id):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def jobs(self):
+        with self._condition:
+            return [dict(job) for job in self._jobs.values()]
+
+    def workers(self):
+        with self._condition:
+            return dict(self._workers)
+
+    def cancel(self, job_id):
+        """取消工作；執行中的工作會在下一次心跳時通知工作程序終止 ffmpeg"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["state"] == PENDING:
+                job["state"] = CANCELLED
+            elif job["state"] == RUNNING:
+                job["cancel"] = True
+            return dict(job)
+
+    def lease(self, worker, wait=0.0):
+        """讓工作程序領取最優先的工作，最多等待 wait 秒；沒有工作時回傳 None"""
+        deadline = time.monotonic() + wait
+        with self._condition:
+            self._workers[worker] = time.time()
+            while True:
+                self._requeue_expired()
+                while self._queue:
+                    _, _, job_id = heapq.heappop(self._queue)
+                    job = self._jobs[job_id]
+                    if job["state"] != PENDING:
+                        continue  # 已取消
+                    job["state"] = RUNNING
+                    job["worker"] = worker
+                    job["attempts"] += 1
+                    job["progress"] = None
+                    job["lease_expires"] = time.monotonic() + self.lease_timeout
+                    heapq.heappush(
+                        self._leases, (job["lease_expires"], job_id, job["attempts"])
+                    )
+                    return dict(job)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(min(remaining, self.lease_timeout))
+
+    def heartbeat(self, job_id, worker, progress=None):
+        """延長租約；回傳 None 表示工作程序已不再持有這個工作，否則回傳是否已取消"""
+        with self._condition:
+            self._workers[worker] = time.time()
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] != RUNNING or job["worker"] != worker:
+                return None
+            job["lease_expires"] = time.monotonic() + self.lease_timeout
+            job["progress"] = progress
+            return job["cancel"]
+
+    def complete(self, job_id, worker, ok, result=None, error=None):
+        """記錄工作結果；失敗的工作在次數內會重新排入佇列，交給其他工作程序"""
+        with self._condition:
+            self._workers[worker] = time.time()
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] != RUNNING or job["worker"] != worker:
+                return None
+            job["result"], job["error"] = result, error
+            job["lease_expires"] = None
+            if ok:
+                job["state"] = DONE
+            elif job["cancel"]:
+                job["state"] = CANCELLED
+            else:
+                self._retry_or_fail(job, error or "處理失敗")
+            self._condition.notify_all()
+            return dict(job)
+
+    def _retry_or_fail(self, job, reason):
+        print(f"工作 {job['id']} 失敗（第 {job['attempts']} 次）: {reason}")
+        job["worker"] = None
+        if job["attempts"] < self.max_attempts:
+            job["state"] = PENDING
+            self._push(job["id"])
+        else:
+            job["state"] = FAILED
+            job["error"] = reason
+
+    def _requeue_expired(self):
+        """租約過期（工作程序失聯）的工作重新排入佇列
+
+        只檢查到期時間最早的租約：心跳延長過的租約在原本的時間取出時改以新的到期時間放回，
+        已結束或重新領取過的工作則直接丟棄，不必每次都掃描所有工作。
+        """
+        now = time.monotonic()
+        while self._leases and self._leases[0][0] < now:
+            _, job_id, attempt = heapq.heappop(self._leases)
+            job = self._jobs[job_id]
+            if job["state"] != RUNNING or job["attempts"] != attempt:
+                continue
+            if job["lease_expires"] >= now:
+                heapq.heappush(self._leases, (job["lease_expires"], job_id, attempt))
+                continue
+            job["lease_expires"] = None
+            if job["cancel"]:
+                job["state"] = CANCELLED
+            else:
+                self._retry_or_fail(job, f"工作程序 {job['worker']} 失聯")
+            self._condition.notify_all()
+
+    def reap(self):
+        """定期檢查過期的租約，讓沒有工作程序在等待時也能更新狀態"""
+        with self._condition:
+            self._requeue_expired()
+
+
+def _public(job):
+    """去掉內部欄位，回傳可輸出為 JSON 的工作"""
+    job = dict(job)
+    job.pop("lease_expires", None)
+    return job
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "mp4-to-mp3-jobs/1"
+
+    def log_message(self, format, *args):
+        pass  # 不逐一記錄請求
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        """讀取 JSON 內容；Content-Length 無效或過大時拋出 ValueError"""
+        length = self.headers.get("Content-Length") or "0"
+        if not length.isdigit():
+            raise ValueError("Content-Length 無效")
+        length = int(length)
+        if length > MAX_BODY:
+            raise ValueError("內容過大")
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ValueError("內容不是有效的 JSON") from None
+
+    def _route(self):
+        return [part for part in self.path.split("?")[0].split("/") if part]
+
+    def _authorized(self):
+        """設定權杖時檢查請求的 Authorization 標頭，不符時回應 401"""
+        token = self.server.token
+        if not token:
+            return True
+        given = self.headers.get("Authorization", "")
+        if hmac.compare_digest(
+            given.encode("utf-8"), f"Bearer {token}".encode("utf-8")
+        ):
+            return True
+        self._send(401, {"error": "權杖錯誤"})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        jobs = self.server.jobs
+        route = self._route()
+        if route == ["jobs"]:
+            self._send(200, {"jobs": [_public(job) for job in jobs.jobs()]})
+        elif len(route) == 2 and route[0] == "jobs":
+            job = jobs.get(route[1])
+            if job is None:
+                self._send(404, {"error": "找不到工作"})
+            else:
+                self._send(200, _public(job))
+        elif route == ["workers"]:
+            self._send(200, {"workers": jobs.workers()})
+        else:
+            self._send(404, {"error": "找不到路徑"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        jobs = self.server.jobs
+        route = self._route()
+        try:
+            body = self._body()
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+        if not isinstance(body, dict):
+            self._send(400, {"error": "內容必須是 JSON 物件"})
+            return
+
+        if route == ["jobs"]:
+            try:
+                job_id = jobs.submit(
+                    body.get("type"), body.get("params", {}), body.get("priority")
+                )
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+            else:
+                self._send(201, {"id": job_id})
+        elif route == ["lease"]:
+            try:
+                wait = float(body.get("wait", 0))
+            except (TypeError, ValueError):
+                wait = math.nan
+            if not math.isfinite(wait):
+                self._send(400, {"error": "wait 必須是秒數"})
+                return
+            wait = min(max(wait, 0.0), LEASE_WAIT)
+            job = jobs.lease(body.get("worker") or "unknown", wait)
+            self._send(200, {"job": _public(job) if job else None})
+        elif len(route) == 3 and route[0] == "jobs":
+            job_id, action = route[1], route[2]
+            worker = body.get("worker") or "unknown"
+            if action == "cancel":
+                job = jobs.cancel(job_id)
+                if job is None:
+                    self._send(404, {"error": "找不到工作"})
+                else:
+                    self._send(200, _public(job))
+            elif action == "heartbeat":
+                cancel = jobs.heartbeat(job_id, worker, body.get("progress"))
+                if cancel is None:
+                    self._send(409, {"error": "租約已失效"})
+                else:
+                    self._send(200, {"cancel": cancel})
+            elif action == "result":
+                job = jobs.complete(
+                    job_id,
+                    worker,
+                    bool(body.get("ok")),
+                    body.get("result"),
+                    body.get("error"),
+                )
+                if job is None:
+                    self._send(409, {"error": "租約已失效"})
+                else:
+                    self._send(200, _public(job))
+            else:
+                self._send(404, {"error": "找不到路徑"})
+        else:
+            self._send(404, {"error": "找不到路徑"})
+
+
+def is_loopback(host):
+    """host 是否只接受本機連線"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # 主機名稱可能對應到任何介面
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, jobs=None, token=None):
+    """建立 HTTP 伺服器（尚未開始服務）；port 為 0 時由系統選擇
+
+    沒有設定 token 時只能監聽本機位址，否則拋出 ValueError。
+    """
+    if not token and not is_loopback(host):
+        raise ValueError(f"監聽 {host} 時必須設定權杖（--token 或 {TOKEN_ENV}）")
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.jobs = jobs or JobServer()
+    server.token = token
+
+    def reap():
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            server.jobs.reap()
+
+    threading.Thread(target=reap, daemon=True).start()
+    return server
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, token=None):
+    """啟動工作伺服器直到被中斷；token 預設讀取環境變數 MP4_TO_MP3_JOB_TOKEN"""
+    server = make_server(host, port, token=token or os.environ.get(TOKEN_ENV))
+    print(f"工作伺服器已啟動: http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class JobClient:
+    """工作伺服器的用戶端"""
+
+    def __init__(self, url, token=None, timeout=LEASE_WAIT + 10):
+        self.url = url.rstrip("/")
+        self.token = token or os.environ.get(TOKEN_ENV)
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(
+            self.url + path, data=data, method=method, headers=headers
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b"{}")
+
+    def submit(self, job_type, params, priority=None):
+        """加入工作，回傳工作 id"""
+        status, body = self._request(
+            "POST", "/jobs", {"type": job_type, "params": params, "priority": priority}
+        )
+        if status != 201:
+            raise ValueError(body.get("error", f"HTTP {status}"))
+        return body["id"]
+
+    def get(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")[1]
+
+    def jobs(self):
+        return self._request("GET", "/jobs")[1]["jobs"]
+
+    def cancel(self, job_id):
+        return self._request("POST", f"/jobs/{job_id}/cancel")[1]
+
+    def lease(self, worker, wait=LEASE_WAIT):
+        """領取工作，沒有工作時回傳 None"""
+        status, body = self._request("POST", "/lease", {"worker": worker, "wait": wait})
+        if status == 401:
+            # 讓工作程序等待後再試，而不是不斷重新領取
+            raise PermissionError(body.get("error", "權杖錯誤"))
+        return body.get("job") if status == 200 else None
+
+    def heartbeat(self, job_id, worker, progress=None):
+        """回報心跳；回傳 True 表示應停止這個工作（已取消或租約已失效）"""
+        status, body = self._request(
+            "POST",
+            f"/jobs/{job_id}/heartbeat",
+            {"worker": worker, "progress": progress},
+        )
+        return status != 200 or body.get("cancel")
+
+    def report(self, job_id, worker, ok, result=None, error=None):
+        """回報工作結果"""
+        return self._request(
+            "POST",
+            f"/jobs/{job_id}/result",
+            {"worker": worker, "ok": ok, "result": result, "error": error},
+        )[1]
+
+    def wait(self, job_ids, poll_interval=1.0):
+        """等待工作全部結束，回傳與 job_ids 順序相同的工作列表"""
+        pending = list(job_ids)
+        finished = {}
+        while pending:
+            for job_id in list(pending):
+                job = self.get(job_id)
+                if job.get("state") in (DONE, FAILED, CANCELLED):
+                    finished[job_id] = job
+                    pending.remove(job_id)
+            if pending:
+                time.sleep(poll_interval)
+        return [finished[job_id] for job_id in job_ids]
+
+
+def default_worker_name():
+    """以主機名稱與行程編號作為工作程序名稱"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Worker:
+    """向工作伺服器領取並執行工作的工作程序"""
+
+    def __init__(
+        self, url, name=None, heartbeat_interval=HEARTBEAT_INTERVAL, token=None
+    ):
+        self.client = JobClient(url, token=token)
+        self.name = name or default_worker_name()
+        self.heartbeat_interval = heartbeat_interval
+
+    def run(self, stop=None):
+        """持續領取工作，直到 stop（threading.Event）被設定"""
+        stop = stop or threading.Event()
+        print(f"工作程序 {self.name} 已連線到 {self.client.url}")
+        while not stop.is_set():
+            try:
+                job = self.client.lease(self.name)
+            except OSError as e:
+                print(f"無法連線到工作伺服器: {str(e)}")
+                stop.wait(self.heartbeat_interval)
+                continue
+            if job:
+                self.execute(job)
+
+    def execute(self, job):
+        """執行一個工作，期間定期回報心跳；伺服器要求取消時終止 ffmpeg"""
+        cancel = CancelToken()
+        progress = {}
+        finished = threading.Event()
+
+        def on_progress(info):
+            progress.clear()
+            progress.update(info)
+
+        def heartbeat():
+            while not finished.wait(self.heartbeat_interval):
+                try:
+                    stop = self.client.heartbeat(job["id"], self.name, dict(progress))
+                except OSError:
+                    continue  # 伺服器暫時無法連線，下一次再試
+                if stop:
+                    # 工作已被取消，或租約過期已交給其他工作程序
+                    cancel.cancel()
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        print(f"開始工作 {job['id']}（{job['type']}）")
+        error = None
+        try:
+            ok, result = run_job(job["type"], job["params"], on_progress, cancel)
+        except JobCancelled:
+            ok, result = False, None
+        except Exception as e:
+            ok, result, error = False, None, str(e)
+        finally:
+            finished.set()
+
+        try:
+            self.client.report(job["id"], self.name, ok, result, error)
+        except OSError as e:
+            # 回報失敗時伺服器會在租約過期後重新排入佇列
+            print(f"無法回報工作結果: {str(e)}")
@@ -0,0 +1,161 @@
+import os
+import sqlite3
+import threading
+
+# 快取欄位（順序與資料表欄位一致）
+FIELDS = ("duration", "codec", "sample_rate", "channels", "bitrate")
+# 響度量測結果（loudnorm 第一次分析的輸出），與目標響度無關
+LOUDNESS_FIELDS = ("input_i", "input_tp", "input_lra", "input_thresh")
+# 檔案內容的雜湊值（輸出快取以此辨識不同路徑下的相同錄音）
+HASH_FIELDS = ("sha256",)
+
+
+def get_cache_dir():
+    """取得快取目錄，可用環境變數 MP4_TO_MP3_CACHE_DIR 覆寫"""
+    cache_dir = os.environ.get("MP4_TO_MP3_CACHE_DIR")
+    if not cache_dir:
+        base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+        if not base:
+            base = os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(base, "mp4_to_mp3")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def _file_key(file_path):
+    """回傳 (正規化路徑, 大小, 修改時間)，檔案不存在時回傳 None"""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    path = os.path.normcase(os.path.abspath(file_path))
+    return path, st.st_size, st.st_mtime_ns
+
+
+class MetadataCache:
+    """以 SQLite 儲存的媒體資訊、響度量測與內容雜湊快取，以路徑、大小與修改時間判斷是否有效"""
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(get_cache_dir(), "media_cache.sqlite3")
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # 工作執行緒也會查詢快取，因此共用連線並以鎖保護
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS media (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    duration REAL,
+                    codec TEXT,
+                    sample_rate INTEGER,
+                    channels INTEGER,
+                    bitrate INTEGER
+                )
+                """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS loudness (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    input_i REAL,
+                    input_tp REAL,
+                    input_lra REAL,
+                    input_thresh REAL
+                )
+                """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS content_hash (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT
+                )
+                """)
+
+    def _get(self, table, fields, file_path):
+        key = _file_key(file_path)
+        if key is None:
+            return None
+        path, size, mtime_ns = key
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT size, mtime_ns, {', '.join(fields)} FROM {table} WHERE path = ?",
+                (path,),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] != size or row[1] != mtime_ns:
+                # 檔案已變更，刪除過期的資料
+                with self._conn:
+                    self._conn.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+                return None
+        return dict(zip(fields, row[2:]))
+
+    def _put(self, table, fields, file_path, info):
+        key = _file_key(file_path)
+        if key is None:
+            return
+        values = key + tuple(info.get(field) for field in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {table} "
+                f"VALUES ({', '.join('?' * len(values))})",
+                values,
+            )
+
+    def get(self, file_path):
+        """取得快取的媒體資訊；沒有資料或檔案已變更時回傳 None"""
+        return self._get("media", FIELDS, file_path)
+
+    def put(self, file_path, info):
+        """儲存檔案的媒體資訊"""
+        self._put("media", FIELDS, file_path, info)
+
+    def get_loudness(self, file_path):
+        """取得快取的響度量測結果；沒有資料或檔案已變更時回傳 None"""
+        return self._get("loudness", LOUDNESS_FIELDS, file_path)
+
+    def put_loudness(self, file_path, measured):
+        """儲存檔案的響度量測結果"""
+        self._put("loudness", LOUDNESS_FIELDS, file_path, measured)
+
+    def get_hash(self, file_path):
+        """取得快取的內容雜湊值；沒有資料或檔案已變更時回傳 None"""
+        row = self._get("content_hash", HASH_FIELDS, file_path)
+        return row["sha256"] if row else None
+
+    def put_hash(self, file_path, sha256):
+        """儲存檔案的內容雜湊值"""
+        self._put("content_hash", HASH_FIELDS, file_path, {"sha256": sha256})
+
+    def clear(self):
+        """清除所有快取資料"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM media")
+            self._conn.execute("DELETE FROM loudness")
+            self._conn.execute("DELETE FROM content_hash")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_metadata_cache():
+    """取得共用的快取實例；無法開啟資料庫時回傳 None"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = MetadataCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"無法開啟媒體資訊快取: {str(e)}")
+                return None
+        return _default_cache
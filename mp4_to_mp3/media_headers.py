@@ -0,0 +1,468 @@
+"""不啟動 ffprobe 的媒體檔頭解析
+
+以記憶體映射開啟檔案，只讀取檔頭所在的幾個頁面：MP4 的 moov/mvhd 與音訊軌的
+mdhd/stsd、MP3 第一個音框的 Xing/Info/VBRI 標頭、WAV 的 fmt 與 data 區塊。
+不需要產生子行程，也不必解析整份 JSON，一個檔案不到一毫秒。
+
+回傳的字典與 audio_tools.probe_media 相同；編碼名稱與 ffprobe 一致。
+遇到無法確定的格式（例如 HE-AAC、分段 MP4、RF64）時回傳 None，由呼叫端改用 ffprobe。
+"""
+
+import mmap
+import os
+import struct
+
+# MP4 檔案開頭可能出現的 box
+_MP4_TOP_LEVEL = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pdin"}
+# MP4 音訊取樣項目 -> ffprobe 的編碼名稱（mp4a 需再看 esds）
+_MP4_CODECS = {
+    b"alac": "alac",
+    b"Opus": "opus",
+    b"fLaC": "flac",
+    b"ac-3": "ac3",
+    b"ec-3": "eac3",
+}
+# MPEG-4 物件類型（esds 中的 objectTypeIndication）
+_OTI_AAC = 0x40
+_OTI_MP3 = (0x69, 0x6B)
+# AAC AudioSpecificConfig 的取樣率索引
+_AAC_SAMPLE_RATES = (
+    96000,
+    88200,
+    64000,
+    48000,
+    44100,
+    32000,
+    24000,
+    22050,
+    16000,
+    12000,
+    11025,
+    8000,
+    7350,
+)
+
+# MPEG 音訊：版本位元 -> (版本, Layer III 每音框取樣數, 取樣率表)
+_MPEG_VERSIONS = {
+    0b11: (1, 1152, (44100, 48000, 32000)),
+    0b10: (2, 576, (22050, 24000, 16000)),
+    0b00: (2.5, 576, (11025, 12000, 8000)),
+}
+_MPEG1_L3_BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_MPEG2_L3_BITRATES = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+# 尋找第一個 MP3 音框時最多掃描的位元組數
+_MP3_SYNC_SEARCH = 64 * 1024
+# MP3 解碼器固有的延遲取樣數；LAME 標頭記錄的延遲與補白不含這部分
+MP3_DECODER_DELAY = 529
+# LAME 標頭中延遲與補白欄位可信的編碼器（與 ffmpeg 的判斷相同）
+_LAME_ENCODERS = (b"LAME", b"Lavf", b"Lavc")
+
+# WAV 格式代碼
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def _info(duration, codec, sample_rate, channels, bitrate):
+    return {
+        "duration": duration,
+        "codec": codec,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "bitrate": bitrate,
+    }
+
+
+def _boxes(data, start, end):
+    """逐一列出 [start, end) 範圍內的 MP4 box：(類型, 內容開始, box 結束)"""
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset  # 延伸到檔案結尾
+        if size < header or offset + size > end:
+            return  # 損毀或被截斷
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def _find_box(data, start, end, kind):
+    for box, body, box_end in _boxes(data, start, end):
+        if box == kind:
+            return body, box_end
+    return None
+
+
+def _mvhd_duration(data, body):
+    """讀取 mvhd 或 mdhd 的 (timescale, duration)"""
+    version = data[body]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, body + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, body + 12)
+    return timescale, duration
+
+
+def _descriptor(data, offset):
+    """讀取 MPEG-4 描述元的 (標籤, 內容開始, 長度)"""
+    tag = data[offset]
+    offset += 1
+    length = 0
+    for _ in range(4):
+        byte = data[offset]
+        offset += 1
+        length = (length << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            break
+    return tag, offset, length
+
+
+def _parse_esds(data, body, end):
+    """解析 esds，回傳 (編碼名稱, 取樣率, 聲道數, 平均位元率)；無法確定時回傳 None"""
+    offset = body + 4  # 版本與旗標
+    tag, offset, _ = _descriptor(data, offset)
+    if tag != 0x03:  # ES_Descriptor
+        return None
+    flags = data[offset + 2]
+    offset += 3
+    if flags & 0x80:
+        offset += 2
+    if flags & 0x40:
+        offset += 1 + data[offset]
+    if flags & 0x20:
+        offset += 2
+    tag, offset, _ = _descriptor(data, offset)
+    if tag != 0x04:  # DecoderConfigDescriptor
+        return None
+    oti = data[offset]
+    avg_bitrate = struct.unpack_from(">I", data, offset + 9)[0] or None
+    if oti in _OTI_MP3:
+        return "mp3", None, None, avg_bitrate
+    if oti != _OTI_AAC:
+        return None
+    offset += 13
+    if offset >= end:
+        return None
+    tag, offset, length = _descriptor(data, offset)
+    if tag != 0x05 or length < 2:  # DecoderSpecificInfo（AudioSpecificConfig）
+        return None
+    config = int.from_bytes(data[offset : offset + 2], "big")
+    object_type = config >> 11
+    index = (config >> 7) & 0xF
+    channels = (config >> 3) & 0xF
+    # 只處理 AAC-LC 等一般設定；HE-AAC（SBR/PS）的輸出取樣率與聲道需由 ffprobe 判斷
+    if object_type in (5, 29) or object_type == 31 or index >= len(_AAC_SAMPLE_RATES):
+        return None
+    if not 1 <= channels <= 7:
+        return None
+    channels = 8 if channels == 7 else channels
+    return "aac", _AAC_SAMPLE_RATES[index], channels, avg_bitrate
+
+
+def _parse_sound_track(data, trak, trak_end):
+    """解析音訊軌，回傳 (編碼名稱, 取樣率, 聲道數, 平均位元率)
+
+    不是音訊軌時回傳 None；是音訊軌但無法確定編碼時回傳 False。
+    """
+    mdia = _find_box(data, trak, trak_end, b"mdia")
+    if mdia is None:
+        return None
+    hdlr = _find_box(data, *mdia, b"hdlr")
+    if hdlr is None or data[hdlr[0] + 8 : hdlr[0] + 12] != b"soun":
+        return None
+    mdhd = _find_box(data, *mdia, b"mdhd")
+    timescale = _mvhd_duration(data, mdhd[0])[0] if mdhd else None
+
+    minf = _find_box(data, *mdia, b"minf")
+    stbl = minf and _find_box(data, *minf, b"stbl")
+    stsd = stbl and _find_box(data, *stbl, b"stsd")
+    if not stsd:
+        return False  # 音訊軌但無法判斷編碼
+    entries = _boxes(data, stsd[0] + 8, stsd[1])  # 略過版本、旗標與項目數
+    entry = next(entries, None)
+    if entry is None:
+        return False
+    kind, body, entry_end = entry
+    # AudioSampleEntry：聲道數在 +16，取樣率（16.16 定點數）在 +24
+    channels, _, _, _, rate = struct.unpack_from(">HHHHI", data, body + 16)
+    sample_rate = (rate >> 16) or timescale
+    version = struct.unpack_from(">H", data, body + 8)[0]
+    # QuickTime 第 1、2 版的取樣項目有額外欄位，子 box 的位置不同
+    children = body + 28 + {0: 0, 1: 16, 2: 36}.get(version, 0)
+
+    if kind == b"mp4a":
+        esds = _find_box(data, children, entry_end, b"esds")
+        parsed = esds and _parse_esds(data, *esds)
+        if not parsed:
+            return False
+        codec, config_rate, config_channels, bitrate = parsed
+        return (
+            codec,
+            config_rate or sample_rate,
+            config_channels or channels,
+            bitrate,
+        )
+    codec = _MP4_CODECS.get(kind)
+    if codec is None or version == 2:
+        return False  # 第 2 版的取樣率與聲道數在擴充欄位中
+    return codec, sample_rate, channels, None
+
+
+def _read_mp4(data, size):
+    moov = _find_box(data, 0, size, b"moov")
+    if moov is None:
+        return None
+    mvhd = _find_box(data, *moov, b"mvhd")
+    if mvhd is None:
+        return None
+    timescale, duration = _mvhd_duration(data, mvhd[0])
+    if not timescale or not duration or duration == 0xFFFFFFFF:
+        return None  # 分段 MP4 的長度要看 moof，交給 ffprobe
+    duration = duration / timescale
+
+    for kind, body, end in _boxes(data, *moov):
+        if kind != b"trak":
+            continue
+        track = _parse_sound_track(data, body, end)
+        if track is None:
+            continue
+        if track is False:
+            return None
+        codec, sample_rate, channels, bitrate = track
+        if bitrate is None:
+            bitrate = round(size * 8 / duration)
+        return _info(duration, codec, sample_rate, channels, bitrate)
+    # 沒有音訊軌（例如只有影像）
+    return _info(duration, None, None, None, round(size * 8 / duration))
+
+
+def _mp3_header(data, offset):
+    """解析 MPEG Layer III 音框標頭；不是有效的標頭時回傳 None"""
+    header = int.from_bytes(data[offset : offset + 4], "big")
+    if header >> 21 != 0x7FF or (header >> 17) & 0b11 != 0b01:
+        return None
+    version = _MPEG_VERSIONS.get((header >> 19) & 0b11)
+    bitrate_index = (header >> 12) & 0xF
+    rate_index = (header >> 10) & 0b11
+    if version is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg, samples, rates = version
+    table = _MPEG1_L3_BITRATES if mpeg == 1 else _MPEG2_L3_BITRATES
+    bitrate = table[bitrate_index] * 1000
+    sample_rate = rates[rate_index]
+    padding = (header >> 9) & 1
+    length = (144 if mpeg == 1 else 72) * bitrate // sample_rate + padding
+    channels = 1 if (header >> 6) & 0b11 == 0b11 else 2
+    return mpeg, samples, sample_rate, bitrate, channels, length
+
+
+def _id3v2_size(data):
+    """檔案開頭 ID3v2 標籤的大小（沒有標籤時為 0）"""
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    # ID3v2 標籤大小以 synchsafe 整數表示
+    tag_size = 0
+    for byte in data[6:10]:
+        tag_size = (tag_size << 7) | (byte & 0x7F)
+    return 10 + tag_size + (10 if data[5] & 0x10 else 0)
+
+
+def _xing_offset(data, offset, mpeg, channels):
+    """Xing/Info 標頭的位置：在音框標頭、CRC 與旁資訊之後"""
+    side_info = (
+        (32 if channels == 2 else 17) if mpeg == 1 else (17 if channels == 2 else 9)
+    )
+    crc = 0 if data[offset + 1] & 1 else 2
+    return offset + 4 + crc + side_info
+
+
+def lame_tag_fields(data, offset):
+    """找出 offset 處 Xing/Info 音框中各欄位的位置
+
+    回傳 (音框數欄位, 位元組數欄位, 延遲/補白欄位)，沒有該欄位時為 None；
+    offset 處不是 Xing/Info 音框時回傳 None。
+    """
+    frame = _mp3_header(data, offset)
+    if frame is None:
+        return None
+    xing = _xing_offset(data, offset, frame[0], frame[4])
+    if data[xing : xing + 4] not in (b"Xing", b"Info"):
+        return None
+    flags = struct.unpack_from(">I", data, xing + 4)[0]
+    position = xing + 8
+    frames_field = bytes_field = None
+    if flags & 0x1:
+        frames_field = position
+        position += 4
+    if flags & 0x2:
+        bytes_field = position
+        position += 4
+    if flags & 0x4:
+        position += 100  # 定位表
+    if flags & 0x8:
+        position += 4  # 品質
+    # 延遲與補白各 12 位元，位在 LAME 擴充標頭開頭後第 21 個位元組
+    gapless_field = None
+    if data[position : position + 4] in _LAME_ENCODERS and position + 24 <= len(data):
+        gapless_field = position + 21
+    return frames_field, bytes_field, gapless_field
+
+
+def read_lame_tag(data, offset):
+    """讀取 offset 處 Xing/Info 音框的 (音框數, 編碼器延遲, 結尾補白)
+
+    沒有記錄的值為 None；不是 Xing/Info 音框時回傳 None。音框數不含此音框本身。
+    """
+    fields = lame_tag_fields(data, offset)
+    if fields is None:
+        return None
+    frames_field, _, gapless_field = fields
+    frames = delay = padding = None
+    if frames_field is not None:
+        frames = struct.unpack_from(">I", data, frames_field)[0]
+    if gapless_field is not None:
+        value = int.from_bytes(data[gapless_field : gapless_field + 3], "big")
+        delay, padding = value >> 12, value & 0xFFF
+    return frames, delay, padding
+
+
+def read_mp3_length(file_path):
+    """依 LAME 標頭計算 MP3 解碼後的長度（秒），扣除編碼器延遲與結尾補白
+
+    與 ffmpeg 解碼時略過的取樣相同；第一個音框不是含延遲資訊的 Xing/Info 音框時回傳 None。
+    """
+    try:
+        with open(file_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offset = _id3v2_size(data)
+                frame = _mp3_header(data, offset)
+                tag = frame and read_lame_tag(data, offset)
+    except (OSError, ValueError, struct.error, IndexError):
+        return None
+    if not tag or tag[0] is None or tag[1] is None:
+        return None
+    frames, delay, padding = tag
+    samples, sample_rate = frame[1], frame[2]
+    # ffmpeg 從開頭略過延遲加上解碼器延遲，結尾只去掉超過解碼器延遲的補白
+    decoded = (
+        frames * samples
+        - (delay + MP3_DECODER_DELAY)
+        - max(padding - MP3_DECODER_DELAY, 0)
+    )
+    return max(decoded, 0) / sample_rate
+
+
+def _read_mp3(data, size):
+    offset = _id3v2_size(data)
+
+    # 找到連續兩個有效的音框標頭才算是 MP3，避免誤判其他格式
+    limit = min(size - 4, offset + _MP3_SYNC_SEARCH)
+    frame = None
+    while offset < limit:
+        frame = _mp3_header(data, offset)
+        if frame and offset + frame[5] + 4 <= size:
+            following = _mp3_header(data, offset + frame[5])
+            if following and following[:3] == frame[:3]:
+                break
+        frame = None
+        offset += 1
+    if frame is None:
+        return None
+    mpeg, samples, sample_rate, bitrate, channels, length = frame
+
+    # Xing/Info 標頭在旁資訊之後；VBRI 固定在標頭後 32 位元組
+    xing = _xing_offset(data, offset, mpeg, channels)
+    frames = audio_bytes = None
+    if data[xing : xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", data, xing + 4)[0]
+        position = xing + 8
+        if flags & 0x1:
+            frames = struct.unpack_from(">I", data, position)[0]
+            position += 4
+        if flags & 0x2:
+            audio_bytes = struct.unpack_from(">I", data, position)[0]
+    elif data[offset + 36 : offset + 40] == b"VBRI":
+        audio_bytes, frames = struct.unpack_from(">II", data, offset + 46)
+
+    if frames:
+        duration = frames * samples / sample_rate
+        if audio_bytes:
+            bitrate = round(audio_bytes * 8 / duration)
+    else:
+        # 固定位元率：以音訊資料大小估算（與 ffprobe 的做法相同），扣除 ID3v1 標籤
+        end = size - 128 if data[size - 128 : size - 125] == b"TAG" else size
+        duration = (end - offset) * 8 / bitrate
+    return _info(duration, "mp3", sample_rate, channels, bitrate)
+
+
+def _read_wav(data, size):
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    fmt = None
+    data_size = None
+    for kind, body, end in _wav_chunks(data, 12, size):
+        if kind == b"fmt ":
+            fmt = struct.unpack_from("<HHIIHH", data, body)
+            if fmt[0] == _WAVE_FORMAT_EXTENSIBLE and end - body >= 26:
+                # 實際格式在子格式 GUID 的前兩個位元組
+                fmt = (struct.unpack_from("<H", data, body + 24)[0],) + fmt[1:]
+        elif kind == b"data":
+            data_size = end - body
+            break
+    if fmt is None or data_size is None:
+        return None
+    format_tag, channels, sample_rate, byte_rate, _, bits = fmt
+    if format_tag == _WAVE_FORMAT_PCM:
+        codec = "pcm_u8" if bits == 8 else f"pcm_s{bits}le"
+    elif format_tag == _WAVE_FORMAT_IEEE_FLOAT:
+        codec = f"pcm_f{bits}le"
+    else:
+        return None
+    if bits not in (8, 16, 24, 32, 64) or not byte_rate:
+        return None
+    return _info(data_size / byte_rate, codec, sample_rate, channels, byte_rate * 8)
+
+
+def _wav_chunks(data, start, size):
+    """逐一列出 RIFF 區塊：(類型, 內容開始, 內容結束)"""
+    offset = start
+    while offset + 8 <= size:
+        kind, length = struct.unpack_from("<4sI", data, offset)
+        body = offset + 8
+        # 串流寫入的 WAV 可能把 data 長度留為 0 或 0xFFFFFFFF，以檔案大小為準
+        if kind == b"data" and (length == 0 or length == 0xFFFFFFFF):
+            length = size - body
+        end = min(body + length, size)
+        yield kind, body, end
+        offset = body + length + (length & 1)  # 區塊以偶數位元組對齊
+
+
+def read_media_info(file_path):
+    """只讀取檔頭取得媒體資訊；不支援的格式或無法確定時回傳 None"""
+    try:
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < 12:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                # 依檔頭的魔術數字選擇解析方式；RIFF 中不是 PCM 的內容交給 ffprobe
+                if data[:4] == b"RIFF":
+                    return _read_wav(data, size)
+                if data[4:8] in _MP4_TOP_LEVEL:
+                    return _read_mp4(data, size)
+                # 只有看起來像 MP3 的檔案才逐位元組尋找音框，其他格式直接交給 ffprobe
+                if (
+                    data[:3] == b"ID3"
+                    or _mp3_header(data, 0)
+                    or os.path.splitext(str(file_path))[1].lower() == ".mp3"
+                ):
+                    return _read_mp3(data, size)
+                return None
+    except (OSError, ValueError, struct.error, IndexError, ZeroDivisionError):
+        return None  # 損毀的檔頭交給 ffprobe 判斷
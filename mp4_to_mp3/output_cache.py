@@ -0,0 +1,215 @@
+"""以輸入內容定址的輸出快取
+
+同一段錄音常以不同的檔名或資料夾重複送進來。轉換前先計算輸入檔案內容的雜湊值，
+與輸出格式及編碼參數一起作為快取鍵；已轉換過相同內容時直接以硬連結（跨裝置時
+改為複製）取得先前的輸出，不必再執行 ffmpeg。快取有總大小上限，超過時刪除最久
+未使用的項目。
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from media_cache import get_cache_dir, get_metadata_cache
+
+# 快取總大小上限（位元組），可用環境變數 MP4_TO_MP3_OUTPUT_CACHE_MB 覆寫
+DEFAULT_MAX_BYTES = 10 * 1024**3
+# 計算雜湊時每次處理的大小；hashlib 處理大區塊時會釋放 GIL
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def hash_file(file_path):
+    """以記憶體映射逐塊計算檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return digest.hexdigest()  # 空檔案無法映射
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, size, HASH_CHUNK_SIZE):
+                    digest.update(view[offset : offset + HASH_CHUNK_SIZE])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+def content_hash(file_path):
+    """取得檔案內容的雜湊值，結果依路徑、大小與修改時間快取；無法讀取時回傳 None"""
+    cache = get_metadata_cache()
+    if cache is not None:
+        cached = cache.get_hash(file_path)
+        if cached:
+            return cached
+    try:
+        sha256 = hash_file(file_path)
+    except (OSError, ValueError) as e:
+        print(f"無法計算檔案雜湊: {str(e)}")
+        return None
+    if cache is not None:
+        cache.put_hash(file_path, sha256)
+    return sha256
+
+
+def _link_or_copy(source, target):
+    """以硬連結建立 target，無法連結（例如跨裝置）時改為複製；寫入暫存檔後再改名"""
+    folder, name = os.path.split(os.path.abspath(target))
+    temp_path = os.path.join(folder, f".{name}.cache-partial")
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, target)
+
+
+class OutputCache:
+    """以 SQLite 記錄的內容定址輸出快取"""
+
+    def __init__(self, root=None, max_bytes=None):
+        if root is None:
+            root = os.path.join(get_cache_dir(), "outputs")
+        if max_bytes is None:
+            env = os.environ.get("MP4_TO_MP3_OUTPUT_CACHE_MB")
+            max_bytes = int(env) * 1024**2 if env else DEFAULT_MAX_BYTES
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(root, "index.sqlite3"), check_same_thread=False
+        )
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS outputs (
+                    key TEXT PRIMARY KEY,
+                    file TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """)
+
+    def key(self, input_file, output_file, params):
+        """以輸入內容、輸出副檔名與編碼參數產生快取鍵；無法讀取輸入時回傳 None"""
+        sha256 = content_hash(input_file)
+        if sha256 is None:
+            return None
+        ext = os.path.splitext(str(output_file))[1].lower()
+        spec = json.dumps([sha256, ext, params], sort_keys=True)
+        return hashlib.sha256(spec.encode("utf-8")).hexdigest()
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, key[:2], key + ext)
+
+    def fetch(self, key, output_file):
+        """快取中有結果時建立 output_file 並回傳 True"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file, size, mtime_ns FROM outputs WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return False
+        cached, size, mtime_ns = row
+        try:
+            st = os.stat(cached)
+        except OSError:
+            st = None
+        if st is None or st.st_size != size or st.st_mtime_ns != mtime_ns:
+            # 快取檔案遺失，或透過硬連結被就地修改過
+            self._remove(key, cached)
+            return False
+        try:
+            _link_or_copy(cached, output_file)
+        except OSError as e:
+            print(f"無法從快取取得輸出: {str(e)}")
+            return False
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outputs SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+        return True
+
+    def store(self, key, output_file):
+        """將轉換完成的輸出加入快取，並刪除超過大小上限的舊項目"""
+        cached = self._path(key, os.path.splitext(str(output_file))[1].lower())
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            _link_or_copy(output_file, cached)
+            st = os.stat(cached)
+        except OSError as e:
+            print(f"無法加入輸出快取: {str(e)}")
+            return False
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?)",
+                (key, cached, st.st_size, st.st_mtime_ns, time.time()),
+            )
+        self.evict()
+        return True
+
+    def total_size(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM outputs"
+            ).fetchone()[0]
+
+    def evict(self, max_bytes=None):
+        """依最後使用時間由舊到新刪除項目，直到總大小不超過上限"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM outputs"
+            ).fetchone()[0]
+            if total <= limit:
+                return
+            rows = self._conn.execute(
+                "SELECT key, file, size FROM outputs ORDER BY last_used"
+            ).fetchall()
+        for key, cached, size in rows:
+            if total <= limit:
+                break
+            self._remove(key, cached)
+            total -= size
+
+    def _remove(self, key, cached):
+        # 輸出檔案是另一個硬連結，刪除快取檔案不影響已產生的輸出
+        try:
+            os.remove(cached)
+        except OSError:
+            pass
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM outputs WHERE key = ?", (key,))
+
+    def clear(self):
+        """清除所有快取項目"""
+        self.evict(0)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_output_cache():
+    """取得共用的輸出快取實例；無法開啟時回傳 None"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = OutputCache()
+            except (OSError, sqlite3.Error, ValueError) as e:
+                print(f"無法開啟輸出快取: {str(e)}")
+                return None
+        return _default_cache
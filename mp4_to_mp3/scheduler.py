@@ -0,0 +1,284 @@
+"""工作排程器
+
+轉換、合併、剪輯與分割都以工作的形式送進排程器：
+- 依優先順序執行（數字越小越優先），同優先順序依送出順序；
+- 每個工作有自己的 CancelToken，取消時會終止該工作的 ffmpeg 子行程；
+- 暫時性的錯誤（工作拋出 OSError 等例外）會在指數遞增的等待時間後重試；
+  回傳失敗結果或其他例外（例如輸入檔案損毀）則直接結束，重試也不會成功；
+- 重新編碼等 CPU 密集的工作共用 CPU 上限；直接複製串流等 I/O 密集的工作
+  則依所在的儲存裝置分別限制同時數量，不同磁碟上的工作互不影響。
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from audio_tools import DEFAULT_WORKERS, TRANSIENT_ERRORS, CancelToken
+
+# 優先順序（數字越小越優先）
+PRIORITY_INTERACTIVE = 0  # 使用者正在等待結果的剪輯、分割
+PRIORITY_NORMAL = 10
+PRIORITY_BACKGROUND = 20  # 大批轉換
+
+# 工作類型
+CPU = "cpu"  # 重新編碼
+IO = "io"  # 直接複製串流、分割等以讀寫為主的工作
+
+# 工作狀態
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# 每個儲存裝置預設的 I/O 工作同時數
+DEFAULT_IO_SLOTS = 2
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 1.0  # 第一次重試前等待的秒數，之後每次加倍
+# 視為暫時性而重試的例外；轉換、剪輯等函式遇到這些錯誤時會直接拋出
+RETRYABLE_ERRORS = TRANSIENT_ERRORS
+
+
+def device_of(path):
+    """取得檔案所在的儲存裝置代號；檔案不存在時改用所在資料夾"""
+    path = os.path.abspath(str(path))
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+
+class Job:
+    """排程器中的一個工作；state 與 result 在工作結束後才有意義"""
+
+    def __init__(self, name, work, priority, kind, device, retries, check, on_done):
+        self.name = name
+        self.work = work  # work(cancel) -> 結果
+        self.priority = priority
+        self.kind = kind
+        self.device = device
+        self.retries = retries
+        self.check = check  # check(結果) -> 是否成功
+        self.on_done = on_done  # on_done(job)，在工作執行緒中呼叫
+        self.cancel_token = CancelToken()
+        self.state = PENDING
+        self.attempts = 0
+        self.result = None
+        self.error = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_token.cancelled
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+
+class JobScheduler:
+    """依優先順序與資源上限執行工作的排程器"""
+
+    def __init__(
+        self,
+        cpu_slots=DEFAULT_WORKERS,
+        io_slots=DEFAULT_IO_SLOTS,
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+    ):
+        self.cpu_slots = cpu_slots
+        self.io_slots = io_slots  # 每個儲存裝置
+        self.retries = retries
+        self.backoff = backoff
+        # 每種資源一個佇列：CPU 工作共用一個，I/O 工作依裝置分開。
+        # 佇列內為 (優先順序, 序號, 工作) 的堆積，只需比較各佇列的第一個工作
+        self._queues = {}
+        self._delayed = []  # 等待重試的 (可執行時間, 序號, 工作)
+        self._counter = itertools.count()
+        self._running_cpu = 0
+        self._running_io = {}  # 裝置 -> 執行中的 I/O 工作數
+        self._active = set()  # 尚未結束的工作
+        self._condition = threading.Condition()
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def submit(
+        self,
+        work,
+        name="",
+        priority=PRIORITY_NORMAL,
+        kind=CPU,
+        device=None,
+        retries=None,
+        check=bool,
+        on_done=None,
+    ):
+        """送出工作，回傳 Job
+
+        work 會以該工作的 CancelToken 呼叫；回傳值交給 check 判斷是否成功。
+        拋出 RETRYABLE_ERRORS 時最多重試 retries 次，其他失敗不重試。
+        device 為 device_of() 的結果，用來分別限制各儲存裝置上的 I/O 工作。
+        """
+        job = Job(
+            name,
+            work,
+            priority,
+            kind,
+            device,
+            self.retries if retries is None else retries,
+            check,
+            on_done,
+        )
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("排程器已關閉")
+            self._active.add(job)
+            self._enqueue(job)
+            self._condition.notify()
+        return job
+
+    def set_limits(self, cpu_slots=None, io_slots=None):
+        """調整同時執行的上限，立即生效"""
+        with self._condition:
+            if cpu_slots is not None:
+                self.cpu_slots = max(1, cpu_slots)
+            if io_slots is not None:
+                self.io_slots = max(1, io_slots)
+            self._condition.notify()
+
+    def cancel(self, job):
+        """取消工作：等待中的工作直接移除，執行中的工作會終止其 ffmpeg"""
+        job.cancel_token.cancel()
+        with self._condition:
+            if job.state == PENDING and job in self._active:
+                # 留在佇列中的項目會在取出時略過
+                self._finish(job, CANCELLED)
+                notify = True
+            else:
+                notify = False
+            self._condition.notify()
+        if notify and job.on_done:
+            job.on_done(job)
+
+    def cancel_all(self):
+        with self._condition:
+            jobs = list(self._active)
+        for job in jobs:
+            self.cancel(job)
+
+    def active_jobs(self):
+        """回傳尚未結束的工作"""
+        with self._condition:
+            return list(self._active)
+
+    def shutdown(self):
+        """取消所有工作並停止排程"""
+        self.cancel_all()
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def _resource(self, job):
+        return (IO, job.device) if job.kind == IO else CPU
+
+    def _enqueue(self, job):
+        queue = self._queues.setdefault(self._resource(job), [])
+        heapq.heappush(queue, (job.priority, next(self._counter), job))
+
+    def _has_slot(self, resource):
+        if resource == CPU:
+            return self._running_cpu < self.cpu_slots
+        return self._running_io.get(resource[1], 0) < self.io_slots
+
+    def _acquire(self, job):
+        if job.kind == IO:
+            self._running_io[job.device] = self._running_io.get(job.device, 0) + 1
+        else:
+            self._running_cpu += 1
+
+    def _release(self, job):
+        if job.kind == IO:
+            self._running_io[job.device] -= 1
+            if not self._running_io[job.device]:
+                del self._running_io[job.device]
+        else:
+            self._running_cpu -= 1
+
+    def _finish(self, job, state):
+        job.state = state
+        self._active.discard(job)
+
+    def _next_runnable(self, now):
+        """取出最優先且有空位的工作，沒有時回傳 None"""
+        while self._delayed and self._delayed[0][0] <= now:
+            self._enqueue(heapq.heappop(self._delayed)[2])
+
+        best = None
+        for resource, queue in list(self._queues.items()):
+            while queue and queue[0][2].finished:
+                heapq.heappop(queue)  # 已取消
+            if not queue:
+                del self._queues[resource]
+            elif self._has_slot(resource) and (best is None or queue[0] < best[0]):
+                best = (queue[0], queue)
+        if best is None:
+            return None
+        heapq.heappop(best[1])
+        return best[0][2]
+
+    def _dispatch(self):
+        with self._condition:
+            while not self._closed:
+                job = self._next_runnable(time.monotonic())
+                if job is None:
+                    timeout = None
+                    if self._delayed:
+                        timeout = self._delayed[0][0] - time.monotonic()
+                    self._condition.wait(timeout)
+                    continue
+                job.state = RUNNING
+                job.attempts += 1
+                self._acquire(job)
+                threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        error = None
+        result = None
+        try:
+            result = job.work(job.cancel_token)
+            ok = bool(job.check(result))
+        except Exception as e:
+            error = e
+            ok = False
+
+        with self._condition:
+            self._release(job)
+            job.result, job.error = result, error
+            if ok:
+                self._finish(job, DONE)
+            elif job.cancelled:
+                self._finish(job, CANCELLED)
+            elif (
+                isinstance(error, RETRYABLE_ERRORS)
+                and job.attempts <= job.retries
+                and not self._closed
+            ):
+                # 暫時性的錯誤（例如磁碟忙碌）：等待後重試，等待時間每次加倍
+                delay = self.backoff * 2 ** (job.attempts - 1)
+                print(f"工作失敗，{delay:g} 秒後重試: {job.name}")
+                job.state = PENDING
+                ready_at = time.monotonic() + delay
+                heapq.heappush(self._delayed, (ready_at, next(self._counter), job))
+            else:
+                self._finish(job, FAILED)
+            self._condition.notify()
+            finished = job.finished
+
+        if finished and job.on_done:
+            job.on_done(job)
@@ -0,0 +1,173 @@
+"""靜音偵測與自動分割
+
+以 ffmpeg 將音訊串流解碼為低取樣率的 PCM，逐塊以 NumPy 計算每個短音框的能量（RMS），
+找出持續夠久的靜音區段。處理時只保留目前這一塊與少量狀態，記憶體用量與檔案長度無關。
+"""
+
+try:
+    import numpy as np
+except ImportError:  # 沒有 NumPy 時不提供靜音偵測
+    np = None
+
+from audio_tools import (
+    TRANSIENT_ERRORS,
+    JobCancelled,
+    probe_media,
+    split_audio,
+    stream_pcm,
+)
+
+# 偵測用的取樣率；判斷有沒有聲音不需要完整頻寬
+SILENCE_SAMPLE_RATE = 8000
+# 計算能量的音框長度（秒）
+SILENCE_FRAME_SECONDS = 0.05
+DEFAULT_THRESHOLD_DB = -40.0
+DEFAULT_MIN_SILENCE = 2.0
+
+
+def is_available():
+    return np is not None
+
+
+class SilenceDetector:
+    """逐塊接收 PCM 取樣，找出能量低於 threshold_db 且持續至少 min_silence 秒的區段"""
+
+    def __init__(
+        self,
+        threshold_db=DEFAULT_THRESHOLD_DB,
+        min_silence=DEFAULT_MIN_SILENCE,
+        sample_rate=SILENCE_SAMPLE_RATE,
+    ):
+        self.frame_size = max(1, round(sample_rate * SILENCE_FRAME_SECONDS))
+        self.frame_seconds = self.frame_size / sample_rate
+        self.min_frames = max(1, round(min_silence / self.frame_seconds))
+        # 以 16 位元滿刻度為 0 dB，比較能量平方即可，不必對每個音框取對數
+        self.threshold = (10 ** (threshold_db / 20) * 32768) ** 2
+        self.silences = []  # (開始秒數, 結束秒數)
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._frames = 0  # 已處理的音框數
+        self._run_start = None  # 目前靜音區段開始的音框
+
+    def _close_run(self, end_frame):
+        if self._run_start is not None:
+            if end_frame - self._run_start >= self.min_frames:
+                self.silences.append(
+                    (
+                        self._run_start * self.frame_seconds,
+                        end_frame * self.frame_seconds,
+                    )
+                )
+            self._run_start = None
+
+    def feed(self, samples):
+        """處理一塊 int16 取樣；不足一個音框的部分留到下一次"""
+        if len(self._pending):
+            samples = np.concatenate([self._pending, samples])
+        count = len(samples) // self.frame_size
+        self._pending = samples[count * self.frame_size :].copy()
+        if not count:
+            return
+
+        frames = samples[: count * self.frame_size].reshape(count, self.frame_size)
+        power = np.square(frames, dtype=np.float64).mean(axis=1)
+        quiet = power < self.threshold
+
+        # 只在安靜/有聲切換的位置處理，每塊的迴圈次數與切換次數成正比
+        previous = self._run_start is not None
+        changes = np.flatnonzero(np.diff(quiet, prepend=previous))
+        for index in changes.tolist():
+            if quiet[index]:
+                self._run_start = self._frames + index
+            else:
+                self._close_run(self._frames + index)
+        self._frames += count
+
+    def finish(self):
+        """輸入結束，回傳所有靜音區段"""
+        if len(self._pending):
+            # 最後不完整的音框也要計入，避免結尾的靜音被截短
+            self.feed(np.zeros(self.frame_size - len(self._pending), dtype=np.int16))
+        self._close_run(self._frames)
+        return self.silences
+
+    @property
+    def position(self):
+        """已處理的秒數"""
+        return self._frames * self.frame_seconds
+
+
+def detect_silence(
+    input_file,
+    threshold_db=DEFAULT_THRESHOLD_DB,
+    min_silence=DEFAULT_MIN_SILENCE,
+    on_progress=None,
+    cancel=None,
+):
+    """找出檔案中的靜音區段，回傳 [(開始秒數, 結束秒數), ...]
+
+    on_progress 會以 {"percent", "out_time"} 字典呼叫。
+    失敗時拋出 subprocess.CalledProcessError，被取消時拋出 JobCancelled。
+    """
+    if np is None:
+        raise RuntimeError("需要安裝 NumPy 才能偵測靜音")
+
+    duration = (probe_media(input_file) or {}).get("duration")
+    detector = SilenceDetector(threshold_db, min_silence)
+    pending = b""
+    for data in stream_pcm(input_file, SILENCE_SAMPLE_RATE, cancel=cancel):
+        data = pending + data if pending else data
+        usable = len(data) // 2 * 2
+        pending = data[usable:]
+        detector.feed(np.frombuffer(data[:usable], dtype="<i2"))
+        if on_progress:
+            percent = None
+            if duration:
+                percent = min(detector.position / duration * 100, 100.0)
+            on_progress({"percent": percent, "out_time": detector.position})
+    return detector.finish()
+
+
+def silence_split_points(silences, duration=None):
+    """以每段靜音的中點作為分割點；檔案開頭與結尾的靜音不分割"""
+    points = []
+    for start, end in silences:
+        if start <= 0:
+            continue
+        if duration is not None and end >= duration - SILENCE_FRAME_SECONDS:
+            continue
+        points.append(round((start + end) / 2, 3))
+    return points
+
+
+def auto_split_audio(
+    input_file,
+    min_silence=DEFAULT_MIN_SILENCE,
+    threshold_db=DEFAULT_THRESHOLD_DB,
+    on_progress=None,
+    cancel=None,
+):
+    """在每段超過 min_silence 秒的靜音處分割檔案
+
+    先串流偵測靜音，再以 split_audio 一次輸出所有部分；回傳 (是否成功, 輸出檔案列表)。
+    沒有找到靜音時不會產生任何檔案。
+    """
+    try:
+        silences = detect_silence(
+            input_file, threshold_db, min_silence, on_progress, cancel
+        )
+    except JobCancelled:
+        print("已取消靜音偵測")
+        return False, []
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        print(f"靜音偵測失敗: {str(e)}")
+        return False, []
+
+    duration = (probe_media(input_file) or {}).get("duration")
+    points = silence_split_points(silences, duration)
+    if not points:
+        print("找不到符合條件的靜音，未分割檔案")
+        return True, []
+    print(f"找到 {len(points)} 個分割點")
+    return split_audio(input_file, points, on_progress=on_progress, cancel=cancel)
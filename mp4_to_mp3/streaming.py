@@ -0,0 +1,248 @@
+"""串流模式：從檔案物件或標準輸入讀取，編碼結果逐塊寫到檔案物件或標準輸出
+
+不使用暫存檔，資料以固定大小的區塊在 Python 與 ffmpeg 之間傳遞，記憶體用量與
+輸入大小無關，可作為 shell 或 Python 管線中的一個階段（例如從物件儲存下載後直接轉換）。
+
+從管線讀取時 ffmpeg 無法回頭定位：MP4 的 moov 區塊必須在檔案開頭（faststart）。
+輸入若是一般檔案（例如 `< input.mp4` 重新導向），在 Linux 上會改以 /dev/fd 交給
+ffmpeg 直接讀取，可以定位，不受此限制。
+"""
+
+import os
+import shutil
+import stat
+import subprocess
+import threading
+from collections import deque
+
+from audio_tools import ENCODE_ARGS, MP3_ENCODE_ARGS, JobCancelled, parse_time
+
+# 每次複製的區塊大小
+STREAM_CHUNK_SIZE = 64 * 1024
+# 保留的 ffmpeg 錯誤訊息長度（行）
+_STDERR_LINES = 20
+
+# 串流輸出格式：名稱 -> (ffmpeg 封裝格式, 編碼參數)
+# 串流無法回頭改寫檔頭，因此 AAC 以 ADTS 輸出，不使用 MP4/M4A 封裝
+STREAM_FORMATS = {
+    "mp3": ("mp3", MP3_ENCODE_ARGS),
+    "aac": ("adts", ENCODE_ARGS["aac"]),
+    "wav": ("wav", ENCODE_ARGS["pcm_s16le"]),
+    "flac": ("flac", ("-acodec", "flac")),
+    "opus": ("ogg", ("-acodec", "libopus", "-b:a", "64k")),
+}
+
+# 可以使用 /dev/fd 讓 ffmpeg 直接讀取（並定位）已開啟的一般檔案
+_HAS_DEV_FD = os.name == "posix" and os.path.isdir("/dev/fd")
+
+
+def _regular_fd(source):
+    """source 是一般檔案時回傳其檔案描述元，否則回傳 None"""
+    try:
+        fd = source.fileno()
+        return fd if stat.S_ISREG(os.fstat(fd).st_mode) else None
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _feed(source, pipe):
+    """將 source 的內容逐塊寫入管線，ffmpeg 提早結束時停止"""
+    try:
+        while True:
+            data = source.read(STREAM_CHUNK_SIZE)
+            if not data:
+                break
+            pipe.write(data)
+    except (BrokenPipeError, ValueError):
+        pass  # ffmpeg 已結束（失敗或被取消），由呼叫端處理結束代碼
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
+def _binary(stream):
+    """取得文字串流底層的位元組串流（例如 sys.stdin -> sys.stdin.buffer）"""
+    return getattr(stream, "buffer", stream)
+
+
+def run_stream(args, sources, sink, cancel=None):
+    """以 sources 作為輸入執行 ffmpeg，輸出逐塊寫入 sink
+
+    args 中以 {0}、{1}… 代表各輸入在 ffmpeg 中的名稱；輸出必須是 pipe:1。
+    第一個輸入經由標準輸入傳遞，其他輸入使用額外的管線（只支援 POSIX）。
+    失敗時拋出 subprocess.CalledProcessError，被取消時拋出 JobCancelled。
+    """
+    if cancel is not None and cancel.cancelled:
+        raise JobCancelled()
+    sources = [_binary(source) for source in sources]
+    sink = _binary(sink)
+
+    names = []
+    pass_fds = []
+    feeds = []  # (來源, 子行程端的讀取描述元或 None 表示標準輸入)
+    stdin = subprocess.DEVNULL
+    for index, source in enumerate(sources):
+        fd = _regular_fd(source) if _HAS_DEV_FD else None
+        if fd is not None:
+            # 一般檔案直接交給 ffmpeg 讀取，可以定位（moov 在結尾的 MP4 也能處理）
+            if fd == 0:
+                stdin = None  # 繼承標準輸入
+                names.append("/dev/stdin")
+            else:
+                pass_fds.append(fd)
+                names.append(f"/dev/fd/{fd}")
+        elif index == 0:
+            stdin = subprocess.PIPE
+            names.append("pipe:0")
+            feeds.append((source, None))
+        elif os.name == "posix":
+            read_fd, write_fd = os.pipe()
+            pass_fds.append(read_fd)
+            names.append(f"pipe:{read_fd}")
+            feeds.append((source, (read_fd, write_fd)))
+        else:
+            raise OSError("此平台只支援單一串流輸入")
+
+    # -nostdin 只停用 ffmpeg 的鍵盤互動，不影響從 pipe:0 讀取資料
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostdin",
+        "-loglevel",
+        "error",
+        *[arg.format(*names) for arg in args],
+    ]
+    process = subprocess.Popen(
+        cmd,
+        stdin=stdin,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        pass_fds=pass_fds,
+    )
+    if cancel is not None:
+        cancel.register(process)
+
+    threads = []
+    for source, fds in feeds:
+        if fds is None:
+            pipe = process.stdin
+        else:
+            os.close(fds[0])  # 子行程已繼承讀取端
+            pipe = os.fdopen(fds[1], "wb")
+        thread = threading.Thread(target=_feed, args=(source, pipe), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    # 錯誤訊息在另一個執行緒讀取，只保留最後幾行，避免管線塞滿而卡住
+    errors = deque(maxlen=_STDERR_LINES)
+    drain = threading.Thread(target=lambda: errors.extend(process.stderr), daemon=True)
+    drain.start()
+
+    try:
+        shutil.copyfileobj(process.stdout, sink, STREAM_CHUNK_SIZE)
+        sink.flush()
+        returncode = process.wait()
+    finally:
+        if cancel is not None:
+            cancel.unregister(process)
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        for thread in threads:
+            thread.join()
+        drain.join()
+
+    if cancel is not None and cancel.cancelled:
+        raise JobCancelled()
+    if returncode != 0:
+        stderr = b"".join(errors).decode("utf-8", "replace")
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+
+
+def _output_args(output_format):
+    container, encode_args = STREAM_FORMATS[output_format]
+    return [*encode_args, "-f", container, "pipe:1"]
+
+
+def _run(description, args, sources, sink, cancel):
+    """執行串流並以既有函式的慣例回報結果：成功回傳 True，失敗時印出原因並回傳 False"""
+    try:
+        run_stream(args, sources, sink, cancel)
+        return True
+    except JobCancelled:
+        print(f"已取消{description}")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"{description}失敗: {(e.stderr or str(e)).strip()}")
+        return False
+    except BrokenPipeError:
+        print(f"{description}失敗: 輸出已關閉")
+        return False
+    except OSError as e:
+        print(f"{description}失敗: {str(e)}")
+        return False
+
+
+def convert_stream(source, sink, output_format="mp3", cancel=None):
+    """將 source（檔案物件）的音訊轉換為 output_format，逐塊寫入 sink"""
+    args = ["-i", "{0}", "-vn", *_output_args(output_format)]
+    return _run("串流轉換", args, [source], sink, cancel)
+
+
+def trim_stream(
+    source, sink, start_time, end_time, output_format="mp3", copy=False, cancel=None
+):
+    """剪輯 source 的 start_time 到 end_time，逐塊寫入 sink
+
+    管線無法定位，開始時間之前的資料會被讀取並丟棄。copy 為 True 時直接複製
+    音訊串流（輸入編碼需與 output_format 相同），否則重新編碼。
+    """
+    try:
+        start = parse_time(start_time)
+        length = parse_time(end_time) - start
+    except ValueError as e:
+        print(str(e))
+        return False
+    if length <= 0:
+        print("結束時間必須大於開始時間")
+        return False
+    codec_args = ["-c:a", "copy"] if copy else list(STREAM_FORMATS[output_format][1])
+    args = [
+        "-ss",
+        str(start),
+        "-i",
+        "{0}",
+        "-t",
+        str(length),
+        "-vn",
+        *codec_args,
+        "-f",
+        STREAM_FORMATS[output_format][0],
+        "pipe:1",
+    ]
+    return _run("串流剪輯", args, [source], sink, cancel)
+
+
+def merge_streams(sources, sink, output_format="mp3", cancel=None):
+    """依序合併多個 source 的音訊，逐塊寫入 sink
+
+    以 concat 濾鏡合併並重新編碼，不需要檔案清單或暫存檔；各輸入可以是不同格式。
+    """
+    if len(sources) < 2:
+        print("請至少提供兩個音訊來源進行合併")
+        return False
+    inputs = []
+    for index in range(len(sources)):
+        inputs += ["-i", f"{{{index}}}"]
+    labels = "".join(f"[{index}:a:0]" for index in range(len(sources)))
+    args = [
+        *inputs,
+        "-filter_complex",
+        f"{labels}concat=n={len(sources)}:v=0:a=1[out]",
+        "-map",
+        "[out]",
+        *_output_args(output_format),
+    ]
+    return _run("串流合併", args, sources, sink, cancel)
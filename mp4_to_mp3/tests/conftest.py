@@ -0,0 +1,12 @@
+"""測試共用設定
+
+程式的模組彼此以檔名直接匯入，因此把程式資料夾加入 sys.path；
+快取資料庫改寫到暫存目錄，不影響使用者的快取。
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["MP4_TO_MP3_CACHE_DIR"] = tempfile.mkdtemp(prefix="mp4_to_mp3_test_")
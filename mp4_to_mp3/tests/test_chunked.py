@@ -0,0 +1,102 @@
+import shutil
+import subprocess
+from array import array
+
+import pytest
+
+import audio_tools
+from audio_tools import CHUNK_OVERLAP_FRAMES, _chunk_windows, _kept_frames
+
+# MPEG-1 Layer III、128 kbps、44100 Hz、立體聲，沒有 CRC
+FRAME_HEADER = bytes((0xFF, 0xFB, 0x90, 0x00))
+FRAME_LENGTH = 144000 * 128 // 44100
+
+
+def frame(payload=b""):
+    return (FRAME_HEADER + payload).ljust(FRAME_LENGTH, b"\0")
+
+
+@pytest.mark.parametrize(
+    "total_frames, chunk_count", [(10, 2), (100, 3), (101, 7), (4597, 16), (9, 4)]
+)
+def test_chunk_windows_cover_every_frame_once(total_frames, chunk_count):
+    windows = _chunk_windows(total_frames, chunk_count)
+    assert len(windows) == chunk_count
+    position = 0
+    for start, end, skip, keep in windows:
+        assert 0 <= skip <= CHUNK_OVERLAP_FRAMES
+        # 保留的音框從上一段結束的地方開始，不重複也不遺漏
+        assert start + skip == position
+        if keep is None:
+            keep = total_frames - position
+        else:
+            # 編碼範圍包含保留的音框與結尾的重疊音框
+            assert end == start + skip + keep + CHUNK_OVERLAP_FRAMES
+        position += keep
+    assert position == total_frames
+    assert windows[0][0] == 0 and windows[0][2] == 0
+    assert windows[-1][1] is None and windows[-1][3] is None
+
+
+def test_kept_frames_drops_the_overlap():
+    frames = list(range(10))
+    assert _kept_frames(frames, 2, 5) == [2, 3, 4, 5, 6]
+    assert _kept_frames(frames, 2, None) == list(range(2, 10))
+    with pytest.raises(RuntimeError):
+        _kept_frames(frames, 2, 9)
+
+
+def test_mp3_frames_skips_id3_and_marks_info_frame():
+    tag = b"ID3\x04\x00\x00\x00\x00\x00\x05" + b"\0" * 5
+    data = tag + frame(b"\0" * 32 + b"Info") + frame() + frame()
+    frames = list(audio_tools._mp3_frames(data))
+    assert frames == [
+        (len(tag), FRAME_LENGTH, True),
+        (len(tag) + FRAME_LENGTH, FRAME_LENGTH, False),
+        (len(tag) + 2 * FRAME_LENGTH, FRAME_LENGTH, False),
+    ]
+
+
+def decode(path):
+    """解碼為 16 位元交錯的雙聲道取樣"""
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", str(path), "-f", "s16le", "-ac", "2", "-"],
+        capture_output=True,
+        check=True,
+    )
+    return array("h", result.stdout)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="需要 ffmpeg")
+def test_chunked_output_is_sample_aligned(tmp_path):
+    source = tmp_path / "tone.wav"
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "aevalsrc=0.5*sin(440*2*PI*t)|0.5*sin(660*2*PI*t):s=44100:d=12",
+            "-y",
+            str(source),
+        ],
+        check=True,
+    )
+    output = tmp_path / "tone.mp3"
+    audio_tools.encode_mp3_chunked(str(source), str(output), 12, workers=4)
+
+    expected = decode(source)
+    actual = decode(output)
+    assert len(actual) == len(expected)
+    # 接縫若有間隙或錯位一個取樣，誤差就會遠大於編碼雜訊
+    window = audio_tools.MP3_FRAME_SAMPLES * 2
+    for begin in range(0, len(expected) - window, window // 2):
+        error = sum(
+            (a - b) ** 2
+            for a, b in zip(
+                expected[begin : begin + window], actual[begin : begin + window]
+            )
+        )
+        assert (error / window) ** 0.5 < 300, begin
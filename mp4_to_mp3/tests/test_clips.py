@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+from clips import (
+    CLIPS_PER_PASS,
+    _clip_groups,
+    clip_output_paths,
+    load_clip_list,
+    parse_clip_time,
+    parse_csv,
+    parse_cue,
+    parse_json,
+)
+
+CUE = """\
+REM GENRE Podcast
+PERFORMER "Host"
+TITLE "Season 1"
+FILE "show.wav" WAVE
+  TRACK 01 AUDIO
+    TITLE "Intro"
+    INDEX 01 00:00:00
+  TRACK 02 AUDIO
+    INDEX 00 01:59:00
+    INDEX 01 02:00:37
+  TRACK 03 AUDIO
+    TITLE "Q&A"
+    INDEX 01 10:30:74
+"""
+
+
+def test_parse_clip_time():
+    assert parse_clip_time("1:02:03.5") == 3723.5
+    assert parse_clip_time("90") == 90.0
+    assert parse_clip_time(12) == 12.0
+    for bad in ("", "1:2:3:4", "abc", "-5"):
+        with pytest.raises(ValueError):
+            parse_clip_time(bad)
+
+
+def test_parse_cue_uses_pregap_and_frames():
+    clips = parse_cue(CUE)
+    assert [name for name, _, _ in clips] == ["Intro", "Track 02", "Q&A"]
+    # 第一軌結束在下一軌的 INDEX 00；每秒 75 個 cue 音框
+    assert clips[0][1:] == (0.0, 119.0)
+    assert clips[1][1] == pytest.approx(120 + 37 / 75)
+    assert clips[1][2] == pytest.approx(630 + 74 / 75)
+    assert clips[2][2] is None
+
+
+def test_parse_cue_rejects_multiple_files_and_missing_index():
+    with pytest.raises(ValueError):
+        parse_cue('FILE "a.wav" WAVE\nFILE "b.wav" WAVE\n')
+    with pytest.raises(ValueError):
+        parse_cue('FILE "a.wav" WAVE\n  TRACK 01 AUDIO\n    INDEX 00 00:00:00\n')
+
+
+def test_parse_csv_with_and_without_header():
+    assert parse_csv("intro,0,1:00\n# 註解\n\noutro, 59:00 ,1:00:00\n") == [
+        ("intro", 0.0, 60.0),
+        ("outro", 3540.0, 3600.0),
+    ]
+    text = "end,Start,title\n30,10,first\n"
+    assert parse_csv(text) == [("first", 10.0, 30.0)]
+    assert parse_csv("start,end\n5,6\n") == [("", 5.0, 6.0)]
+    with pytest.raises(ValueError, match="第 2 筆"):
+        parse_csv("a,0,1\nb,zero,1\n")
+
+
+def test_parse_json_shapes():
+    expected = [("a", 0.0, 1.5), ("b", 61.0, None)]
+    assert (
+        parse_json(
+            '[{"name": "a", "start": 0, "end": "1.5"}, {"title": "b", "start": "1:01"}]'
+        )
+        == expected
+    )
+    assert parse_json('{"clips": [["a", 0, 1.5], ["b", "1:01", null]]}') == expected
+    for bad in ('{"start": 1}', "[[1, 2]]", '[{"end": 3}]', '[{"start": "x"}]'):
+        with pytest.raises(ValueError):
+            parse_json(bad)
+
+
+def test_load_clip_list_by_extension(tmp_path):
+    cue = tmp_path / "show.cue"
+    cue.write_bytes(CUE.encode("utf-8-sig"))
+    assert len(load_clip_list(cue)) == 3
+    text = tmp_path / "show.txt"
+    text.write_text("intro,0,1\n")
+    with pytest.raises(ValueError):
+        load_clip_list(text)
+
+
+def test_clip_output_paths_are_unique_and_safe(tmp_path):
+    source = tmp_path / "talk.mp3"
+    clips = [
+        ("talk", 0, 1),
+        ("a/b:c", 1, 2),
+        ("A_B_C", 2, 3),
+        ("", 3, 4),
+        (" . ", 4, 5),
+    ]
+    names = [os.path.basename(p) for p in clip_output_paths(source, clips)]
+    # 與輸入同名的片段不會覆寫輸入檔案；名稱比較不分大小寫
+    assert names == [
+        "talk_2.mp3",
+        "a_b_c.mp3",
+        "A_B_C_2.mp3",
+        "talk_clip4.mp3",
+        "talk_clip5.mp3",
+    ]
+    other = tmp_path / "out"
+    assert clip_output_paths(source, clips[:1], other) == [str(other / "talk.mp3")]
+
+
+def test_clip_groups_are_sorted_and_bounded():
+    jobs = [(float(start), start + 1.0, f"{start}.mp3") for start in range(20, 0, -1)]
+    groups = _clip_groups(jobs)
+    assert [len(group) for group in groups] == [CLIPS_PER_PASS, CLIPS_PER_PASS, 4]
+    starts = [start for group in groups for start, _, _ in group]
+    assert starts == sorted(starts)
@@ -0,0 +1,115 @@
+from file_model import FileListModel
+
+
+class FakeTree:
+    """只實作 FileListModel 用到的 Treeview 方法；排程的回呼由測試手動執行"""
+
+    def __init__(self):
+        self.rows = []
+        self.values = {}
+        self.callbacks = []
+
+    def after_idle(self, callback):
+        self.callbacks.append(callback)
+
+    def after(self, _ms, callback):
+        self.callbacks.append(callback)
+
+    def run_pending(self):
+        while self.callbacks:
+            self.callbacks.pop(0)()
+
+    def insert(self, _parent, _index, iid, values):
+        self.rows.append(iid)
+        self.values[iid] = values
+
+    def get_children(self):
+        return tuple(self.rows)
+
+    def index(self, iid):
+        return self.rows.index(iid)
+
+    def next(self, iid):
+        index = self.rows.index(iid) + 1
+        return self.rows[index] if index < len(self.rows) else ""
+
+    def move(self, iid, _parent, index):
+        self.rows.remove(iid)
+        self.rows.insert(index, iid)
+
+    def see(self, _iid):
+        pass
+
+    def exists(self, iid):
+        return iid in self.values
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.rows.remove(iid)
+            del self.values[iid]
+
+
+def make_model(batch_size=None):
+    tree = FakeTree()
+    inserted = []
+    model = FileListModel(tree, on_inserted=lambda paths, iids: inserted.append(paths))
+    if batch_size:
+        model.BATCH_SIZE = batch_size
+    return model, tree, inserted
+
+
+def test_add_skips_duplicates_and_inserts_later():
+    model, tree, inserted = make_model()
+    assert model.add(["a.mp4", "b.mp4", "a.mp4"], lambda path: (path,)) == 2
+    assert model.add(["b.mp4", "c.mp4"], lambda path: (path,)) == 1
+    # 列在事件迴圈中才插入，但已經可以查詢與排序
+    assert tree.rows == []
+    assert "c.mp4" in model and len(model) == 3
+    assert model.paths() == ["a.mp4", "b.mp4", "c.mp4"]
+
+    tree.run_pending()
+    assert [tree.values[iid] for iid in tree.rows] == [
+        ("a.mp4",),
+        ("b.mp4",),
+        ("c.mp4",),
+    ]
+    assert inserted == [["a.mp4", "b.mp4", "c.mp4"]]
+    assert model.path(model.iid("b.mp4")) == "b.mp4"
+
+
+def test_inserts_in_batches():
+    model, tree, inserted = make_model(batch_size=2)
+    model.add([f"{n}.mp4" for n in range(5)], lambda path: ())
+    tree.run_pending()
+    assert [len(batch) for batch in inserted] == [2, 2, 1]
+    assert model.paths() == [f"{n}.mp4" for n in range(5)]
+
+
+def test_move_reorders_rows():
+    model, tree, _ = make_model()
+    model.add(["a", "b", "c"], lambda path: ())
+    tree.run_pending()
+    assert not model.move(model.iid("a"), -1)
+    assert not model.move(model.iid("c"), 1)
+    assert model.move(model.iid("a"), 1)
+    assert model.paths() == ["b", "a", "c"]
+    assert model.move(model.iid("a"), 5)
+    assert model.paths() == ["b", "c", "a"]
+
+
+def test_remove_and_clear_include_pending_rows():
+    model, tree, _ = make_model(batch_size=2)
+    model.add(["a", "b", "c", "d"], lambda path: ())
+    tree.callbacks.pop(0)()  # 只插入第一批
+    model.remove([model.iid("a"), model.iid("d"), "unknown"])
+    assert model.paths() == ["b", "c"]
+    assert "a" not in model and "d" not in model
+    # 移除後可以再次加入
+    assert model.add(["a"], lambda path: ()) == 1
+    tree.run_pending()
+    assert model.paths() == ["b", "c", "a"]
+
+    model.add(["e"], lambda path: ())
+    model.clear()
+    tree.run_pending()
+    assert model.paths() == [] and len(model) == 0 and tree.rows == []
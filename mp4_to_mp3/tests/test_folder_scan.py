@@ -0,0 +1,75 @@
+import os
+
+import folder_scan
+from folder_scan import scan_media_files
+
+
+def make_tree(root, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+
+
+def relative(root, paths):
+    return [os.path.relpath(path, root).replace(os.sep, "/") for path in paths]
+
+
+def test_walks_depth_first_with_files_before_subfolders(tmp_path):
+    make_tree(
+        tmp_path,
+        ["b.mp4", "A.MP4", "z/c.mp4", "a/d.mp4", "a/sub/e.mp4", "a/f.txt", "g.mp4"],
+    )
+    found = relative(tmp_path, scan_media_files(str(tmp_path), (".MP4",)))
+    assert found == ["A.MP4", "b.mp4", "g.mp4", "a/d.mp4", "a/sub/e.mp4", "z/c.mp4"]
+
+
+def test_skips_hidden_entries_and_honours_recursive(tmp_path):
+    make_tree(
+        tmp_path,
+        ["one.mp4", ".one.partial.mp4", ".cache/two.mp4", "sub/three.mp4"],
+    )
+    assert relative(tmp_path, scan_media_files(str(tmp_path), (".mp4",))) == [
+        "one.mp4",
+        "sub/three.mp4",
+    ]
+    assert relative(
+        tmp_path, scan_media_files(str(tmp_path), (".mp4",), recursive=False)
+    ) == ["one.mp4"]
+
+
+def test_does_not_follow_directory_symlinks(tmp_path):
+    make_tree(tmp_path, ["real/one.mp4"])
+    (tmp_path / "link").symlink_to(tmp_path / "real", target_is_directory=True)
+    assert relative(tmp_path, scan_media_files(str(tmp_path), (".mp4",))) == [
+        "real/one.mp4"
+    ]
+
+
+def test_probes_other_files_only_when_asked(tmp_path, monkeypatch):
+    make_tree(tmp_path, ["talk.mp4", "voice.dat", "notes.dat"])
+    probed = []
+
+    def has_audio(path):
+        probed.append(os.path.basename(path))
+        return path.endswith("voice.dat")
+
+    monkeypatch.setattr(folder_scan, "has_audio", has_audio)
+    assert relative(tmp_path, scan_media_files(str(tmp_path), (".mp4",))) == [
+        "talk.mp4"
+    ]
+    assert probed == []
+    found = scan_media_files(str(tmp_path), (".mp4",), probe=True)
+    assert relative(tmp_path, found) == ["talk.mp4", "voice.dat"]
+    assert probed == ["notes.dat", "voice.dat"]
+
+
+def test_yields_lazily_and_survives_unreadable_folders(tmp_path, capsys):
+    make_tree(tmp_path, ["a/one.mp4", "b/two.mp4"])
+    files = scan_media_files(str(tmp_path), (".mp4",))
+    assert os.path.basename(next(files)) == "one.mp4"
+    # 第一個結果產生後才刪除的資料夾不會中斷走訪
+    os.remove(tmp_path / "b" / "two.mp4")
+    os.rmdir(tmp_path / "b")
+    assert list(files) == []
+    assert "無法讀取資料夾" in capsys.readouterr().out
@@ -0,0 +1,146 @@
+import struct
+
+import pytest
+
+from media_headers import read_lame_tag, read_media_info, read_mp3_length
+
+# MPEG-1 Layer III、128 kbps、44100 Hz、立體聲，沒有 CRC
+MP3_HEADER = bytes((0xFF, 0xFB, 0x90, 0x00))
+MP3_FRAME = 144000 * 128 // 44100
+
+
+def box(kind, *children):
+    body = b"".join(children)
+    return struct.pack(">I4s", 8 + len(body), kind) + body
+
+
+def descriptor(tag, body):
+    return bytes((tag, len(body))) + body
+
+
+def mp4(duration=90, timescale=1000, object_type=2, channels=2, avg_bitrate=128000):
+    mvhd = box(b"mvhd", struct.pack(">4xIIII", 0, 0, timescale, duration * timescale))
+    mdhd = box(b"mdhd", struct.pack(">4xIIII", 0, 0, 44100, duration * 44100))
+    hdlr = box(b"hdlr", struct.pack(">4xI4s", 0, b"soun"))
+    # AudioSpecificConfig：物件類型 5 位元、取樣率索引 4 位元（4 = 44100）、聲道設定 4 位元
+    config = (object_type << 11 | 4 << 7 | channels << 3).to_bytes(2, "big")
+    decoder = descriptor(
+        0x04,
+        bytes((0x40, 0x15))
+        + bytes(3)
+        + struct.pack(">II", avg_bitrate, avg_bitrate)
+        + descriptor(0x05, config),
+    )
+    esds = box(b"esds", bytes(4), descriptor(0x03, bytes(3) + decoder))
+    mp4a = box(
+        b"mp4a",
+        bytes(6) + struct.pack(">H", 1) + bytes(8),
+        struct.pack(">HHHHI", channels, 16, 0, 0, 44100 << 16),
+        esds,
+    )
+    stsd = box(b"stsd", struct.pack(">II", 0, 1), mp4a)
+    trak = box(
+        b"trak",
+        box(b"mdia", mdhd, hdlr, box(b"minf", box(b"stbl", stsd))),
+    )
+    return box(b"ftyp", b"M4A \0\0\0\0") + box(b"moov", mvhd, trak) + box(b"mdat")
+
+
+def info_frame(frames, delay=576, padding=1000, encoder=b"LAME3.100"):
+    """含 Xing（音框數、位元組數、定位表、品質）與 LAME 延遲/補白的 Info 音框"""
+    body = b"Info" + struct.pack(">III", 0x0F, frames, frames * MP3_FRAME)
+    body += bytes(100) + struct.pack(">I", 0)
+    lame = encoder.ljust(21, b"\0") + ((delay << 12) | padding).to_bytes(3, "big")
+    return (MP3_HEADER + bytes(32) + body + lame).ljust(MP3_FRAME, b"\0")
+
+
+def audio_frames(count):
+    return (MP3_HEADER.ljust(MP3_FRAME, b"\0")) * count
+
+
+def wav(data_length, fmt_tag=1, bits=16, channels=2, rate=48000, extra=b""):
+    """WAV 檔頭加上 data_length 個位元組的靜音；data_length 為 0xFFFFFFFF 時不附資料"""
+    byte_rate = rate * channels * bits // 8
+    fmt = struct.pack("<HHIIHH", fmt_tag, channels, rate, byte_rate, 4, bits)
+    return (
+        b"RIFF\0\0\0\0WAVE"
+        + struct.pack("<4sI", b"fmt ", len(fmt))
+        + fmt
+        + extra
+        + struct.pack("<4sI", b"data", data_length)
+        + bytes(data_length if data_length != 0xFFFFFFFF else 0)
+    )
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_mp4_aac(tmp_path):
+    info = read_media_info(write(tmp_path, "a.m4a", mp4()))
+    assert info == {
+        "duration": 90.0,
+        "codec": "aac",
+        "sample_rate": 44100,
+        "channels": 2,
+        "bitrate": 128000,
+    }
+
+
+def test_mp4_he_aac_and_fragmented_files_are_left_to_ffprobe(tmp_path):
+    assert read_media_info(write(tmp_path, "he.m4a", mp4(object_type=5))) is None
+    assert read_media_info(write(tmp_path, "frag.mp4", mp4(duration=0))) is None
+
+
+def test_mp3_xing_frame_count(tmp_path):
+    data = b"ID3\x04\0\0\0\0\0\x0a" + bytes(10) + info_frame(1000) + audio_frames(3)
+    info = read_media_info(write(tmp_path, "vbr.mp3", data))
+    assert info["codec"] == "mp3"
+    assert (info["sample_rate"], info["channels"]) == (44100, 2)
+    assert info["duration"] == pytest.approx(1000 * 1152 / 44100)
+
+
+def test_mp3_cbr_duration_from_size(tmp_path):
+    data = audio_frames(100) + b"TAG" + bytes(125)
+    info = read_media_info(write(tmp_path, "cbr.mp3", data))
+    assert info["duration"] == pytest.approx(100 * MP3_FRAME * 8 / 128000)
+    assert info["bitrate"] == 128000
+
+
+def test_lame_gapless_length(tmp_path):
+    data = info_frame(1000, delay=576, padding=1000) + audio_frames(3)
+    assert read_lame_tag(data, 0) == (1000, 576, 1000)
+    path = write(tmp_path, "gapless.mp3", data)
+    assert read_mp3_length(path) == (1000 * 1152 - 576 - 529 - (1000 - 529)) / 44100
+    # 其他編碼器寫的標頭不一定記錄延遲，與 ffmpeg 相同不採用
+    other = write(tmp_path, "other.mp3", info_frame(1000, encoder=b"XYZ"))
+    assert read_mp3_length(other) is None
+    assert read_mp3_length(write(tmp_path, "plain.mp3", audio_frames(3))) is None
+
+
+def test_wav_formats(tmp_path):
+    info = read_media_info(write(tmp_path, "a.wav", wav(48000 * 4 * 3)))
+    assert info["codec"] == "pcm_s16le"
+    assert (info["sample_rate"], info["channels"], info["duration"]) == (48000, 2, 3)
+
+    float_wav = wav(48000 * 8, fmt_tag=3, bits=32, channels=2)
+    assert read_media_info(write(tmp_path, "f.wav", float_wav))["codec"] == "pcm_f32le"
+
+    # 奇數長度的區塊後有一個補齊位元組
+    odd = wav(48000 * 4, extra=b"LIST\x03\0\0\0abc\0")
+    assert read_media_info(write(tmp_path, "odd.wav", odd))["duration"] == 1
+
+
+def test_streamed_wav_uses_file_size(tmp_path):
+    data = wav(0xFFFFFFFF) + bytes(48000 * 4 * 2)
+    assert read_media_info(write(tmp_path, "live.wav", data))["duration"] == 2
+
+
+def test_unknown_or_damaged_files(tmp_path):
+    assert read_media_info(write(tmp_path, "a.bin", b"\x01" * 64)) is None
+    assert read_media_info(write(tmp_path, "short.mp4", b"\0\0")) is None
+    truncated = mp4()[:60]
+    assert read_media_info(write(tmp_path, "cut.m4a", truncated)) is None
+    assert read_media_info(str(tmp_path / "missing.mp3")) is None
@@ -0,0 +1,213 @@
+import errno
+import subprocess
+import threading
+import time
+
+import audio_tools
+from scheduler import CANCELLED, DONE, FAILED, IO, PENDING, JobScheduler
+
+
+def run_to_end(scheduler, work, **options):
+    """送出工作並等待結束"""
+    finished = threading.Event()
+    job = scheduler.submit(work, on_done=lambda job: finished.set(), **options)
+    assert finished.wait(10)
+    return job
+
+
+class Gate:
+    """會停在 release 之前的工作，並記錄同時執行的數量"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.started = []
+
+    def work(self, name):
+        def run(cancel):
+            with self.lock:
+                self.started.append(name)
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            self.release.wait(10)
+            with self.lock:
+                self.running -= 1
+            return True
+
+        return run
+
+    def wait_started(self, count):
+        deadline = time.monotonic() + 10
+        while len(self.started) < count:
+            assert time.monotonic() < deadline, self.started
+            time.sleep(0.005)
+
+
+def fake_split(fail_with, failures=1):
+    """取代 run_ffmpeg：前 failures 次拋出 fail_with，之後產生分割的輸出檔案"""
+    calls = []
+
+    def run_ffmpeg(args, **kwargs):
+        calls.append(args)
+        if len(calls) <= failures:
+            raise fail_with
+        pattern = args[-1]
+        for number in (1, 2):
+            with open(pattern.replace("%d", str(number)), "wb") as f:
+                f.write(b"\0")
+
+    return run_ffmpeg, calls
+
+
+def test_split_retries_transient_error(tmp_path, monkeypatch):
+    source = tmp_path / "talk.mp3"
+    source.write_bytes(b"\0")
+    run_ffmpeg, calls = fake_split(OSError(errno.EAGAIN, "暫時無法建立子行程"))
+    monkeypatch.setattr(audio_tools, "run_ffmpeg", run_ffmpeg)
+
+    scheduler = JobScheduler(retries=2, backoff=0.01)
+    try:
+        job = run_to_end(
+            scheduler,
+            lambda cancel: audio_tools.split_audio(str(source), ["10"], cancel=cancel),
+            check=lambda result: result[0],
+        )
+    finally:
+        scheduler.shutdown()
+
+    assert job.state == DONE
+    assert job.attempts == 2
+    assert len(calls) == 2
+    assert job.result == (
+        True,
+        [str(tmp_path / "talk_part1.mp3"), str(tmp_path / "talk_part2.mp3")],
+    )
+
+
+def test_transient_error_gives_up_after_retries(tmp_path, monkeypatch):
+    source = tmp_path / "talk.mp3"
+    source.write_bytes(b"\0")
+    run_ffmpeg, calls = fake_split(OSError(errno.EIO, "磁碟錯誤"), failures=10)
+    monkeypatch.setattr(audio_tools, "run_ffmpeg", run_ffmpeg)
+
+    scheduler = JobScheduler(retries=2, backoff=0.01)
+    try:
+        job = run_to_end(
+            scheduler,
+            lambda cancel: audio_tools.split_audio(str(source), ["10"], cancel=cancel),
+            check=lambda result: result[0],
+        )
+    finally:
+        scheduler.shutdown()
+
+    assert job.state == FAILED
+    assert isinstance(job.error, OSError)
+    assert len(calls) == 3
+
+
+def test_ffmpeg_failure_is_not_retried(tmp_path, monkeypatch):
+    source = tmp_path / "talk.mp3"
+    source.write_bytes(b"\0")
+    run_ffmpeg, calls = fake_split(subprocess.CalledProcessError(1, "ffmpeg"))
+    monkeypatch.setattr(audio_tools, "run_ffmpeg", run_ffmpeg)
+
+    scheduler = JobScheduler(retries=2, backoff=0.01)
+    try:
+        job = run_to_end(
+            scheduler,
+            lambda cancel: audio_tools.split_audio(str(source), ["10"], cancel=cancel),
+            check=lambda result: result[0],
+        )
+    finally:
+        scheduler.shutdown()
+
+    # 輸入損毀等錯誤由 split_audio 回報為失敗，重試也不會成功
+    assert job.state == FAILED
+    assert job.error is None
+    assert len(calls) == 1
+
+
+def test_runs_higher_priority_first():
+    scheduler = JobScheduler(cpu_slots=1)
+    gate = Gate()
+    order = []
+    try:
+        scheduler.submit(gate.work("blocker"))
+        gate.wait_started(1)
+        # 唯一的 CPU 空位被占用時送出的工作，依優先順序、再依送出順序執行
+        jobs = [
+            scheduler.submit(
+                lambda cancel, name=name: order.append(name) or True,
+                priority=priority,
+            )
+            for name, priority in (
+                ("late", 20),
+                ("first", 0),
+                ("mid", 10),
+                ("second", 0),
+            )
+        ]
+        gate.release.set()
+        last = run_to_end(scheduler, lambda cancel: True, priority=30)
+    finally:
+        scheduler.shutdown()
+    assert order == ["first", "second", "mid", "late"]
+    assert all(job.state == DONE for job in jobs + [last])
+
+
+def test_cpu_slots_limit_concurrency_and_can_grow():
+    scheduler = JobScheduler(cpu_slots=2)
+    gate = Gate()
+    try:
+        jobs = [scheduler.submit(gate.work(n)) for n in range(5)]
+        gate.wait_started(2)
+        time.sleep(0.05)
+        assert len(gate.started) == 2
+        scheduler.set_limits(cpu_slots=5)
+        gate.wait_started(5)
+        gate.release.set()
+        run_to_end(scheduler, lambda cancel: True)
+    finally:
+        scheduler.shutdown()
+    assert gate.peak == 5
+    assert all(job.state == DONE for job in jobs)
+
+
+def test_io_slots_are_per_device_and_separate_from_cpu():
+    scheduler = JobScheduler(cpu_slots=1, io_slots=1)
+    gate = Gate()
+    try:
+        scheduler.submit(gate.work("cpu"))
+        scheduler.submit(gate.work("disk-a"), kind=IO, device="a")
+        waiting = scheduler.submit(gate.work("disk-a-2"), kind=IO, device="a")
+        scheduler.submit(gate.work("disk-b"), kind=IO, device="b")
+        # CPU 工作占滿 CPU 空位時 I/O 工作仍可執行；每個裝置各自只有一個空位
+        gate.wait_started(3)
+        time.sleep(0.05)
+        assert sorted(gate.started) == ["cpu", "disk-a", "disk-b"]
+        assert waiting.state == PENDING
+        gate.release.set()
+        gate.wait_started(4)
+    finally:
+        gate.release.set()
+        scheduler.shutdown()
+
+
+def test_cancelling_pending_job_skips_it():
+    scheduler = JobScheduler(cpu_slots=1)
+    gate = Gate()
+    done = []
+    try:
+        scheduler.submit(gate.work("blocker"))
+        gate.wait_started(1)
+        ran = []
+        job = scheduler.submit(lambda cancel: ran.append(1), on_done=done.append)
+        scheduler.cancel(job)
+        assert job.state == CANCELLED and done == [job]
+        gate.release.set()
+        run_to_end(scheduler, lambda cancel: True)
+    finally:
+        scheduler.shutdown()
+    assert ran == []
@@ -0,0 +1,60 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from silence import SilenceDetector, silence_split_points  # noqa: E402
+
+RATE = 8000
+
+
+def signal(*parts):
+    """依序接上 (秒數, 是否有聲) 的片段；有聲部分是 440 Hz 的正弦波"""
+    chunks = []
+    for seconds, loud in parts:
+        t = np.arange(round(seconds * RATE)) / RATE
+        chunk = 10000 * np.sin(2 * np.pi * 440 * t) if loud else np.zeros(len(t))
+        chunks.append(chunk.astype(np.int16))
+    return np.concatenate(chunks)
+
+
+def detect(samples, block=None, **options):
+    detector = SilenceDetector(sample_rate=RATE, **options)
+    block = block or len(samples)
+    for start in range(0, len(samples), block):
+        detector.feed(samples[start : start + block])
+    return detector.finish()
+
+
+def test_finds_silence_between_sounds():
+    samples = signal((1, True), (3, False), (1, True))
+    assert detect(samples, min_silence=2) == [(1.0, 4.0)]
+
+
+def test_results_do_not_depend_on_block_size():
+    samples = signal((1.23, True), (2.5, False), (0.7, True), (2.1, False))
+    expected = detect(samples, min_silence=2)
+    assert len(expected) == 2
+    for block in (1, 399, 401, 4096):
+        assert detect(samples, block=block, min_silence=2) == expected
+
+
+def test_ignores_short_silence_and_quiet_noise():
+    samples = signal((1, True), (1, False), (1, True))
+    assert detect(samples, min_silence=2) == []
+    # -50 dB 左右的底噪在 -40 dB 的門檻下仍算靜音
+    noise = (np.random.default_rng(0).standard_normal(3 * RATE) * 100).astype(np.int16)
+    assert detect(noise, min_silence=2, threshold_db=-40) == [(0.0, 3.0)]
+    assert detect(noise, min_silence=2, threshold_db=-60) == []
+
+
+def test_trailing_silence_includes_partial_frame():
+    samples = signal((1, True), (2.01, False))
+    [(start, end)] = detect(samples, min_silence=2)
+    assert start == 1.0
+    assert end == pytest.approx(3.05)
+
+
+def test_split_points_skip_leading_and_trailing_silence():
+    silences = [(0.0, 2.0), (10.0, 13.0), (57.5, 60.0)]
+    assert silence_split_points(silences, duration=60.0) == [11.5]
+    assert silence_split_points(silences) == [11.5, 58.75]
@@ -0,0 +1,78 @@
+import shutil
+import subprocess
+from array import array
+
+import pytest
+
+import audio_tools
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="需要 ffmpeg")
+
+
+def make_mp3(path, sample_rate, seconds=20):
+    """產生兩個音調相加的測試 MP3（VBR，會用到位元儲存槽）"""
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            f"aevalsrc=0.3*sin(440*2*PI*t)+0.2*sin(1234*2*PI*t)*sin(3*t)"
+            f":s={sample_rate}:d={seconds}",
+            "-ac",
+            "2",
+            *audio_tools.MP3_ENCODE_ARGS,
+            "-y",
+            str(path),
+        ],
+        check=True,
+    )
+
+
+def decode(path):
+    """解碼為 16 位元交錯的雙聲道取樣"""
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", str(path), "-f", "s16le", "-ac", "2", "-"],
+        capture_output=True,
+        check=True,
+    )
+    return array("h", result.stdout)
+
+
+def test_accurate_mp3_trim_copies_the_body(tmp_path, monkeypatch):
+    source = tmp_path / "talk.mp3"
+    output = tmp_path / "clip.mp3"
+    make_mp3(source, 44100)
+
+    def reencode(*args):
+        raise AssertionError("應該只重新編碼開頭的音框")
+
+    monkeypatch.setattr(audio_tools, "_trim_reencode", reencode)
+    assert audio_tools.trim_audio(source, output, "3.217", "12.5", accurate=True)
+
+    start, end = round(3.217 * 44100), round(12.5 * 44100)
+    expected = decode(source)[start * 2 : end * 2]
+    actual = decode(output)
+    assert len(actual) == len(expected)
+    # 重新編碼的開頭之後是原始音框，解碼結果完全相同
+    head = 12 * audio_tools.MP3_FRAME_SAMPLES * 2
+    assert actual[head:] == expected[head:]
+
+
+def test_accurate_mp3_trim_at_the_edges(tmp_path):
+    source = tmp_path / "talk.mp3"
+    make_mp3(source, 48000, seconds=5)
+    for start, end in ((0, 2), (0.001, 0.05), (3.5, 99)):
+        output = tmp_path / "clip.mp3"
+        assert audio_tools.trim_audio(source, output, start, end, accurate=True)
+        samples = round(min(end, 5) * 48000) - round(start * 48000)
+        assert len(decode(output)) == samples * 2
+
+
+@pytest.mark.parametrize("sample_rate", [16000, 22050, 24000, 32000])
+def test_accurate_trim_length_check_at_low_sample_rates(tmp_path, sample_rate):
+    source = tmp_path / "talk.mp3"
+    make_mp3(source, sample_rate, seconds=8)
+    assert audio_tools.trim_audio(source, tmp_path / "clip.mp3", 1, 4, accurate=True)
@@ -0,0 +1,263 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_tools import DEFAULT_WORKERS, convert_mp4_to_mp3, plan_conversion
+from folder_scan import scan_media_files
+
+# 檔案大小與修改時間維持不變多久（秒）才視為寫入完成
+DEFAULT_SETTLE_SECONDS = 2.0
+# 無法使用 inotify 時的輪詢間隔（秒）
+DEFAULT_POLL_INTERVAL = 2.0
+
+# inotify 事件旗標（見 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _is_watched_file(name):
+    return name.lower().endswith(".mp4")
+
+
+def scan_folder(folder, recursive=True):
+    """列出資料夾中的 MP4 檔案"""
+    return scan_media_files(folder, (".mp4",), recursive)
+
+
+class _Inotify:
+    """以 ctypes 呼叫 Linux inotify，不需要額外套件"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失敗")
+        self.dirs = {}  # watch descriptor -> 資料夾路徑
+
+    def add_watch(self, folder):
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+        wd = self._add_watch(self.fd, os.fsencode(folder), mask)
+        if wd >= 0:
+            self.dirs[wd] = folder
+
+    def wait(self, timeout):
+        """等待事件，回傳 (路徑, 事件旗標) 列表"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            folder = self.dirs.get(wd)
+            if mask & IN_Q_OVERFLOW:
+                events.append((None, mask))
+            elif folder is not None and name:
+                events.append((os.path.join(folder, os.fsdecode(name)), mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """監看資料夾中新增或變更的 MP4 檔案，檔案停止變動後才呼叫 on_ready(路徑)
+
+    Linux 上使用 inotify，閒置時不耗用 CPU；其他平台或 use_polling 為 True 時改用輪詢。
+    """
+
+    def __init__(
+        self,
+        folder,
+        on_ready,
+        recursive=True,
+        settle_seconds=DEFAULT_SETTLE_SECONDS,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+        use_polling=False,
+    ):
+        self.folder = folder
+        self.on_ready = on_ready
+        self.recursive = recursive
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self._inotify = None
+        if not use_polling and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError, TypeError) as e:
+                print(f"無法使用 inotify，改用輪詢: {str(e)}")
+        self._candidates = {}  # 路徑 -> (大小, 修改時間, 最後變動時間)
+        self._snapshot = {}  # 輪詢模式下上次看到的 (大小, 修改時間)
+
+    @property
+    def uses_inotify(self):
+        return self._inotify is not None
+
+    def _add_watches(self, folder):
+        self._inotify.add_watch(folder)
+        if self.recursive:
+            for root, dirs, _ in os.walk(folder):
+                for name in dirs:
+                    self._inotify.add_watch(os.path.join(root, name))
+
+    def _touch(self, path):
+        """將檔案加入候選清單，等待它停止變動"""
+        self._candidates.pop(path, None)
+        self._candidates[path] = None
+
+    def _poll_changes(self):
+        """輪詢模式：比對快照找出新增或變更的檔案"""
+        snapshot = {}
+        for path in scan_folder(self.folder, self.recursive):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_size, st.st_mtime_ns)
+            if self._snapshot.get(path) != snapshot[path]:
+                self._touch(path)
+        self._snapshot = snapshot
+
+    def _check_candidates(self):
+        """檢查候選檔案是否已停止變動"""
+        now = time.monotonic()
+        for path, state in list(self._candidates.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._candidates[path]  # 檔案已被移走
+                continue
+            key = (st.st_size, st.st_mtime_ns)
+            if state is None or state[:2] != key:
+                self._candidates[path] = key + (now,)
+            elif now - state[2] >= self.settle_seconds:
+                del self._candidates[path]
+                self.on_ready(path)
+
+    def run(self, stop_event=None):
+        """持續監看直到 stop_event 被設定（或收到 KeyboardInterrupt）"""
+        stop_event = stop_event or threading.Event()
+        # 先處理資料夾中既有的檔案
+        for path in scan_folder(self.folder, self.recursive):
+            self._touch(path)
+        if self._inotify is not None:
+            self._add_watches(self.folder)
+        else:
+            self._poll_changes()
+
+        try:
+            while not stop_event.is_set():
+                # 有候選檔案時才需要定時檢查；閒置時只為了檢查停止旗標而醒來
+                timeout = self.settle_seconds / 2 if self._candidates else 1.0
+                if self._inotify is not None:
+                    self._handle_events(self._inotify.wait(timeout))
+                else:
+                    stop_event.wait(min(timeout, self.poll_interval))
+                    self._poll_changes()
+                self._check_candidates()
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+
+    def _handle_events(self, events):
+        for path, mask in events:
+            if path is None:
+                # 事件佇列溢位，重新掃描整個資料夾
+                for file in scan_folder(self.folder, self.recursive):
+                    self._touch(file)
+            elif mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_watches(path)
+                    for file in scan_folder(path, self.recursive):
+                        self._touch(file)
+            elif _is_watched_file(os.path.basename(path)):
+                self._touch(path)
+
+
+def is_converted(input_file, remux=False):
+    """輸出檔案已存在且比輸入檔案新時回傳 True"""
+    output_file = plan_conversion(input_file, remux)[0]
+    try:
+        return os.path.getmtime(output_file) >= os.path.getmtime(input_file)
+    except OSError:
+        return False
+
+
+def watch_and_convert(
+    folder,
+    max_workers=None,
+    remux=False,
+    recursive=True,
+    settle_seconds=DEFAULT_SETTLE_SECONDS,
+    poll_interval=DEFAULT_POLL_INTERVAL,
+    use_polling=False,
+    on_result=None,
+    stop_event=None,
+):
+    """監看資料夾並自動轉換新加入的 MP4 檔案
+
+    已轉換過（輸出檔案較新）的檔案會被略過；on_result 會以 (檔案, 是否成功) 呼叫。
+    """
+    in_flight = set()
+    lock = threading.Lock()
+    workers = max(1, max_workers or DEFAULT_WORKERS)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    # 與 convert_files_parallel 相同：同時轉換多個檔案時減少長檔案的分段數
+    chunk_workers = max(1, DEFAULT_WORKERS // workers)
+
+    def convert(file):
+        try:
+            success = convert_mp4_to_mp3(file, remux=remux, chunk_workers=chunk_workers)
+        except Exception as e:
+            print(f"未預期的錯誤: {str(e)}")
+            success = False
+        finally:
+            with lock:
+                in_flight.discard(file)
+        if on_result:
+            on_result(file, success)
+
+    def on_ready(file):
+        if is_converted(file, remux):
+            return
+        with lock:
+            if file in in_flight:
+                return
+            in_flight.add(file)
+        pool.submit(convert, file)
+
+    watcher = FolderWatcher(
+        folder,
+        on_ready,
+        recursive=recursive,
+        settle_seconds=settle_seconds,
+        poll_interval=poll_interval,
+        use_polling=use_polling,
+    )
+    print(
+        f"開始監看資料夾（{'inotify' if watcher.uses_inotify else '輪詢'}）: {folder}"
+    )
+    try:
+        watcher.run(stop_event)
+    finally:
+        pool.shutdown(wait=True)
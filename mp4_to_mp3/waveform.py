@@ -0,0 +1,166 @@
+"""波形峰值索引
+
+以 ffmpeg 將音訊解碼為低取樣率的單聲道 PCM，一邊讀取一邊以 NumPy 計算每個固定
+長度視窗的最小值與最大值，結果存成 .npy 檔案放在快取目錄中。之後顯示波形或挑選
+切點時只需讀取這個小檔案，不必再次解碼。
+"""
+
+import hashlib
+import os
+
+try:
+    import numpy as np
+except ImportError:  # 沒有 NumPy 時不提供波形功能
+    np = None
+
+from audio_tools import probe_media, stream_pcm
+from media_cache import get_cache_dir
+
+# 解碼用的取樣率；波形只用來顯示，8 kHz 已足夠
+PEAK_SAMPLE_RATE = 8000
+# 每個視窗的取樣數（8 kHz 下約 32 毫秒），兩小時的音訊約 90 萬位元組
+PEAK_WINDOW = 256
+# 每次從管線讀取的視窗數
+_READ_WINDOWS = 4096
+
+
+def is_available():
+    return np is not None
+
+
+def window_seconds():
+    """每個峰值視窗代表的秒數"""
+    return PEAK_WINDOW / PEAK_SAMPLE_RATE
+
+
+def _peaks_dir():
+    path = os.path.join(get_cache_dir(), "peaks")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _index_paths(file_path):
+    """回傳 (目前版本的索引檔案路徑, 同一輸入檔案的索引檔名前綴)"""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None, None
+    path = os.path.normcase(os.path.abspath(file_path))
+    prefix = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+    # 檔名包含大小與修改時間，檔案變更後舊的索引就不會再被讀取
+    name = (
+        f"{prefix}-{st.st_size}-{st.st_mtime_ns}-{PEAK_SAMPLE_RATE}-{PEAK_WINDOW}.npy"
+    )
+    return os.path.join(_peaks_dir(), name), prefix
+
+
+def _remove_stale(prefix, keep):
+    """刪除同一輸入檔案過期的索引"""
+    for entry in os.scandir(_peaks_dir()):
+        if entry.name.startswith(prefix + "-") and entry.path != keep:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def load_peaks(file_path):
+    """讀取已建立的峰值索引；沒有索引或檔案已變更時回傳 None"""
+    if np is None:
+        return None
+    index_path, _ = _index_paths(file_path)
+    if index_path is None or not os.path.exists(index_path):
+        return None
+    try:
+        return np.load(index_path)
+    except (OSError, ValueError) as e:
+        print(f"無法讀取波形索引: {str(e)}")
+        return None
+
+
+def _reduce(samples):
+    """將整數個視窗的取樣化為 (視窗數, 2) 的 [最小值, 最大值] 陣列"""
+    windows = samples.reshape(-1, PEAK_WINDOW)
+    return np.stack([windows.min(axis=1), windows.max(axis=1)], axis=1)
+
+
+def build_peaks(file_path, on_progress=None, cancel=None):
+    """以一次串流解碼建立峰值索引，回傳 int16 陣列 (視窗數, 2)
+
+    on_progress 會以 {"percent", "out_time"} 字典呼叫。
+    失敗時拋出 subprocess.CalledProcessError，被取消時拋出 JobCancelled。
+    """
+    if np is None:
+        raise RuntimeError("需要安裝 NumPy 才能建立波形")
+
+    duration = (probe_media(file_path) or {}).get("duration")
+    chunks = []
+    pending = b""
+    samples_read = 0
+    blocks = stream_pcm(
+        file_path,
+        PEAK_SAMPLE_RATE,
+        block_size=PEAK_WINDOW * _READ_WINDOWS * 2,
+        cancel=cancel,
+    )
+    for data in blocks:
+        data = pending + data
+        # 只處理完整的視窗，剩下的位元組留到下一輪
+        usable = len(data) // (PEAK_WINDOW * 2) * PEAK_WINDOW * 2
+        pending = data[usable:]
+        if usable:
+            chunks.append(_reduce(np.frombuffer(data[:usable], dtype="<i2")))
+            samples_read += usable // 2
+            if on_progress:
+                out_time = samples_read / PEAK_SAMPLE_RATE
+                percent = None
+                if duration:
+                    percent = min(out_time / duration * 100, 100.0)
+                on_progress({"percent": percent, "out_time": out_time})
+
+    if len(pending) >= 2:
+        # 最後一個不完整的視窗以 0 補齊
+        tail = np.frombuffer(pending[: len(pending) // 2 * 2], dtype="<i2")
+        tail = np.concatenate([tail, np.zeros(PEAK_WINDOW - len(tail), dtype="<i2")])
+        chunks.append(_reduce(tail))
+    if not chunks:
+        return np.zeros((0, 2), dtype=np.int16)
+    return np.concatenate(chunks).astype(np.int16)
+
+
+def get_peaks(file_path, on_progress=None, cancel=None):
+    """取得峰值索引：已有最新的索引時直接讀取，否則建立後存入快取"""
+    peaks = load_peaks(file_path)
+    if peaks is not None:
+        return peaks
+
+    peaks = build_peaks(file_path, on_progress=on_progress, cancel=cancel)
+    index_path, prefix = _index_paths(file_path)
+    if index_path is not None:
+        # 先寫入暫存檔再改名，避免讀到寫到一半的索引
+        temp_path = index_path + ".partial"
+        try:
+            with open(temp_path, "wb") as f:
+                np.save(f, peaks)
+            os.replace(temp_path, index_path)
+            _remove_stale(prefix, index_path)
+        except OSError as e:
+            print(f"無法儲存波形索引: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return peaks
+
+
+def downsample(peaks, columns, start=0, end=None):
+    """將 peaks[start:end] 縮減為最多 columns 欄的 [最小值, 最大值]，供繪圖使用"""
+    peaks = peaks[start:end]
+    if len(peaks) <= columns:
+        return peaks
+    edges = np.linspace(0, len(peaks), columns, endpoint=False).astype(np.intp)
+    return np.stack(
+        [
+            np.minimum.reduceat(peaks[:, 0], edges),
+            np.maximum.reduceat(peaks[:, 1], edges),
+        ],
+        axis=1,
+    )